@@ -89,7 +89,9 @@ def unauthenticated_menu():
 
 def menu():
     if "dbi" not in st.session_state:
-        st.session_state["dbi"] = DbInterface(get_firestore_client())
+        st.session_state["dbi"] = DbInterface(
+            get_firestore_client(), st.secrets.get("HISTORY_BUCKET")
+        )
     # Determine if a user is logged in or not, then show the correct
     # navigation menu
     if "role" not in st.session_state or st.session_state.role is None:
@@ -0,0 +1,285 @@
+"""
+学习记录的列式分析。
+
+用户的练习或成绩记录只读取一次，转换为类型固定的列式数据框：
+项目为分类类型，记录时间为 int64 的 Unix 秒，时长和得分为 float32。
+按时间排序后用二分查找截取本期与上期，两期数据在同一次分组中汇总。
+"""
+
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .quantile_sketch import KLLSketch
+
+# 各集合中记录时间的字段
+TIME_FIELDS = {"exercises": "timestamp", "performances": "record_time"}
+# 不计入学习时间的项目
+INVALID_STUDY_ITEMS = [
+    "Home",
+    "订阅续费",
+    "用户中心",
+    "用户注册",
+    "帮助中心",
+    "系统管理",
+]
+# 旧的练习记录没有 word 字段，单词只能从项目名称中提取
+WORD_ITEM_PATTERN = r"单词练习-.*?-([a-zA-Z\s]+)$"
+# period 列的取值
+CURRENT = 0
+PREVIOUS = 1
+
+
+def records_to_frame(collection_name: str, records: List[dict]) -> pd.DataFrame:
+    """
+    将学习历史记录转换为按时间排序的列式数据框。
+
+    练习记录包含 item、ts、duration（秒）和 word 列，成绩记录包含 item、ts 和 score 列。
+    """
+    time_field = TIME_FIELDS[collection_name]
+    n = len(records)
+    items = [record["item"] for record in records]
+    data = {
+        "item": pd.Categorical(items),
+        "ts": np.fromiter(
+            (record[time_field].timestamp() for record in records),
+            dtype=np.float64,
+            count=n,
+        ).astype(np.int64),
+    }
+    if collection_name == "exercises":
+        data["duration"] = np.fromiter(
+            (record.get("duration", 0) for record in records), dtype=np.float32, count=n
+        )
+        words = pd.Series([record.get("word") for record in records], dtype=object)
+        missing = words.isna()
+        if missing.any():
+            words[missing] = pd.Series(items, dtype=object)[missing].str.extract(
+                WORD_ITEM_PATTERN
+            )[0]
+        data["word"] = pd.Categorical(words)
+    else:
+        data["score"] = np.fromiter(
+            (record.get("score", 0) for record in records), dtype=np.float32, count=n
+        )
+    return pd.DataFrame(data).sort_values("ts", kind="stable", ignore_index=True)
+
+
+def period_bounds(start_date, end_date) -> Tuple[int, int, int]:
+    """
+    返回上期开始、本期开始和本期结束的 Unix 秒。
+
+    日期按 UTC 计算，上期与本期等长并紧接在本期之前。
+    """
+    start = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc)
+    end = datetime.combine(end_date, datetime.max.time(), tzinfo=timezone.utc)
+    start, end = int(start.timestamp()), int(end.timestamp())
+    return start - (end - start), start, end
+
+
+def select_periods(frame: pd.DataFrame, start_date, end_date) -> pd.DataFrame:
+    """截取上期和本期的记录，并用 period 列标记所属周期。"""
+    previous_start, start, end = period_bounds(start_date, end_date)
+    ts = frame["ts"].to_numpy()
+    lo = np.searchsorted(ts, previous_start, side="left")
+    hi = np.searchsorted(ts, end, side="right")
+    df = frame.iloc[lo:hi].copy()
+    df["period"] = np.where(df["ts"].to_numpy() >= start, CURRENT, PREVIOUS).astype(
+        np.int8
+    )
+    return df
+
+
+def local_time_key(df: pd.DataFrame, user_tz: str, period: str = "天") -> pd.Series:
+    """按用户时区将记录时间转换为日期（period 为"天"）或"月-日 时"。"""
+    local = pd.to_datetime(df["ts"], unit="s", utc=True).dt.tz_convert(user_tz)
+    if period == "天":
+        return local.dt.date
+    return local.dt.strftime("%m-%d %H")
+
+
+def period_totals(grouped: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """由按 (period, ...) 分组的结果求本期和上期的合计，上期没有记录时为 None。"""
+    totals = grouped.groupby(level="period").sum()
+    current = totals.loc[CURRENT] if CURRENT in totals.index else totals.sum() * 0
+    previous = totals.loc[PREVIOUS] if PREVIOUS in totals.index else None
+    return current, previous
+
+
+def word_study_stats(
+    frame: pd.DataFrame,
+    start_date,
+    end_date,
+    user_tz: str,
+    period: str = "天",
+    max_duration: float = float("inf"),
+):
+    """
+    统计单词练习的学习时间（分钟）和学习单词次数。
+
+    Returns:
+        tuple: (按日期汇总的本期数据, 本期合计, 上期合计)。合计为 Series，上期没有记录时为 None。
+    """
+    df = select_periods(frame, start_date, end_date)
+    df = df[df["word"].notna()]
+    df = df.assign(
+        key=local_time_key(df, user_tz, period),
+        # 修正错误计时，单个时长超过阈值的，以阈值代替
+        minutes=np.minimum(df["duration"].to_numpy(), max_duration) / 60,
+    )
+    grouped = df.groupby(["period", "key"]).agg(
+        学习时间=("minutes", "sum"), 学习单词次数=("word", "count")
+    )
+    current, previous = period_totals(grouped)
+    stats = _current_rows(grouped).rename_axis("学习日期").reset_index()
+    return stats, current, previous
+
+
+def study_time_stats(
+    frame: pd.DataFrame, start_date, end_date, user_tz: str, period: str = "天"
+):
+    """
+    按项目统计学习时间（分钟），项目取名称中第一个"-"之前的部分。
+
+    Returns:
+        tuple: (按日期和项目汇总的本期数据, 本期合计, 上期合计)。
+    """
+    df = select_periods(frame, start_date, end_date)
+    df = df[~df["item"].isin(INVALID_STUDY_ITEMS)]
+    projects = df["item"].cat.categories.str.split("-").str[0].to_numpy()
+    df = df.assign(
+        key=local_time_key(df, user_tz, period),
+        项目=projects[df["item"].cat.codes.to_numpy()],
+        时长=df["duration"].to_numpy() / 60,
+    )
+    grouped = df.groupby(["period", "key", "项目"]).agg(时长=("时长", "sum"))
+    current, previous = period_totals(grouped)
+    stats = _current_rows(grouped).rename_axis(["学习日期", "项目"]).reset_index()
+    return stats, current, previous
+
+
+def average_score_stats(
+    frame: pd.DataFrame, start_date, end_date, user_tz: str
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    统计各项目的每日平均得分。
+
+    Returns:
+        tuple: (本期按日期和项目的平均得分, 各项目的本期与上期平均得分)。
+            后者以项目为索引，包含 current 和 previous 两列，没有记录的周期为 NaN。
+    """
+    df = select_periods(frame, start_date, end_date)
+    df = df.assign(date=local_time_key(df, user_tz))
+    daily = df.groupby(["period", "date", "item"], observed=True)["score"].mean()
+    by_item = (
+        daily.groupby(level=["period", "item"], observed=True)
+        .mean()
+        .unstack("period")
+        .reindex(columns=[CURRENT, PREVIOUS])
+    )
+    by_item.columns = ["current", "previous"]
+    data_grouped = _current_rows(daily.round(2).to_frame()).reset_index()
+    return data_grouped, by_item.astype(np.float64).round(2)
+
+
+def valid_study_minutes(frame: pd.DataFrame) -> float:
+    """返回全部有效项目的学习时间（分钟）。"""
+    valid = ~frame["item"].isin(INVALID_STUDY_ITEMS).to_numpy()
+    return float(frame["duration"].to_numpy()[valid].sum(dtype=np.float64) / 60)
+
+
+def _current_rows(grouped: pd.DataFrame) -> pd.DataFrame:
+    if CURRENT in grouped.index.get_level_values("period"):
+        return grouped.xs(CURRENT, level="period")
+    return grouped.iloc[:0].droplevel("period")
+
+
+# region 成绩分布
+
+
+class ScoreDistribution:
+    """
+    可合并的得分分布：数量、均值、方差和分位数草图。
+
+    每日按 (项目, 省份) 预先汇总，查询时合并多日或多省的分布，
+    计算百分位只需遍历草图，与用户数量无关。
+    """
+
+    __slots__ = ("count", "mean", "m2", "sketch")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        # 与均值之差的平方和（Welford 算法）
+        self.m2 = 0.0
+        self.sketch = KLLSketch()
+
+    def add(self, score: float):
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (score - self.mean)
+        self.sketch.update(score)
+
+    def merge(self, other: "ScoreDistribution") -> "ScoreDistribution":
+        """将另一个分布合并到当前分布（原地修改）。"""
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """样本方差。"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance**0.5
+
+    def rank(self, score: float) -> float:
+        """返回低于 score 的比例，同分者计一半。"""
+        return self.sketch.rank(score)
+
+    def quantile(self, q: float) -> float:
+        """返回第 q 分位数（0 ≤ q ≤ 1）。"""
+        return self.sketch.quantile(q)
+
+    def cdf(self, scores) -> np.ndarray:
+        """返回低于各得分的比例。"""
+        return self.sketch.cdf(scores)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ScoreDistribution":
+        dist = cls()
+        dist.count = d["count"]
+        dist.mean = d["mean"]
+        dist.m2 = d["m2"]
+        dist.sketch = KLLSketch.from_dict(d["sketch"])
+        return dist
+
+
+def merge_distributions(distributions) -> ScoreDistribution:
+    """合并多个得分分布，返回新的分布。"""
+    merged = ScoreDistribution()
+    for dist in distributions:
+        merged.merge(dist)
+    return merged
+
+
+# endregion
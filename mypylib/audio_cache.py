@@ -0,0 +1,350 @@
+"""
+分层语音缓存：进程内 LRU -> 预合成目录 -> 本地磁盘 -> 可选的 Azure Blob 存储。
+
+缓存键为 hash_word(text + voice + fmt)，各层中的路径均为 <voice>/e<md5>.<fmt>。
+resource/word_voices 存放由 scripts/synthesize_word_voices.py 预先合成的语音，
+只读且不参与淘汰；运行时合成的语音写入单独的缓存目录。全部词库的语音约 1 GB，
+不纳入版本库，部署时在每台主机上运行该脚本生成：设置 AUDIO_CACHE_CONTAINER 后
+脚本优先从 Blob 下载已合成的语音，只有第一台主机需要调用语音合成。
+该目录中 e<md5(单词)>.mp3 格式的旧文件不使用此缓存键，不会被读取。
+"""
+
+import io
+import json
+import logging
+import os
+import threading
+import wave
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from .azure_speech import MAX_SYNTHESIS_WORKERS, iter_concurrent_synthesis
+from .word_utils import CURRENT_CWD, hash_word
+
+# 创建或获取logger对象
+logger = logging.getLogger("streamlit")
+
+PREBUILT_AUDIO_DIR = CURRENT_CWD / "resource" / "word_voices"
+DEFAULT_AUDIO_CACHE_DIR = CURRENT_CWD / "resource" / "word_voices_cache"
+WORD_LISTS_FP = (
+    CURRENT_CWD / "resource" / "dictionary" / "word_lists_by_edition_grade.json"
+)
+# 内存缓存上限 64 MB，磁盘缓存上限 2 GB
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 2 * 1024 * 1024 * 1024
+# 磁盘超限时清理到上限的比例，避免每次写入都触发清理
+DISK_EVICTION_RATIO = 0.9
+# 只统计和淘汰缓存写入的 wav 文件
+DISK_CACHE_PATTERN = "*/e*.wav"
+
+
+def get_wav_duration(audio_data: bytes) -> timedelta:
+    """根据 wav 文件头计算音频时长。合成失败时音频为空，返回 0。"""
+    if not audio_data:
+        return timedelta(0)
+    with wave.open(io.BytesIO(audio_data), "rb") as f:
+        return timedelta(seconds=f.getnframes() / f.getframerate())
+
+
+def load_word_list_items(voices, word_lib_names=None, fp=WORD_LISTS_FP):
+    """
+    生成用于预热缓存的 (单词, 语音名称) 列表。
+
+    Args:
+        voices (list): 语音名称列表。
+        word_lib_names (list, optional): 词库名称列表，默认为全部词库。
+        fp (str | Path, optional): 词库文件路径。
+
+    Returns:
+        list: 去重后的 (单词, 语音名称) 列表，按词库顺序排列。
+    """
+    with open(fp, "r", encoding="utf-8") as f:
+        word_lists = json.load(f)
+    names = word_lib_names or list(word_lists.keys())
+    words = dict.fromkeys(w for name in names for w in word_lists[name])
+    return [(word, voice) for voice in voices for word in words]
+
+
+class AudioCache:
+    """
+    按内容寻址的分层语音缓存，线程安全。
+
+    读取时依次查找内存、预合成目录、磁盘和 Blob，命中较慢的层后会回填较快的层。
+    内存与磁盘均按字节数淘汰最久未使用的条目，预合成目录只读取不写入。
+    """
+
+    def __init__(
+        self,
+        root=DEFAULT_AUDIO_CACHE_DIR,
+        prebuilt_root=PREBUILT_AUDIO_DIR,
+        max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+        max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+        container_client=None,
+    ):
+        """
+        Args:
+            root (str | Path, optional): 磁盘缓存根目录。默认为 resource/word_voices_cache。
+            prebuilt_root (str | Path, optional): 预合成语音目录，为 None 时不使用。
+                默认为 resource/word_voices。
+            max_memory_bytes (int, optional): 内存缓存的最大字节数。
+            max_disk_bytes (int, optional): 磁盘缓存的最大字节数。
+            container_client (ContainerClient, optional): Azure Blob 容器，
+                为 None 时不使用 Blob 层。
+        """
+        self.root = Path(root)
+        self.prebuilt_root = None if prebuilt_root is None else Path(prebuilt_root)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.container_client = container_client
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_bytes = self._scan_disk_bytes()
+        self.metrics = {
+            "memory_hits": 0,
+            "prebuilt_hits": 0,
+            "disk_hits": 0,
+            "blob_hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+    @staticmethod
+    def key(text: str, voice: str, fmt: str = "wav") -> str:
+        return hash_word(text + voice + fmt)
+
+    def relative_path(self, text: str, voice: str, fmt: str = "wav") -> str:
+        return f"{voice}/e{self.key(text, voice, fmt)}.{fmt}"
+
+    def path_for(self, text: str, voice: str, fmt: str = "wav") -> Path:
+        return self.root / self.relative_path(text, voice, fmt)
+
+    # region 读写
+
+    def get(self, text: str, voice: str, fmt: str = "wav") -> Optional[bytes]:
+        """依次从内存、磁盘和 Blob 中读取音频，均未命中时返回 None。"""
+        name = self.relative_path(text, voice, fmt)
+        with self.lock:
+            data = self.memory.get(name)
+            if data is not None:
+                self.memory.move_to_end(name)
+                self.metrics["memory_hits"] += 1
+                return data
+
+        data = self._read_prebuilt(name)
+        if data is not None:
+            self._count("prebuilt_hits")
+            self._put_memory(name, data)
+            return data
+
+        data = self._read_disk(name)
+        if data is not None:
+            self._count("disk_hits")
+            self._put_memory(name, data)
+            return data
+
+        data = self._read_blob(name)
+        if data is not None:
+            self._count("blob_hits")
+            self._write_disk(name, data)
+            self._put_memory(name, data)
+            return data
+
+        self._count("misses")
+        return None
+
+    def put(self, text: str, voice: str, data: bytes, fmt: str = "wav"):
+        """将音频写入所有缓存层。"""
+        name = self.relative_path(text, voice, fmt)
+        self._count("puts")
+        self._put_memory(name, data)
+        self._write_disk(name, data)
+        self._write_blob(name, data)
+
+    def get_or_create(
+        self,
+        text: str,
+        voice: str,
+        synthesize: Callable[[str, str], bytes],
+        fmt: str = "wav",
+    ) -> bytes:
+        """读取缓存，未命中时调用 synthesize(text, voice) 生成并写入缓存。"""
+        data = self.get(text, voice, fmt)
+        if data is None:
+            data = synthesize(text, voice)
+            self.put(text, voice, data, fmt)
+        return data
+
+    def contains(self, text: str, voice: str, fmt: str = "wav") -> bool:
+        """只检查内存、预合成目录和磁盘，不访问 Blob，也不计入命中统计。"""
+        name = self.relative_path(text, voice, fmt)
+        with self.lock:
+            if name in self.memory:
+                return True
+        if self.prebuilt_root is not None and (self.prebuilt_root / name).exists():
+            return True
+        return (self.root / name).exists()
+
+    # endregion
+
+    # region 预热与统计
+
+    def warm(
+        self,
+        items: Iterable[Tuple[str, str]],
+        synthesize: Callable[[str, str], bytes],
+        fmt: str = "wav",
+        max_workers: int = MAX_SYNTHESIS_WORKERS,
+    ) -> int:
+        """
+        批量预热缓存，只合成本地尚不存在的 (文本, 语音名称)。
+
+        Returns:
+            int: 新合成的条目数量。
+        """
+        missing = [
+            (text, voice)
+            for text, voice in dict.fromkeys(items)
+            if not self.contains(text, voice, fmt)
+        ]
+        n = 0
+        for _ in iter_concurrent_synthesis(
+            missing,
+            lambda text, voice: self.get_or_create(text, voice, synthesize, fmt),
+            max_workers,
+        ):
+            n += 1
+        return n
+
+    def stats(self) -> dict:
+        """返回各层命中次数、命中率和当前占用的字节数。"""
+        with self.lock:
+            stats = dict(self.metrics)
+            stats["memory_entries"] = len(self.memory)
+            stats["memory_bytes"] = self.memory_bytes
+            stats["disk_bytes"] = self.disk_bytes
+        hits = (
+            stats["memory_hits"]
+            + stats["prebuilt_hits"]
+            + stats["disk_hits"]
+            + stats["blob_hits"]
+        )
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        return stats
+
+    # endregion
+
+    # region 内部函数
+
+    def _count(self, name):
+        with self.lock:
+            self.metrics[name] += 1
+
+    def _put_memory(self, name, data):
+        with self.lock:
+            if name in self.memory:
+                self.memory_bytes -= len(self.memory.pop(name))
+            self.memory[name] = data
+            self.memory_bytes += len(data)
+            while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+                self.metrics["memory_evictions"] += 1
+
+    def _scan_disk_bytes(self):
+        total = 0
+        for fp in self.root.glob(DISK_CACHE_PATTERN):
+            total += fp.stat().st_size
+        return total
+
+    def _read_prebuilt(self, name):
+        if self.prebuilt_root is None:
+            return None
+        try:
+            return (self.prebuilt_root / name).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"读取预合成语音失败：{name} {e}")
+            return None
+
+    def _read_disk(self, name):
+        fp = self.root / name
+        try:
+            data = fp.read_bytes()
+            # 更新修改时间，淘汰时按最久未使用排序
+            os.utime(fp)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"读取语音缓存文件失败：{name} {e}")
+            return None
+        return data
+
+    def _write_disk(self, name, data):
+        # 磁盘已满或没有写权限时只记录日志，不影响调用方使用已合成的音频
+        fp = self.root / name
+        # 先写入临时文件再重命名，避免并发读取到不完整的文件
+        tmp = fp.with_name(f".{fp.name}.{threading.get_ident()}.tmp")
+        try:
+            fp.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(data)
+            old_size = fp.stat().st_size if fp.exists() else 0
+            os.replace(tmp, fp)
+        except OSError as e:
+            logger.error(f"写入语音缓存文件失败：{name} {e}")
+            if tmp.exists():
+                tmp.unlink()
+            return
+        with self.lock:
+            self.disk_bytes += len(data) - old_size
+            over_limit = self.disk_bytes > self.max_disk_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        files = sorted(
+            self.root.glob(DISK_CACHE_PATTERN), key=lambda fp: fp.stat().st_mtime
+        )
+        target = self.max_disk_bytes * DISK_EVICTION_RATIO
+        with self.lock:
+            for fp in files:
+                if self.disk_bytes <= target:
+                    break
+                try:
+                    size = fp.stat().st_size
+                    fp.unlink()
+                except FileNotFoundError:
+                    continue
+                self.disk_bytes -= size
+                self.metrics["disk_evictions"] += 1
+
+    def _read_blob(self, name):
+        if self.container_client is None:
+            return None
+        try:
+            return self.container_client.get_blob_client(name).download_blob().readall()
+        except ResourceNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"读取语音缓存 Blob 失败：{name} {e}")
+            return None
+
+    def _write_blob(self, name, data):
+        if self.container_client is None:
+            return
+        try:
+            self.container_client.get_blob_client(name).upload_blob(
+                data, overwrite=True
+            )
+        except Exception as e:
+            logger.error(f"写入语音缓存 Blob 失败：{name} {e}")
+
+    # endregion
@@ -1,12 +1,13 @@
+import asyncio
 from collections import defaultdict
 import difflib
 import json
 import logging
 import string
-import time
+import threading
 import azure.cognitiveservices.speech as speechsdk
 import wave
-from typing import Union, Dict, List, Tuple, Iterator
+from typing import Callable, Union, Dict, List, Tuple, Iterator
 import re
 
 # 创建或获取logger对象
@@ -287,13 +288,25 @@ def adjust_recognized_words_and_scores(
     }, final_words
 
 
-def _pronunciation_assessment(
-    audio_data: Union[str, Dict],
+def _prepare_pronunciation_assessment(
+    audio_data: Union[str, Dict, speechsdk.audio.PushAudioInputStream],
     secrets: Dict[str, str],
-    topic: str = None,
-    reference_text: str = None,
-    language="en-US",
+    topic: str,
+    reference_text: str,
+    language: str,
+    on_stopped: Callable[[], None],
+    on_words: Callable[[List[_PronunciationAssessmentWordResultV2]], None] = None,
 ):
+    """
+    创建发音评估识别器并连接回调。
+
+    识别会话结束或取消时调用 on_stopped，由调用方决定如何等待（线程事件或协程）。
+    audio_data 为 PushAudioInputStream 时，由调用方边录音边写入音频。
+    每识别出一句话，都会以该句的单词评估结果调用 on_words。
+
+    Returns:
+        tuple: (识别器, 生成评估结果的函数)。
+    """
     if (not topic or len(topic.strip()) < 1) and (
         not reference_text or len(reference_text.strip()) < 1
     ):
@@ -333,6 +346,8 @@ def _pronunciation_assessment(
         # Write the audio data to the stream
         stream.write(audio_data["bytes"])
         stream.close()
+    elif isinstance(audio_data, speechsdk.audio.PushAudioInputStream):
+        audio_config = speechsdk.audio.AudioConfig(stream=audio_data)
     else:
         audio_config = speechsdk.audio.AudioConfig(filename=audio_data)
 
@@ -357,7 +372,6 @@ def _pronunciation_assessment(
     pronunciation_config.apply_to(speech_recognizer)
 
     # Rest of the code remains the same as pronunciation_assessment_with_content_assessment function...
-    done = False
     recognized_text = ""
     pron_results = []
     recognized_words = []
@@ -367,8 +381,7 @@ def _pronunciation_assessment(
     def stop_cb(evt):
         """callback that signals to stop continuous recognition upon receiving an event `evt`"""
         # print("CLOSING on {}".format(evt))
-        nonlocal done
-        done = True
+        on_stopped()
 
     def recognized(evt: speechsdk.SpeechRecognitionEventArgs):
         nonlocal recognized_words, pron_results, recognized_text, fluency_scores, durations
@@ -396,6 +409,8 @@ def _pronunciation_assessment(
                 # Duration
                 duration = sum([int(w.duration) for w in pronunciation_result.words])
                 durations.append(duration)
+                if on_words is not None:
+                    on_words(pronunciation_result.words)
 
     # Connect callbacks to the events fired by the speech recognizer
     speech_recognizer.recognized.connect(recognized)
@@ -410,88 +425,136 @@ def _pronunciation_assessment(
     speech_recognizer.session_stopped.connect(stop_cb)
     speech_recognizer.canceled.connect(stop_cb)
 
-    # Start continuous pronunciation assessment
-    speech_recognizer.start_continuous_recognition()
-    while not done:
-        time.sleep(0.5)
-    speech_recognizer.stop_continuous_recognition()
+    def build_output():
+        output["error"] = ""
+        # Content assessment result is in the last pronunciation assessment block
+        if (
+            with_content_assessment
+            and pron_results[-1].content_assessment_result is None
+        ):
+            output["error"] = "No content assessment result"
+            return output
+
+        if with_content_assessment:
+            # content_result = pron_results[-1].content_assessment_result
+            content_result = pron_results.pop().content_assessment_result
+            output["content_result"] = {
+                "grammar_score": content_result.grammar_score,
+                "vocabulary_score": content_result.vocabulary_score,
+                "topic_score": content_result.topic_score,
+                "content_score": (
+                    content_result.grammar_score
+                    + content_result.vocabulary_score
+                    + content_result.topic_score
+                )
+                / 3,
+            }
+
+        # Calculate the average scores
+        n = len(pron_results)
+        scores["prosody_score"] /= n
+        scores["accuracy_score"] /= n
+        scores["fluency_score"] /= n
+        scores["completeness_score"] /= n
+        scores["pronunciation_score"] /= n
+
+        # print(f"Content Assessment for: {recognized_text.strip()}")
+        output["recognized_text"] = recognized_text.strip()
+        error_counts = defaultdict(int)
+        # 对内容进行评估时，不需要对识别结果进行调整
+        if not with_content_assessment:
+            updated, final_words = adjust_recognized_words_and_scores(
+                reference_text=reference_text,
+                recognized_words=recognized_words,
+                language=language,
+                durations=durations,
+                enable_miscue=True,
+                fluency_scores=fluency_scores,
+            )
+            for k, v in updated.items():
+                scores[k] = v
+
+            # 定义各项分数的权重
+            weights = {
+                "accuracy_score": 0.4,
+                "prosody_score": 0.2,
+                "fluency_score": 0.2,
+                "completeness_score": 0.2,
+            }
+            scores["pronunciation_score"] = sum(
+                scores[key] * weight for key, weight in weights.items()
+            )
+            for word in final_words:
+                # 标点符号不考虑
+                if word.error_type == "Punctuation":
+                    continue
+                error_counts[word.error_type] += 1
+                # logger.debug(f"{word.word=}\t{word.Feedback=}")
+                if word.is_unexpected_break:
+                    error_counts["UnexpectedBreak"] += 1
+                if word.is_missing_break:
+                    error_counts["MissingBreak"] += 1
+                if word.is_monotone:
+                    error_counts["Monotone"] += 1
+        else:
+            final_words = recognized_words
+            for word in final_words:
+                error_counts[word.error_type] += 1
 
-    output["error"] = ""
-    # Content assessment result is in the last pronunciation assessment block
-    if with_content_assessment and pron_results[-1].content_assessment_result is None:
-        output["error"] = "No content assessment result"
+        output["pronunciation_result"] = scores
+        output["recognized_words"] = final_words
+        output["error_counts"] = dict(error_counts)
         return output
 
-    if with_content_assessment:
-        # content_result = pron_results[-1].content_assessment_result
-        content_result = pron_results.pop().content_assessment_result
-        output["content_result"] = {
-            "grammar_score": content_result.grammar_score,
-            "vocabulary_score": content_result.vocabulary_score,
-            "topic_score": content_result.topic_score,
-            "content_score": (
-                content_result.grammar_score
-                + content_result.vocabulary_score
-                + content_result.topic_score
-            )
-            / 3,
-        }
+    return speech_recognizer, build_output
 
-    # Calculate the average scores
-    n = len(pron_results)
-    scores["prosody_score"] /= n
-    scores["accuracy_score"] /= n
-    scores["fluency_score"] /= n
-    scores["completeness_score"] /= n
-    scores["pronunciation_score"] /= n
-
-    # print(f"Content Assessment for: {recognized_text.strip()}")
-    output["recognized_text"] = recognized_text.strip()
-    error_counts = defaultdict(int)
-    # 对内容进行评估时，不需要对识别结果进行调整
-    if not with_content_assessment:
-        updated, final_words = adjust_recognized_words_and_scores(
-            reference_text=reference_text,
-            recognized_words=recognized_words,
-            language=language,
-            durations=durations,
-            enable_miscue=True,
-            fluency_scores=fluency_scores,
-        )
-        for k, v in updated.items():
-            scores[k] = v
-
-        # 定义各项分数的权重
-        weights = {
-            "accuracy_score": 0.4,
-            "prosody_score": 0.2,
-            "fluency_score": 0.2,
-            "completeness_score": 0.2,
-        }
-        scores["pronunciation_score"] = sum(
-            scores[key] * weight for key, weight in weights.items()
-        )
-        for word in final_words:
-            # 标点符号不考虑
-            if word.error_type == "Punctuation":
-                continue
-            error_counts[word.error_type] += 1
-            # logger.debug(f"{word.word=}\t{word.Feedback=}")
-            if word.is_unexpected_break:
-                error_counts["UnexpectedBreak"] += 1
-            if word.is_missing_break:
-                error_counts["MissingBreak"] += 1
-            if word.is_monotone:
-                error_counts["Monotone"] += 1
-    else:
-        final_words = recognized_words
-        for word in final_words:
-            error_counts[word.error_type] += 1
 
-    output["pronunciation_result"] = scores
-    output["recognized_words"] = final_words
-    output["error_counts"] = dict(error_counts)
-    return output
+def _pronunciation_assessment(
+    audio_data: Union[str, Dict],
+    secrets: Dict[str, str],
+    topic: str = None,
+    reference_text: str = None,
+    language="en-US",
+):
+    done = threading.Event()
+    speech_recognizer, build_output = _prepare_pronunciation_assessment(
+        audio_data, secrets, topic, reference_text, language, done.set
+    )
+    # Start continuous pronunciation assessment
+    speech_recognizer.start_continuous_recognition()
+    # 等待会话结束事件，而不是轮询
+    done.wait()
+    speech_recognizer.stop_continuous_recognition()
+    return build_output()
+
+
+async def _pronunciation_assessment_async(
+    audio_data: Union[str, Dict],
+    secrets: Dict[str, str],
+    topic: str = None,
+    reference_text: str = None,
+    language="en-US",
+):
+    loop = asyncio.get_running_loop()
+    done = asyncio.Event()
+    speech_recognizer, build_output = _prepare_pronunciation_assessment(
+        audio_data,
+        secrets,
+        topic,
+        reference_text,
+        language,
+        # 回调在 SDK 线程中触发，需转交事件循环
+        lambda: loop.call_soon_threadsafe(done.set),
+    )
+    # SDK 的 ResultFuture.get() 会阻塞，放到线程池中等待
+    await loop.run_in_executor(
+        None, speech_recognizer.start_continuous_recognition_async().get
+    )
+    await done.wait()
+    await loop.run_in_executor(
+        None, speech_recognizer.stop_continuous_recognition_async().get
+    )
+    return build_output()
 
 
 def pronunciation_assessment_from_stream(
@@ -510,6 +573,109 @@ def pronunciation_assessment_from_stream(
     )
 
 
+async def pronunciation_assessment_from_stream_async(
+    audio_info: Dict[str, any],
+    secrets: Dict[str, str],
+    topic: str = None,
+    reference_text: str = None,
+    language="en-US",
+):
+    """
+    pronunciation_assessment_from_stream 的协程版本。
+
+    多个评估可在同一事件循环中并发执行，例如：
+    await asyncio.gather(*(pronunciation_assessment_from_stream_async(...) for ...))
+    """
+    return await _pronunciation_assessment_async(
+        audio_info,
+        secrets,
+        topic=topic,
+        reference_text=reference_text,
+        language=language,
+    )
+
+
+class PronunciationAssessmentSession:
+    """
+    流式发音评估：边录音边将音频块写入识别器，逐句得到单词评估结果。
+
+    用法：
+        session = PronunciationAssessmentSession(secrets, 16000, 2, reference_text=text)
+        for chunk in chunks:
+            session.write(chunk)
+        output = session.finish()
+
+    输出与 pronunciation_assessment_from_stream 相同。由于识别在录音期间已经完成，
+    finish 只需等待最后一句的结果。
+    """
+
+    def __init__(
+        self,
+        secrets: Dict[str, str],
+        sample_rate: int,
+        sample_width: int,
+        channels: int = 1,
+        topic: str = None,
+        reference_text: str = None,
+        language="en-US",
+        on_words: Callable[[List[_PronunciationAssessmentWordResultV2]], None] = None,
+    ):
+        format = speechsdk.audio.AudioStreamFormat(
+            samples_per_second=sample_rate,
+            bits_per_sample=sample_width * 8,
+            channels=channels,
+        )
+        self._stream = speechsdk.audio.PushAudioInputStream(stream_format=format)
+        self._done = threading.Event()
+        self._words_lock = threading.Lock()
+        self._words = []
+        self._on_words = on_words
+        self._recognizer, self._build_output = _prepare_pronunciation_assessment(
+            self._stream,
+            secrets,
+            topic,
+            reference_text,
+            language,
+            self._done.set,
+            self._add_words,
+        )
+        # 立即开始识别，音频到达后即可逐句得到结果
+        self._recognizer.start_continuous_recognition_async().get()
+
+    def _add_words(self, words):
+        with self._words_lock:
+            self._words.extend(words)
+        if self._on_words is not None:
+            self._on_words(words)
+
+    @property
+    def recognized_words(self) -> List[_PronunciationAssessmentWordResultV2]:
+        """到目前为止已识别出的单词评估结果。"""
+        with self._words_lock:
+            return list(self._words)
+
+    def write(self, chunk: bytes):
+        """写入一段 PCM 音频（不含 wav 文件头）。"""
+        self._stream.write(chunk)
+
+    def finish(self, timeout: float = None):
+        """
+        结束录音并返回评估结果。
+
+        Args:
+            timeout (float, optional): 等待识别结束的最长秒数，默认一直等待。
+
+        Returns:
+            dict: 评估结果，超时时 error 字段说明原因。
+        """
+        self._stream.close()
+        completed = self._done.wait(timeout)
+        self._recognizer.stop_continuous_recognition()
+        if not completed:
+            return {"error": "Pronunciation assessment timed out"}
+        return self._build_output()
+
+
 def pronunciation_assessment_from_wavfile(
     wavfile: str,
     secrets: Dict[str, str],
@@ -15,7 +15,8 @@ import time
 
 # import wave
 from collections import defaultdict
-from typing import Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
 try:
@@ -36,6 +37,186 @@ except ImportError:
 # 创建或获取logger对象
 logger = logging.getLogger("streamlit")
 
+# 批量合成时的默认并发数
+MAX_SYNTHESIS_WORKERS = 4
+
+
+# 合成器池中空闲合成器的最长保留时间（秒）及每个键的最大空闲数
+SYNTHESIZER_IDLE_TIMEOUT = 5 * 60
+MAX_IDLE_SYNTHESIZERS = MAX_SYNTHESIS_WORKERS
+
+
+class _PooledSynthesizer:
+    def __init__(self, speech_key, service_region, voice_name):
+        speech_config = speechsdk.SpeechConfig(
+            subscription=speech_key, region=service_region
+        )
+        speech_config.speech_synthesis_voice_name = voice_name
+        self.synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=speech_config, audio_config=None
+        )
+        self.connected = False
+        self.connection = speechsdk.Connection.from_speech_synthesizer(self.synthesizer)
+        self.connection.connected.connect(lambda evt: self._set_connected(True))
+        self.connection.disconnected.connect(lambda evt: self._set_connected(False))
+        self.last_used = time.monotonic()
+
+    def _set_connected(self, connected):
+        self.connected = connected
+
+    def open(self):
+        # 预先建立连接，完成 TLS 握手
+        self.connection.open(True)
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception as e:
+            logger.debug(f"关闭语音合成连接失败：{e}")
+
+
+class SynthesizerPool:
+    """
+    按 (密钥, 区域, 语音名称) 复用已建立连接的语音合成器，线程安全。
+
+    每个合成器同一时间只被一个线程使用。空闲超过 idle_timeout 秒或连接已断开的
+    合成器会被丢弃；取用时每隔 idle_timeout 秒清理一次所有语音的空闲合成器。stats() 返回建立连接与首字节延迟的统计，用于衡量复用的效果。
+    """
+
+    def __init__(
+        self,
+        idle_timeout=SYNTHESIZER_IDLE_TIMEOUT,
+        max_idle=MAX_IDLE_SYNTHESIZERS,
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        self.idle = defaultdict(list)
+        self.last_sweep = time.monotonic()
+        self.metrics = {
+            "calls": 0,
+            "reused": 0,
+            "created": 0,
+            "evicted": 0,
+            "failed": 0,
+            "connect_ms": 0.0,
+            "first_byte_ms": 0.0,
+            "first_byte_calls": 0,
+        }
+
+    def _acquire(self, key):
+        """取出一个健康的空闲合成器，没有时返回 None。"""
+        now = time.monotonic()
+        if now - self.last_sweep >= self.idle_timeout:
+            # 不再使用的语音不会再被取用，需要定期清理才能关闭其连接
+            self.evict_idle()
+        with self.lock:
+            entries = self.idle[key]
+            while entries:
+                entry = entries.pop()
+                if entry.connected and now - entry.last_used < self.idle_timeout:
+                    return entry
+                self.metrics["evicted"] += 1
+                entry.close()
+        return None
+
+    def _release(self, key, entry):
+        entry.last_used = time.monotonic()
+        with self.lock:
+            entries = self.idle[key]
+            if len(entries) < self.max_idle:
+                entries.append(entry)
+                return
+            self.metrics["evicted"] += 1
+        entry.close()
+
+    def evict_idle(self):
+        """丢弃所有超时或已断开的空闲合成器。"""
+        now = time.monotonic()
+        with self.lock:
+            self.last_sweep = now
+            for key, entries in self.idle.items():
+                keep = []
+                for entry in entries:
+                    if entry.connected and now - entry.last_used < self.idle_timeout:
+                        keep.append(entry)
+                    else:
+                        self.metrics["evicted"] += 1
+                        entry.close()
+                self.idle[key] = keep
+
+    def synthesize(self, text, speech_key, service_region, voice_name):
+        """
+        使用池中的合成器合成语音。
+
+        Returns:
+            SpeechSynthesisResult: The result of the speech synthesis operation.
+        """
+        key = (speech_key, service_region, voice_name)
+        connect_ms = 0.0
+        entry = self._acquire(key)
+        reused = entry is not None
+        if entry is None:
+            start = time.perf_counter()
+            entry = _PooledSynthesizer(speech_key, service_region, voice_name)
+            try:
+                entry.open()
+            except Exception as e:
+                # 预连接失败时，合成时仍会自动建立连接
+                logger.debug(f"预先建立语音合成连接失败：{e}")
+            connect_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            result = entry.synthesizer.speak_text_async(text).get()
+            first_byte_ms = result.properties.get(
+                speechsdk.PropertyId.SpeechServiceResponse_SynthesisFirstByteLatencyMs
+            )
+        except Exception:
+            # 合成抛出异常时关闭合成器，不放回池中
+            with self.lock:
+                self.metrics["failed"] += 1
+            entry.close()
+            raise
+
+        logger.debug(
+            f"语音合成：复用={reused} 建立连接={connect_ms:.0f}ms 首字节={first_byte_ms}ms"
+        )
+        with self.lock:
+            self.metrics["calls"] += 1
+            self.metrics["reused" if reused else "created"] += 1
+            self.metrics["connect_ms"] += connect_ms
+            if first_byte_ms:
+                self.metrics["first_byte_ms"] += float(first_byte_ms)
+                self.metrics["first_byte_calls"] += 1
+
+        if result.reason == speechsdk.ResultReason.Canceled:
+            # 出错的合成器不再放回池中
+            with self.lock:
+                self.metrics["failed"] += 1
+            entry.close()
+        else:
+            self._release(key, entry)
+        return result
+
+    def stats(self) -> dict:
+        """返回调用次数、复用率及平均建立连接和首字节延迟（毫秒）。"""
+        with self.lock:
+            stats = dict(self.metrics)
+            stats["idle"] = sum(len(entries) for entries in self.idle.values())
+        created = stats["created"]
+        stats["reuse_rate"] = (
+            stats["reused"] / stats["calls"] if stats["calls"] else 0.0
+        )
+        stats["avg_connect_ms"] = stats.pop("connect_ms") / created if created else 0.0
+        first_byte_calls = stats.pop("first_byte_calls")
+        stats["avg_first_byte_ms"] = (
+            stats.pop("first_byte_ms") / first_byte_calls if first_byte_calls else 0.0
+        )
+        return stats
+
+
+synthesizer_pool = SynthesizerPool()
+
 
 def synthesize_speech_to_file(
     text,
@@ -44,17 +225,11 @@ def synthesize_speech_to_file(
     service_region,
     voice_name="en-US-JennyMultilingualNeural",
 ):
-    speech_config = speechsdk.SpeechConfig(
-        subscription=speech_key,
-        region=service_region,
-    )
-    # speech_config.speech_synthesis_language = language
-    speech_config.speech_synthesis_voice_name = voice_name
-    audio_config = speechsdk.audio.AudioOutputConfig(filename=fp)  # type: ignore
-    speech_synthesizer = speechsdk.SpeechSynthesizer(
-        speech_config=speech_config, audio_config=audio_config
-    )
-    speech_synthesizer.speak_text_async(text).get()
+    # 使用池中的合成器，再将音频写入文件
+    result = synthesizer_pool.synthesize(text, speech_key, service_region, voice_name)
+    if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+        with open(fp, "wb") as f:
+            f.write(result.audio_data)
     # result = speech_synthesizer.speak_text(text)
     # stream = speechsdk.AudioDataStream(result)
     # stream.save_to_wav_file(fp)
@@ -76,15 +251,62 @@ def synthesize_speech(
     Returns:
         SpeechSynthesisResult: The result of the speech synthesis operation.
     """
-    speech_config = speechsdk.SpeechConfig(
-        subscription=speech_key, region=service_region
+    return synthesizer_pool.synthesize(text, speech_key, service_region, voice_name)
+
+
+def iter_concurrent_synthesis(
+    items: Iterable[Tuple[str, str]],
+    synthesize: Callable[[str, str], object],
+    max_workers: int = MAX_SYNTHESIS_WORKERS,
+) -> Iterator[object]:
+    """
+    使用有界线程池并发合成多段文本，并按输入顺序逐个返回结果。
+
+    第 i 项完成后即可取得，无需等待其后的项目，调用方可以边合成边播放。
+    提前停止迭代时，尚未开始的合成任务会被取消。
+
+    Args:
+        items (Iterable[Tuple[str, str]]): (文本, 语音名称) 列表。
+        synthesize (Callable[[str, str], object]): 合成单段文本的函数，参数为文本和语音名称。
+        max_workers (int, optional): 最大并发数。默认为 MAX_SYNTHESIS_WORKERS。
+
+    Yields:
+        object: 按输入顺序返回的 synthesize 结果。单项合成失败时在该位置抛出异常。
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="speech-synthesis"
     )
-    speech_config.speech_synthesis_voice_name = voice_name
-    speech_synthesizer = speechsdk.SpeechSynthesizer(
-        speech_config=speech_config, audio_config=None
+    try:
+        futures = [executor.submit(synthesize, text, voice) for text, voice in items]
+        for future in futures:
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def synthesize_speech_batch(
+    items: Iterable[Tuple[str, str]],
+    speech_key,
+    service_region,
+    max_workers: int = MAX_SYNTHESIS_WORKERS,
+):
+    """
+    并发合成多段文本，按输入顺序逐个返回 SpeechSynthesisResult。
+
+    Args:
+        items (Iterable[Tuple[str, str]]): (文本, 语音名称) 列表。
+        speech_key (str): The subscription key for the Speech service.
+        service_region (str): The region where the Speech service is hosted.
+        max_workers (int, optional): 最大并发数。默认为 MAX_SYNTHESIS_WORKERS。
+
+    Yields:
+        SpeechSynthesisResult: 每段文本的合成结果。
+    """
+    yield from iter_concurrent_synthesis(
+        items,
+        lambda text, voice: synthesize_speech(text, speech_key, service_region, voice),
+        max_workers,
     )
-    result = speech_synthesizer.speak_text_async(text).get()
-    return result
 
 
 def speech_recognize_once_from_mic(
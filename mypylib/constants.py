@@ -162,6 +162,8 @@ THEME_SCENE = {
 }
 
 FAKE_EMAIL_DOMAIN = "example.com"
+# 后台任务（如练习内容池补充）的系统账户，费用和令牌记录计入该账户
+SYSTEM_USER = "system"
 
 TOPICS = {
     "en-US": [
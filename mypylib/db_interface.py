@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import random
 import re
@@ -16,10 +17,12 @@ from faker import Faker
 from google.cloud import firestore
 from google.cloud.firestore import ArrayUnion, FieldFilter
 
-from .constants import FAKE_EMAIL_DOMAIN
+from .analytics import ScoreDistribution
+from .constants import FAKE_EMAIL_DOMAIN, SYSTEM_USER
 from .db_model import PurchaseType  # LearningTime,
 from .db_model import Payment, PaymentStatus, TokenUsageRecord, User
 from .utils import combine_date_and_time_to_utc
+from .word_state import WordStateIndex
 
 # 创建或获取logger对象
 logger = logging.getLogger("streamlit")
@@ -36,12 +39,72 @@ PRICES = {
 
 CACHE_TRIGGER_SIZE = 100
 MAX_TIME_INTERVAL = 10 * 60  # 10 分钟
+# 学习历史写回缓存的触发条件
+HISTORY_CACHE_TRIGGER_SIZE = 20
+HISTORY_MAX_TIME_INTERVAL = 3 * 60  # 3 分钟
+# 需要维护单词统计的集合及其统计字段
+WORD_STATS_FIELDS = {
+    "performances": "word_pass_stats",
+    "exercises": "word_duration_stats",
+}
+# 学习历史记录的时间字段
+HISTORY_TIME_FIELDS = {
+    "exercises": "timestamp",
+    "performances": "record_time",
+}
+# 学习历史分桶存储的子集合名称及分桶格式（UTC 日期）
+HISTORY_BUCKET_COLLECTION = "buckets"
+HISTORY_BUCKET_FORMATS = {
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+# 批处理最多包含的写入操作数量
+MAX_BATCH_SIZE = 500
+# 使用记录事件的子集合名称及查询结果的列
+USAGE_EVENTS_COLLECTION = "usage_events"
+USAGE_COLUMNS = [
+    "phone_number",
+    "service_name",
+    "item_name",
+    "cost",
+    "model",
+    "timestamp",
+]
+# 每日费用汇总的集合名称、日期所用时区及查询结果的列
+USAGE_ROLLUPS_COLLECTION = "usage_rollups"
+ROLLUP_TIMEZONE = "Asia/Shanghai"
+ROLLUP_COLUMNS = [
+    "timestamp",
+    "service_name",
+    "item_name",
+    "model",
+    "cost",
+    "total_tokens",
+    "count",
+]
+# 成绩分布的集合名称，每个 (UTC 日期, 项目, 省份) 一个文档，避免单个文档超过 1 MiB；
+# 分布按截至当日的最近几天汇总
+SCORE_COHORTS_COLLECTION = "score_cohorts"
+SCORE_COHORT_DAYS = 7
+UNKNOWN_PROVINCE = "未知"
 
 
 class DbInterface:
-    def __init__(self, firestore_client):
+    def __init__(self, firestore_client, history_bucket=None):
+        """
+        Args:
+            firestore_client: Firestore 客户端。
+            history_bucket (str, optional): 学习历史的存储方式。默认为 None，
+                即存储在用户文档的 history 数组中；"day" 或 "month" 表示按日或按月
+                分桶存储在用户文档的 buckets 子集合中。
+        """
+        if history_bucket is not None and history_bucket not in HISTORY_BUCKET_FORMATS:
+            raise ValueError(
+                f"history_bucket 必须是 {list(HISTORY_BUCKET_FORMATS)} 之一或 None。"
+            )
         self.faker = Faker("zh_CN")
         self.db = firestore_client
+        self.history_bucket = history_bucket
         self.last_check_time = time.time()
         self.cache = {
             "user_info": {},
@@ -51,7 +114,18 @@ class DbInterface:
                 "to_add": [],
                 "to_delete": [],
             },
+            # 待写入的学习历史，按 (手机号码, 集合名称) 分组，切换用户时不会混入其他用户
+            "history": {},
+            # 单词统计的本地副本，按集合名称分组
+            "word_stats": {},
+            # 单词状态索引，见 get_word_state_index
+            "word_index": None,
+            # 各集合学习历史的版本，新增记录时递增
+            "history_version": {},
         }
+        self.history_lock = threading.RLock()
+        # 使用记录可能由后台计量线程写入
+        self.usage_lock = threading.Lock()
         self.start_timer()
 
     def start_timer(self):
@@ -240,6 +314,14 @@ class DbInterface:
         phone_number = self.cache["user_info"]["phone_number"]
         session_id = self.cache["user_info"]["session_id"]
 
+        # 退出前将缓存的使用记录和学习历史写入数据库
+        # 写入失败的记录已按用户保存，由定时器重试，不会计入下一个登录的用户
+        self.flush_usage()
+        if not self.flush_history():
+            logger.error(f"用户 {phone_number} 退出时学习历史未能全部写入，稍后重试")
+        self.cache["word_stats"] = {}
+        self.cache["word_index"] = None
+
         # 获取用户的文档引用
         user_doc_ref = self.db.collection("authentication").document(phone_number)
 
@@ -409,6 +491,39 @@ class DbInterface:
         user_doc_ref = self.db.collection("users").document(phone_number)
         user_doc_ref.update({"total_tokens": firestore.Increment(used_token_count)})
 
+    def add_token_records(self, records):
+        """
+        批量添加 token 记录，并按用户累加 total_tokens。
+
+        Args:
+            records (list): 记录列表，每项包含 phone_number, token_type,
+                used_token_count 和 used_at。
+        """
+        totals = {}
+        for i in range(0, len(records), MAX_BATCH_SIZE // 2):
+            batch = self.db.batch()
+            for record in records[i : i + MAX_BATCH_SIZE // 2]:
+                used_token = TokenUsageRecord(**record)
+                batch.set(
+                    self.db.collection("token_records").document(),
+                    used_token.model_dump(),
+                )
+                totals[record["phone_number"]] = (
+                    totals.get(record["phone_number"], 0) + record["used_token_count"]
+                )
+            batch.commit()
+
+        batch = self.db.batch()
+        for phone_number, used_token_count in totals.items():
+            # 系统账户没有用户文档
+            if phone_number == SYSTEM_USER:
+                continue
+            batch.update(
+                self.db.collection("users").document(phone_number),
+                {"total_tokens": firestore.Increment(used_token_count)},
+            )
+        batch.commit()
+
     # endregion
 
     # region 支付管理
@@ -835,263 +950,1022 @@ class DbInterface:
         """
         根据电话号码获取使用记录。
 
+        使用记录存储在 usages/{phone_number}/usage_events 子集合中，按 timestamp
+        在服务端进行范围查询；查询所有用户时使用 usage_events 集合组查询（需要为
+        集合组启用 timestamp 单字段索引）。尚未迁移的 usages 数组通过 get_all
+        批量读取。
+
         Args:
             phone_number (str): 要查询的电话号码，如果为 "ALL"，则查询所有记录。
             start_date (datetime.date, optional): 开始日期。默认为 None。
             end_date (datetime.date, optional): 结束日期。默认为 None。
 
         Returns:
-            list: 包含所有匹配的使用记录的列表，每个记录是一个字典，包含 item_name, cost 和 timestamp 字段。
+            pd.DataFrame: 使用记录，包含 phone_number, service_name, item_name, cost,
+                model 和 timestamp 列。
         """
         user_info = self.cache.get("user_info", {})
         timezone_str = user_info.get("timezone", "Asia/Shanghai")
         tz = pytz.timezone(timezone_str)
-        collection_ref = self.db.collection("usages")
-        usage_records = []
+        columns = {name: [] for name in USAGE_COLUMNS}
 
-        start_timestamp = None
-        end_timestamp = None
+        start_datetime = None
+        end_datetime = None
 
         if start_date is not None:
             start_datetime = combine_date_and_time_to_utc(
                 start_date, timezone_str, True
             )
-            start_timestamp = start_datetime.timestamp()
 
         if end_date is not None:
             end_datetime = combine_date_and_time_to_utc(end_date, timezone_str, False)
-            end_timestamp = end_datetime.timestamp()
 
-        if phone_number != "ALL":
-            phone_numbers = [phone_number]
+        for phone, usage in self._iter_usages(
+            phone_number, start_datetime, end_datetime
+        ):
+            _append_usage(columns, phone, usage, tz)
+
+        return pd.DataFrame(columns)
+
+    def _iter_usages(self, phone_number, start_datetime=None, end_datetime=None):
+        """
+        逐条返回指定时间范围内的使用记录。
+
+        Args:
+            phone_number (str): 电话号码，如果为 "ALL"，则返回所有用户的记录。
+            start_datetime (datetime.datetime, optional): 开始时间（含时区）。
+            end_datetime (datetime.datetime, optional): 结束时间（含时区）。
+
+        Yields:
+            tuple: (电话号码, 使用记录字典)。
+        """
+        collection_ref = self.db.collection("usages")
+
+        # 使用事件：服务端按时间范围查询
+        if phone_number == "ALL":
+            query = self.db.collection_group(USAGE_EVENTS_COLLECTION)
+        else:
+            query = collection_ref.document(phone_number).collection(
+                USAGE_EVENTS_COLLECTION
+            )
+        if start_datetime is not None:
+            query = query.where(filter=FieldFilter("timestamp", ">=", start_datetime))
+        if end_datetime is not None:
+            query = query.where(filter=FieldFilter("timestamp", "<=", end_datetime))
+        for event in query.stream():
+            usage = event.to_dict()
+            yield usage.get("phone_number") or event.reference.parent.parent.id, usage
+
+        # 旧的 usages 数组：批量读取后在本地筛选
+        if phone_number == "ALL":
+            doc_refs = list(collection_ref.list_documents())
         else:
-            # 获取所有文档的 ID
-            phone_numbers = [doc.id for doc in collection_ref.stream()]
+            doc_refs = [collection_ref.document(phone_number)]
+        for doc in self.db.get_all(doc_refs, field_paths=["usages"]):
+            if not doc.exists:
+                continue
+            for usage in doc.to_dict().get("usages", []):
+                timestamp = usage["timestamp"]
+                if start_datetime is not None and timestamp < start_datetime:
+                    continue
+                if end_datetime is not None and timestamp > end_datetime:
+                    continue
+                yield doc.id, usage
+
+    def get_usage_rollups(self, start_date=None, end_date=None):
+        """
+        读取每日费用汇总。
 
-        for phone_number in phone_numbers:
-            doc_ref = collection_ref.document(phone_number)
-            doc = doc_ref.get()
-            if doc.exists:
-                usages = doc.to_dict().get("usages", [])
-                for usage in usages:
-                    timestamp = usage["timestamp"].timestamp()
-                    if start_timestamp is not None and timestamp < start_timestamp:
-                        continue
-                    if end_timestamp is not None and timestamp > end_timestamp:
-                        continue
-
-                    timestamp_datetime = datetime.fromtimestamp(timestamp)
-                    timestamp_in_timezone = timestamp_datetime.astimezone(tz)
-                    usage_records.append(
-                        {
-                            "phone_number": phone_number,
-                            "service_name": usage["service_name"],
-                            "item_name": usage["item_name"],
-                            "cost": usage["cost"],
-                            "model": usage.get("model_name", ""),
-                            "timestamp": timestamp_in_timezone,
-                        }
-                    )
+        汇总按 ROLLUP_TIMEZONE 时区的日期存储在 usage_rollups 集合中，每个文档
+        包含当日按服务、项目和模型分组的费用、令牌数和调用次数。
 
-        return usage_records
+        Args:
+            start_date (datetime.date, optional): 开始日期。默认为 None。
+            end_date (datetime.date, optional): 结束日期。默认为 None。
 
-    def add_usage_to_cache(self, usage: dict):
-        # 定义缓存
-        if "usage_cache" not in self.cache:
-            self.cache["usage_cache"] = []
-            self.cache["usage_last_save_time"] = time.time()
+        Returns:
+            pd.DataFrame: 包含 timestamp, service_name, item_name, model, cost,
+                total_tokens 和 count 列，每行对应一天中的一个分组。
+        """
+        query = self.db.collection(USAGE_ROLLUPS_COLLECTION)
+        if start_date is not None:
+            query = query.where(filter=FieldFilter("date", ">=", str(start_date)))
+        if end_date is not None:
+            query = query.where(filter=FieldFilter("date", "<=", str(end_date)))
 
-        self.cache["usage_cache"].append(usage)
+        tz = pytz.timezone(ROLLUP_TIMEZONE)
+        columns = {name: [] for name in ROLLUP_COLUMNS}
+        for doc in query.stream():
+            doc_dict = doc.to_dict()
+            day = tz.localize(datetime.strptime(doc_dict["date"], "%Y-%m-%d"))
+            for row in doc_dict.get("rows", {}).values():
+                columns["timestamp"].append(day)
+                for name in ROLLUP_COLUMNS[1:]:
+                    columns[name].append(row.get(name, 0))
+        return pd.DataFrame(columns)
+
+    def backfill_usage_rollups(self, start_date=None, end_date=None):
+        """
+        根据已有的使用记录重建每日费用汇总（覆盖写入）。
 
-        # 如果缓存数量超过限制或者时间超过限制，将缓存中的 usage 对象保存到数据库
-        if (
-            len(self.cache["usage_cache"]) > CACHE_TRIGGER_SIZE
-            or time.time() - self.cache["usage_last_save_time"] > MAX_TIME_INTERVAL
-        ):
-            self.save_usage(self.cache["usage_cache"])
+        Args:
+            start_date (datetime.date, optional): 开始日期。默认为 None。
+            end_date (datetime.date, optional): 结束日期。默认为 None。
+
+        Returns:
+            int: 写入的汇总文档数量。
+        """
+        start_datetime = None
+        end_datetime = None
+        if start_date is not None:
+            start_datetime = combine_date_and_time_to_utc(
+                start_date, ROLLUP_TIMEZONE, True
+            )
+        if end_date is not None:
+            end_datetime = combine_date_and_time_to_utc(
+                end_date, ROLLUP_TIMEZONE, False
+            )
+
+        rollups = {}
+        for _, usage in self._iter_usages("ALL", start_datetime, end_datetime):
+            _add_usage_to_rollups(rollups, usage)
+
+        days = list(rollups.items())
+        for i in range(0, len(days), MAX_BATCH_SIZE):
+            batch = self.db.batch()
+            for date_str, rows in days[i : i + MAX_BATCH_SIZE]:
+                batch.set(
+                    self.db.collection(USAGE_ROLLUPS_COLLECTION).document(date_str),
+                    {"date": date_str, "rows": rows},
+                )
+            batch.commit()
+        return len(days)
+
+    def add_usage_to_cache(self, usage: dict):
+        """
+        将使用记录加入缓存。usage 中没有 phone_number 时记为当前用户，
+        以便用户退出或切换后再写入时仍计入产生费用的用户。
+        """
+        with self.usage_lock:
+            # 定义缓存
+            if "usage_cache" not in self.cache:
+                self.cache["usage_cache"] = []
+                self.cache["usage_last_save_time"] = time.time()
+
+            if "phone_number" not in usage:
+                usage = {
+                    **usage,
+                    "phone_number": self.cache["user_info"]["phone_number"],
+                }
+            self.cache["usage_cache"].append(usage)
+
+            # 如果缓存数量超过限制或者时间超过限制，将缓存中的 usage 对象保存到数据库
+            if (
+                len(self.cache["usage_cache"]) > CACHE_TRIGGER_SIZE
+                or time.time() - self.cache["usage_last_save_time"] > MAX_TIME_INTERVAL
+            ):
+                self.flush_usage()
+
+    def flush_usage(self):
+        """将缓存中的使用记录写入数据库。"""
+        with self.usage_lock:
+            if not self.cache.get("usage_cache"):
+                return
+            try:
+                self.save_usage(self.cache["usage_cache"])
+            except Exception as e:
+                logger.error(f"写入使用记录失败：{e}")
+                return
             self.cache["usage_cache"] = []
             self.cache["usage_last_save_time"] = time.time()
 
     def save_usage(self, usage_list):
-        if len(usage_list) == 0:
-            return
-        phone_number = self.cache["user_info"]["phone_number"]
-        batch = self.db.batch()
-
+        """按使用记录中的 phone_number 分组写入各用户的事件子集合。"""
+        users = {}
+        for usage in usage_list:
+            users.setdefault(usage["phone_number"], []).append(usage)
+        for phone_number, user_usages in users.items():
+            self._save_user_usage(phone_number, user_usages)
+
+    def _save_user_usage(self, phone_number, usage_list):
         doc_ref = self.db.collection("usages").document(phone_number)
-        batch.set(doc_ref, {"usages": firestore.ArrayUnion(usage_list)}, merge=True)
+        events_ref = doc_ref.collection(USAGE_EVENTS_COLLECTION)
 
-        batch.commit()
+        # 每个使用事件单独存储为一个文档，以便按时间范围查询
+        # 每批预留用户文档与汇总文档的写入操作
+        step = MAX_BATCH_SIZE // 2
+        for i in range(0, len(usage_list), step):
+            usages = usage_list[i : i + step]
+            batch = self.db.batch()
+            rollups = {}
+            for usage in usages:
+                batch.set(events_ref.document(), usage)
+                _add_usage_to_rollups(rollups, usage)
+            # 同步递增每日费用汇总
+            for date_str, rows in rollups.items():
+                batch.set(
+                    self.db.collection(USAGE_ROLLUPS_COLLECTION).document(date_str),
+                    {"date": date_str, "rows": _to_rollup_increments(rows)},
+                    merge=True,
+                )
+            # 更新用户文档，确保集合中可以列出该用户
+            batch.set(
+                doc_ref,
+                {
+                    "event_count": firestore.Increment(len(usages)),
+                    "last_usage_time": max(usage["timestamp"] for usage in usages),
+                },
+                merge=True,
+            )
+            batch.commit()
+
+    def migrate_usages_to_events(self, phone_number):
+        """
+        将 usages 文档中的 usages 数组迁移为 usage_events 子集合中的事件文档。
+
+        事件文档使用固定的 ID，event_count 的增量和 usages 数组的删除与最后一批事件
+        在同一批次中提交，中断后重新执行不会产生重复记录或重复计数；
+        不会覆盖迁移前实时写入累加的 event_count。
+
+        Args:
+            phone_number (str): 用户手机号码。
+
+        Returns:
+            int: 迁移的记录数量。
+        """
+        doc_ref = self.db.collection("usages").document(phone_number)
+        doc = doc_ref.get()
+        if not doc.exists:
+            return 0
+        usages = doc.to_dict().get("usages")
+        if not usages:
+            return 0
+        events_ref = doc_ref.collection(USAGE_EVENTS_COLLECTION)
+        # 每批留出一个位置给最后的用户文档更新
+        batch_size = MAX_BATCH_SIZE - 1
+        for i in range(0, len(usages), batch_size):
+            batch = self.db.batch()
+            for j, usage in enumerate(usages[i : i + batch_size], start=i):
+                # 使用固定的文档 ID，重复迁移时不会产生重复记录
+                batch.set(
+                    events_ref.document(f"legacy-{j:06d}"),
+                    {**usage, "phone_number": phone_number},
+                )
+            if i + batch_size >= len(usages):
+                batch.set(
+                    doc_ref,
+                    {
+                        "event_count": firestore.Increment(len(usages)),
+                        "usages": firestore.DELETE_FIELD,
+                    },
+                    merge=True,
+                )
+            batch.commit()
+        return len(usages)
 
     def save_cache(self):
-        if "usage_cache" in self.cache and self.cache["usage_cache"]:
-            self.save_usage(self.cache["usage_cache"])
-            self.cache["usage_cache"] = []
-            self.cache["usage_last_save_time"] = time.time()
+        self.flush_usage()
+        # 包括已退出用户写入失败、仍在缓存中的记录
+        self.flush_history()
         self.start_timer()
 
     # endregion
 
     # region 通用函数
+
+    def _get_word_stats_cache(self, phone_number, collection_name):
+        entry = self.cache["word_stats"].get(collection_name)
+        if entry is not None and entry["phone_number"] == phone_number:
+            return entry
+        return None
+
+    def _cache_word_stats(self, phone_number, collection_name, stats, synced):
+        """
+        缓存单词统计的本地副本，并合并尚未写入数据库的增量。
+
+        Args:
+            phone_number (str): 用户手机号码。
+            collection_name (str): 集合名称。
+            stats (dict): 从数据库读取（或由 history 重建）的统计。
+            synced (bool): 数据库中是否已存在该统计字段。
+        """
+        pending = self.cache["history"].get(phone_number, {}).get(collection_name)
+        if pending is not None:
+            _merge_word_stats(collection_name, stats, pending["word_stats"])
+        self.cache["word_stats"][collection_name] = {
+            "phone_number": phone_number,
+            "stats": stats,
+            "synced": synced,
+        }
+        return stats
+
     def generate_word_pass_stats(self, phone_number, collection_name):
         # phone_number = self.cache["user_info"]["phone_number"]
-        doc = self.db.collection(collection_name).document(phone_number).get()
+        with self.history_lock:
+            cached = self._get_word_stats_cache(phone_number, collection_name)
+            if cached is not None:
+                return cached["stats"]
 
-        # 将文档转换为字典
-        doc_dict = doc.to_dict()
+            doc = self.db.collection(collection_name).document(phone_number).get()
 
-        # 检查文档是否存在
-        if doc_dict is None:
-            return {}
+            # 将文档转换为字典
+            doc_dict = doc.to_dict()
 
-        # 从字典中获取word_pass_stats
-        word_pass_stats = doc_dict.get("word_pass_stats")
+            # 检查文档是否存在
+            if doc_dict is None:
+                return self._cache_word_stats(phone_number, collection_name, {}, True)
 
-        # 如果word_pass_stats不存在，初始化为一个空字典
-        if word_pass_stats is None:
-            word_pass_stats = {}
-        else:
-            return word_pass_stats
-
-        # 从字典中获取history
-        history = doc_dict.get("history")
-
-        # 如果history存在
-        if history:
-            # 遍历每个评分文档
-            for grading_doc in history:
-                # 从评分文档中获取word_results
-                word_results = grading_doc.get("word_results")
-                # 如果word_results存在，统计生成word_pass_stats
-                if word_results:
-                    for word, passed in word_results.items():
-                        if word not in word_pass_stats:
-                            word_pass_stats[word] = {"passed": 0, "failed": 0}
-                        if passed:
-                            word_pass_stats[word]["passed"] += 1
-                        else:
-                            word_pass_stats[word]["failed"] += 1
+            # 从字典中获取word_pass_stats
+            word_pass_stats = doc_dict.get("word_pass_stats")
+
+            # 如果word_pass_stats不存在，初始化为一个空字典
+            if word_pass_stats is None:
+                word_pass_stats = {}
+            else:
+                return self._cache_word_stats(
+                    phone_number, collection_name, word_pass_stats, True
+                )
 
-        # 返回word_pass_stats
-        return word_pass_stats
+            # 从字典中获取history
+            history = doc_dict.get("history")
+
+            # 如果history存在，统计生成word_pass_stats
+            if history:
+                _merge_word_stats(
+                    collection_name, word_pass_stats, _word_pass_deltas(history)
+                )
+
+            # 返回word_pass_stats
+            return self._cache_word_stats(
+                phone_number, collection_name, word_pass_stats, False
+            )
 
     def generate_word_duration_stats(self, phone_number, collection_name):
         # 从doc_ref中获取文档
-        phone_number = self.cache["user_info"]["phone_number"]
-        doc = self.db.collection(collection_name).document(phone_number).get()
+        with self.history_lock:
+            cached = self._get_word_stats_cache(phone_number, collection_name)
+            if cached is not None:
+                return cached["stats"]
 
-        # 将文档转换为字典
-        doc_dict = doc.to_dict()
-        # 检查文档是否存在
-        if doc_dict is None:
-            return {}
-        # 从字典中获取word_pass_stats
-        word_duration_stats = doc_dict.get("word_duration_stats")
+            doc = self.db.collection(collection_name).document(phone_number).get()
 
-        # 如果word_pass_stats不存在，初始化为一个空字典
-        if word_duration_stats is None:
-            word_duration_stats = {}
-        else:
-            return word_duration_stats
+            # 将文档转换为字典
+            doc_dict = doc.to_dict()
+            # 检查文档是否存在
+            if doc_dict is None:
+                return self._cache_word_stats(phone_number, collection_name, {}, True)
+            # 从字典中获取word_duration_stats
+            word_duration_stats = doc_dict.get("word_duration_stats")
+
+            # 如果word_duration_stats不存在，初始化为一个空字典
+            if word_duration_stats is None:
+                word_duration_stats = {}
+            else:
+                return self._cache_word_stats(
+                    phone_number, collection_name, word_duration_stats, True
+                )
 
-        # 从字典中获取history
-        history = doc_dict.get("history")
+            # 从字典中获取history
+            history = doc_dict.get("history")
 
-        # 如果history存在
-        if history:
-            for document in history:
-                # 使用正则表达式提取单词
-                match = re.search(r"单词练习-.*?-([a-zA-Z\s]+)$", document["item"])
-                if match:
-                    word = match.group(1)
-                    # 累加持续时间
-                    if word not in word_duration_stats:
-                        word_duration_stats[word] = 0
-                    word_duration_stats[word] += document["duration"]
+            # 如果history存在，累加各单词的学习时长
+            if history:
+                _merge_word_stats(
+                    collection_name,
+                    word_duration_stats,
+                    _word_duration_deltas(history),
+                )
 
-        return word_duration_stats
+            return self._cache_word_stats(
+                phone_number, collection_name, word_duration_stats, False
+            )
 
     def add_documents_to_user_history(self, collection_name, documents):
+        """
+        将文档加入学习历史的写回缓存。
+
+        文档及其单词统计增量先在内存中累积，达到数量或时间阈值、定时器触发
+        或用户退出时，再通过一次批处理写入数据库。文档按加入时的用户分组，
+        写入失败时保留在该用户名下，不会在切换用户后写入其他用户的文档。
+        """
         assert isinstance(documents, list), "documents 必须是一个列表。"
         if len(documents) == 0:
             return
-        # 开始批处理
-        batch = self.db.batch()
-        phone_number = self.cache["user_info"]["phone_number"]
 
-        # 创建一个新的文档引用
-        doc_ref = self.db.collection(collection_name).document(phone_number)
+        with self.history_lock:
+            phone_number = self.cache["user_info"]["phone_number"]
+            pending = (
+                self.cache["history"]
+                .setdefault(phone_number, {})
+                .setdefault(
+                    collection_name,
+                    {"docs": [], "word_stats": {}, "last_commit_time": time.time()},
+                )
+            )
+            pending["docs"].extend(documents)
+            versions = self.cache["history_version"]
+            versions[collection_name] = versions.get(collection_name, 0) + 1
+
+            if collection_name == "performances":
+                deltas = _word_pass_deltas(documents)
+            elif collection_name == "exercises":
+                deltas = _word_duration_deltas(documents)
+            else:
+                deltas = {}
+
+            if deltas:
+                _merge_word_stats(collection_name, pending["word_stats"], deltas)
+                # 同步更新本地副本，无需重新读取数据库
+                cached = self._get_word_stats_cache(phone_number, collection_name)
+                if cached is not None:
+                    _merge_word_stats(collection_name, cached["stats"], deltas)
+                index = self.cache["word_index"]
+                if index is not None and index.phone_number == phone_number:
+                    index.add_documents(collection_name, documents)
+
+            if (
+                len(pending["docs"]) >= HISTORY_CACHE_TRIGGER_SIZE
+                or time.time() - pending["last_commit_time"]
+                >= HISTORY_MAX_TIME_INTERVAL
+            ):
+                self.flush_history()
+
+    def flush_history(self):
+        """
+        将写回缓存中的学习历史与单词统计增量写入数据库，每个用户一次批处理。
 
-        # 将整个文档列表添加到 'history' 字段的数组中
-        batch.set(doc_ref, {"history": firestore.ArrayUnion(documents)}, merge=True)
-        # 提交批处理
-        batch.commit()
-        
-        if collection_name == "performances":
-            word_results_total = {}
-            for document in documents:
-                if "word_results" in document:
-                    word_results = document["word_results"]
-                    # 累加所有的word_results到word_results_total
-                    for word, passed in word_results.items():
-                        if word not in word_results_total:
-                            word_results_total[word] = {"passed": 0, "failed": 0}
-                        if passed:
-                            word_results_total[word]["passed"] += 1
+        Returns:
+            bool: 是否全部写入成功。失败的记录保留在缓存中，下次写入时重试。
+        """
+        with self.history_lock:
+            ok = True
+            current = self.cache["user_info"].get("phone_number")
+            for phone_number in list(self.cache["history"]):
+                ok = self._flush_user_history(phone_number) and ok
+                # 已写入的其他用户（例如已退出的用户）不再保留
+                if phone_number != current and not any(
+                    pending["docs"]
+                    for pending in self.cache["history"][phone_number].values()
+                ):
+                    del self.cache["history"][phone_number]
+            return ok
+
+    def _flush_user_history(self, phone_number):
+        with self.history_lock:
+            pendings = {
+                name: pending
+                for name, pending in self.cache["history"][phone_number].items()
+                if pending["docs"]
+            }
+            if not pendings:
+                return True
+
+            batch = self.db.batch()
+            newly_synced = []
+            for collection_name, pending in pendings.items():
+                doc_ref = self.db.collection(collection_name).document(phone_number)
+                if self.history_bucket is None:
+                    data = {"history": firestore.ArrayUnion(pending["docs"])}
+                else:
+                    # 按时间分桶写入子集合，并递增用户文档的汇总计数
+                    buckets = _group_history_by_bucket(
+                        collection_name, pending["docs"], self.history_bucket
+                    )
+                    for bucket_id, docs in buckets.items():
+                        batch.set(
+                            doc_ref.collection(HISTORY_BUCKET_COLLECTION).document(
+                                bucket_id
+                            ),
+                            {
+                                "bucket": bucket_id,
+                                "collection": collection_name,
+                                "history": firestore.ArrayUnion(docs),
+                                "totals": _to_total_increments(
+                                    _history_totals(collection_name, docs)
+                                ),
+                            },
+                            merge=True,
+                        )
+                    data = {
+                        "history_bucket": self.history_bucket,
+                        "totals": _to_total_increments(
+                            _history_totals(collection_name, pending["docs"])
+                        ),
+                    }
+
+                field = WORD_STATS_FIELDS.get(collection_name)
+                if field is not None and pending["word_stats"]:
+                    cached = self._get_word_stats_cache(phone_number, collection_name)
+                    if cached is None:
+                        # 首次写入前读取一次，以处理数据库中尚无统计字段的旧文档
+                        if collection_name == "performances":
+                            self.generate_word_pass_stats(phone_number, collection_name)
                         else:
-                            word_results_total[word]["failed"] += 1
+                            self.generate_word_duration_stats(
+                                phone_number, collection_name
+                            )
+                        cached = self._get_word_stats_cache(
+                            phone_number, collection_name
+                        )
 
-            # 读取当前的word_pass_stats
-            current_word_pass_stats = self.generate_word_pass_stats(
-                phone_number, collection_name
-            )
+                    if cached["synced"]:
+                        data[field] = _to_increments(
+                            collection_name, pending["word_stats"]
+                        )
+                    else:
+                        # 数据库中没有统计字段，写入完整的本地副本
+                        data[field] = cached["stats"]
+                        newly_synced.append(cached)
 
-            # 合并当前的word_pass_stats和新的word_results_total
-            for word, results in word_results_total.items():
-                if word not in current_word_pass_stats:
-                    current_word_pass_stats[word] = {"passed": 0, "failed": 0}
-                current_word_pass_stats[word]["passed"] += results["passed"]
-                current_word_pass_stats[word]["failed"] += results["failed"]
+                batch.set(doc_ref, data, merge=True)
 
-            # 更新word_pass_stats
             try:
-                doc_ref.update({"word_pass_stats": current_word_pass_stats})
-            except firestore.exceptions.NotFound:
-                # 如果文档不存在，创建一个新文档
-                doc_ref.set({"word_pass_stats": current_word_pass_stats})
-            # logger.info(f"已更新 word_pass_stats")
-
-        if collection_name == "exercises":
-            word_duration_total = {}
-            for document in documents:
-                # 使用正则表达式提取单词
-                match = re.search(r"单词练习-.*?-([a-zA-Z\s]+)$", document["item"])
-                if match:
-                    word = match.group(1)
-                    # 累加持续时间
-                    if word not in word_duration_total:
-                        word_duration_total[word] = 0
-                    word_duration_total[word] += document["duration"]
-                    # logger.info(f"单词：{word}，持续时间：{word_duration_total[word]}")
-
-            # 读取当前的word_duration_stats
-            current_word_duration_stats = self.generate_word_duration_stats(
-                phone_number, collection_name
+                batch.commit()
+            except Exception as e:
+                logger.error(f"写入学习历史失败：{phone_number} {e}")
+                return False
+
+            for cached in newly_synced:
+                cached["synced"] = True
+            for pending in pendings.values():
+                pending["docs"] = []
+                pending["word_stats"] = {}
+                pending["last_commit_time"] = time.time()
+            return True
+
+    def get_history_version(self, collection_name):
+        """
+        返回当前会话中学习历史的版本，每次新增记录后改变。
+
+        报告按 (用户, 版本) 缓存数据，新增记录后自动失效。
+        """
+        session_id = self.cache["user_info"].get("session_id")
+        version = self.cache["history_version"].get(collection_name, 0)
+        return f"{session_id}-{version}"
+
+    def get_word_state_index(self, phone_number) -> WordStateIndex:
+        """
+        返回用户的单词状态索引。
+
+        首次调用时由单词统计初始化（统计已包含尚未写入数据库的记录），
+        此后由 add_documents_to_user_history 增量更新。
+        """
+        with self.history_lock:
+            index = self.cache["word_index"]
+            if index is None or index.phone_number != phone_number:
+                index = WordStateIndex.from_stats(
+                    phone_number,
+                    self.generate_word_pass_stats(phone_number, "performances"),
+                    self.generate_word_duration_stats(phone_number, "exercises"),
+                )
+                # 补充尚未写入数据库的记录的学习时间
+                pendings = self.cache["history"].get(phone_number, {})
+                for collection_name, pending in pendings.items():
+                    for document in pending["docs"]:
+                        for word in _document_words(collection_name, document):
+                            index.seen(
+                                word,
+                                document.get(HISTORY_TIME_FIELDS[collection_name]),
+                            )
+                self.cache["word_index"] = index
+            return index
+
+    def get_user_history(
+        self, collection_name, phone_number, start_time=None, end_time=None
+    ):
+        """
+        读取用户在指定时间范围内的学习历史记录。
+
+        分桶存储时只读取与时间范围相交的分桶文档。
+
+        Args:
+            collection_name (str): 集合名称，"exercises" 或 "performances"。
+            phone_number (str): 用户手机号码。
+            start_time (datetime.datetime, optional): 开始时间（含时区）。默认为 None。
+            end_time (datetime.datetime, optional): 结束时间（含时区）。默认为 None。
+
+        Returns:
+            list: 历史记录字典的列表。
+        """
+        # 先写入当前用户缓存中的记录，保证报告包含最新数据
+        if self.cache["user_info"].get("phone_number") == phone_number:
+            self.flush_history()
+
+        doc_ref = self.db.collection(collection_name).document(phone_number)
+        if self.history_bucket is None:
+            doc = doc_ref.get()
+            records = doc.to_dict().get("history", []) if doc.exists else []
+        else:
+            fmt = HISTORY_BUCKET_FORMATS[self.history_bucket]
+            query = doc_ref.collection(HISTORY_BUCKET_COLLECTION)
+            if start_time is not None:
+                query = query.where(
+                    filter=FieldFilter(
+                        "bucket",
+                        ">=",
+                        start_time.astimezone(timezone.utc).strftime(fmt),
+                    )
+                )
+            if end_time is not None:
+                query = query.where(
+                    filter=FieldFilter(
+                        "bucket", "<=", end_time.astimezone(timezone.utc).strftime(fmt)
+                    )
+                )
+            records = [
+                record
+                for bucket in query.stream()
+                for record in bucket.to_dict().get("history", [])
+            ]
+
+        time_field = HISTORY_TIME_FIELDS[collection_name]
+        record_list = []
+        for record in records:
+            timestamp = record.get(time_field)
+            if not timestamp:
+                continue
+            timestamp = timestamp.astimezone(timezone.utc)
+            if (start_time is None or start_time <= timestamp) and (
+                end_time is None or timestamp <= end_time
+            ):
+                record_list.append(record)
+        return record_list
+
+    def get_history_on_dates(self, collection_name, dates):
+        """
+        读取所有用户在指定日期（UTC）的学习历史记录。
+
+        分桶存储时使用 buckets 集合组查询，需要为集合组的 collection 与 bucket
+        字段启用单字段索引。
+
+        Args:
+            collection_name (str): 集合名称，"exercises" 或 "performances"。
+            dates (list): UTC 日期列表，不超过 30 个。
+
+        Returns:
+            list: (手机号码, 历史记录字典) 元组的列表。
+        """
+        time_field = HISTORY_TIME_FIELDS[collection_name]
+        dates = set(dates)
+        if self.history_bucket is None:
+            docs = (
+                (doc.id, doc.to_dict().get("history") or [])
+                for doc in self.db.collection(collection_name).stream()
             )
+        else:
+            fmt = HISTORY_BUCKET_FORMATS[self.history_bucket]
+            buckets = sorted({date.strftime(fmt) for date in dates})
+            query = (
+                self.db.collection_group(HISTORY_BUCKET_COLLECTION)
+                .where(filter=FieldFilter("collection", "==", collection_name))
+                .where(filter=FieldFilter("bucket", "in", buckets))
+            )
+            docs = (
+                (bucket.reference.parent.parent.id, bucket.to_dict().get("history", []))
+                for bucket in query.stream()
+            )
+
+        return [
+            (phone_number, record)
+            for phone_number, history in docs
+            for record in history
+            if record.get(time_field)
+            and record[time_field].astimezone(timezone.utc).date() in dates
+        ]
+
+    def aggregate_score_cohorts(self, date, days=SCORE_COHORT_DAYS):
+        """
+        汇总所有用户截至指定日期（UTC）最近 days 天的成绩，按 (项目, 省份) 写入得分分布。
 
-            # 合并当前的word_duration_stats和新的word_duration_total
-            for word, duration in word_duration_total.items():
-                if word not in current_word_duration_stats:
-                    current_word_duration_stats[word] = 0
-                current_word_duration_stats[word] += duration
+        每个用户每个项目取期间内全部成绩的平均分，只计入分布一次，与页面上
+        用户自己的期间平均分口径一致。以覆盖方式写入，可以重复执行，
+        每晚汇总前一天，白天可定时重算当天。
 
-            try:
-                doc_ref.update({"word_duration_stats": current_word_duration_stats})
-            except firestore.exceptions.NotFound:
-                # 如果文档不存在，创建一个新文档
-                doc_ref.set({"word_duration_stats": current_word_duration_stats})
-            # logger.info(f"已更新 word_duration_stats")
+        Args:
+            date (datetime.date): 期间最后一天的 UTC 日期。
+            days (int): 期间天数。
+
+        Returns:
+            int: 写入的分布数量。
+        """
+        provinces = {
+            user.id: user.to_dict().get("province") or UNKNOWN_PROVINCE
+            for user in self.db.collection("users").select(["province"]).stream()
+        }
+        user_scores = {}
+        dates = [date - timedelta(days=i) for i in range(days)]
+        for phone_number, record in self.get_history_on_dates("performances", dates):
+            user_scores.setdefault((phone_number, record["item"]), []).append(
+                record["score"]
+            )
+
+        cohorts = {}
+        for (phone_number, item), scores in user_scores.items():
+            key = (item, provinces.get(phone_number, UNKNOWN_PROVINCE))
+            if key not in cohorts:
+                cohorts[key] = ScoreDistribution()
+            cohorts[key].add(sum(scores) / len(scores))
+
+        collection = self.db.collection(SCORE_COHORTS_COLLECTION)
+        date_str = date.isoformat()
+        updated_at = datetime.now(timezone.utc)
+        writes = [
+            (
+                collection.document(_score_cohort_id(date_str, item, province)),
+                {
+                    "date": date_str,
+                    "item": item,
+                    "province": province,
+                    "updated_at": updated_at,
+                    **dist.to_dict(),
+                },
+            )
+            for (item, province), dist in cohorts.items()
+        ]
+        # 删除重算后不再存在的分布
+        written = {ref.id for ref, _ in writes}
+        writes.extend(
+            (doc.reference, None)
+            for doc in self._query_score_cohorts(date_str).select(["date"]).stream()
+            if doc.id not in written
+        )
+        for i in range(0, len(writes), MAX_BATCH_SIZE):
+            batch = self.db.batch()
+            for ref, data in writes[i : i + MAX_BATCH_SIZE]:
+                if data is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, data)
+            batch.commit()
+        return len(cohorts)
+
+    def _query_score_cohorts(self, date_str):
+        return self.db.collection(SCORE_COHORTS_COLLECTION).where(
+            filter=FieldFilter("date", "==", date_str)
+        )
+
+    def get_score_cohorts(self, date):
+        """
+        读取截至指定日期汇总的得分分布。
+
+        Args:
+            date (datetime.date): UTC 日期。
+
+        Returns:
+            dict: {(项目, 省份): ScoreDistribution}，尚未汇总时为空。
+        """
+        cohorts = {}
+        for doc in self._query_score_cohorts(date.isoformat()).stream():
+            cohort = doc.to_dict()
+            # 跳过以日期为 ID 的旧格式文档，重新汇总当日时会将其删除
+            if "item" not in cohort:
+                continue
+            key = (cohort["item"], cohort["province"])
+            cohorts[key] = ScoreDistribution.from_dict(cohort)
+        return cohorts
+
+    def migrate_history_to_buckets(
+        self, collection_name, phone_number, bucket="day", remove_history=False
+    ):
+        """
+        将用户文档中的 history 数组迁移到分桶子集合，并写入单词统计与汇总计数。
+
+        迁移可以重复执行：记录以合并方式追加到分桶文档，汇总计数以增量写入，
+        不会覆盖切换到分桶存储后实时写入的记录。已迁移的分桶文档和用户文档
+        分别以 migrated、history_migrated 字段标记，重复执行或中断后重跑时跳过。
 
+        Args:
+            collection_name (str): 集合名称，"exercises" 或 "performances"。
+            phone_number (str): 用户手机号码。
+            bucket (str, optional): 分桶方式，"day" 或 "month"。默认为 "day"。
+            remove_history (bool, optional): 迁移后是否删除 history 数组。默认为 False。
+
+        Returns:
+            int: 迁移的记录数量。
+        """
+        doc_ref = self.db.collection(collection_name).document(phone_number)
+        doc = doc_ref.get()
+        if not doc.exists:
+            return 0
+        doc_dict = doc.to_dict()
+        history = doc_dict.get("history") or []
+        if doc_dict.get("history_migrated"):
+            # 已迁移，只处理之前未删除的 history 数组
+            if remove_history and "history" in doc_dict:
+                doc_ref.update({"history": firestore.DELETE_FIELD})
+            return 0
+        if not history:
+            return 0
+
+        buckets = _group_history_by_bucket(collection_name, history, bucket)
+        refs = {
+            bucket_id: doc_ref.collection(HISTORY_BUCKET_COLLECTION).document(bucket_id)
+            for bucket_id in buckets
+        }
+        migrated = {
+            snapshot.id
+            for snapshot in self.db.get_all(list(refs.values()))
+            if snapshot.exists and snapshot.to_dict().get("migrated")
+        }
+        writes = [
+            (
+                refs[bucket_id],
+                {
+                    "bucket": bucket_id,
+                    "collection": collection_name,
+                    "history": firestore.ArrayUnion(docs),
+                    "totals": _to_total_increments(
+                        _history_totals(collection_name, docs)
+                    ),
+                    "migrated": True,
+                },
+            )
+            for bucket_id, docs in buckets.items()
+            if bucket_id not in migrated
+        ]
 
+        data = {
+            "history_bucket": bucket,
+            "history_migrated": bucket,
+            "totals": _to_total_increments(_history_totals(collection_name, history)),
+        }
+        field = WORD_STATS_FIELDS.get(collection_name)
+        if field is not None and doc_dict.get(field) is None:
+            if collection_name == "performances":
+                deltas = _word_pass_deltas(history)
+            else:
+                deltas = _word_duration_deltas(history)
+            data[field] = _merge_word_stats(collection_name, {}, deltas)
+        if remove_history:
+            data["history"] = firestore.DELETE_FIELD
+
+        for i in range(0, len(writes), MAX_BATCH_SIZE):
+            batch = self.db.batch()
+            for ref, bucket_data in writes[i : i + MAX_BATCH_SIZE]:
+                batch.set(ref, bucket_data, merge=True)
+            batch.commit()
+        # 最后更新用户文档，确保中断时不会丢失 history 数组
+        doc_ref.set(data, merge=True)
+        return len(history)
 
     # endregion
+
+
+def _append_usage(columns, phone_number, usage, tz):
+    """将一条使用记录按列追加到 columns 中。"""
+    columns["phone_number"].append(phone_number)
+    columns["service_name"].append(usage["service_name"])
+    columns["item_name"].append(usage["item_name"])
+    columns["cost"].append(usage["cost"])
+    columns["model"].append(usage.get("model_name", ""))
+    columns["timestamp"].append(usage["timestamp"].astimezone(tz))
+
+
+def _add_usage_to_rollups(rollups, usage):
+    """将一条使用记录累加到按日期和（服务、项目、模型）分组的汇总中。"""
+    date_str = (
+        usage["timestamp"]
+        .astimezone(pytz.timezone(ROLLUP_TIMEZONE))
+        .strftime("%Y-%m-%d")
+    )
+    service_name = usage["service_name"]
+    item_name = usage["item_name"]
+    model = usage.get("model_name", "")
+    key = f"{service_name}|{item_name}|{model}"
+    rows = rollups.setdefault(date_str, {})
+    if key not in rows:
+        rows[key] = {
+            "service_name": service_name,
+            "item_name": item_name,
+            "model": model,
+            "cost": 0.0,
+            "total_tokens": 0,
+            "count": 0,
+        }
+    rows[key]["cost"] += usage["cost"]
+    rows[key]["total_tokens"] += usage.get("total_tokens", 0)
+    rows[key]["count"] += 1
+
+
+def _to_rollup_increments(rows):
+    return {
+        key: {
+            "service_name": row["service_name"],
+            "item_name": row["item_name"],
+            "model": row["model"],
+            "cost": firestore.Increment(row["cost"]),
+            "total_tokens": firestore.Increment(row["total_tokens"]),
+            "count": firestore.Increment(row["count"]),
+        }
+        for key, row in rows.items()
+    }
+
+
+def _score_cohort_id(date_str, item, province):
+    # 项目与省份名称可能包含文档 ID 不允许的字符，取其摘要
+    digest = hashlib.md5(f"{item}\n{province}".encode("utf-8")).hexdigest()
+    return f"{date_str}_{digest}"
+
+
+def _extract_word_from_item(item):
+    # 使用正则表达式从项目名称中提取单词
+    match = re.search(r"单词练习-.*?-([a-zA-Z\s]+)$", item)
+    if match:
+        return match.group(1)
+    return None
+
+
+def _document_word(document):
+    # 新记录带有 word 字段，旧记录从项目名称中提取
+    return document.get("word") or _extract_word_from_item(document["item"])
+
+
+def _document_words(collection_name, document):
+    """返回记录涉及的单词。"""
+    if collection_name == "performances":
+        return list(document.get("word_results") or {})
+    if collection_name == "exercises":
+        word = _document_word(document)
+        return [word] if word else []
+    return []
+
+
+def _word_pass_deltas(documents):
+    """统计文档中各单词的通过与失败次数。"""
+    deltas = {}
+    for document in documents:
+        word_results = document.get("word_results")
+        if not word_results:
+            continue
+        for word, passed in word_results.items():
+            if word not in deltas:
+                deltas[word] = {"passed": 0, "failed": 0}
+            if passed:
+                deltas[word]["passed"] += 1
+            else:
+                deltas[word]["failed"] += 1
+    return deltas
+
+
+def _word_duration_deltas(documents):
+    """累加文档中各单词的学习时长。"""
+    deltas = {}
+    for document in documents:
+        word = _document_word(document)
+        if word:
+            deltas[word] = deltas.get(word, 0) + document["duration"]
+    return deltas
+
+
+def _group_history_by_bucket(collection_name, documents, bucket):
+    """按记录时间（UTC）将历史记录分组到分桶。"""
+    time_field = HISTORY_TIME_FIELDS[collection_name]
+    fmt = HISTORY_BUCKET_FORMATS[bucket]
+    buckets = {}
+    for document in documents:
+        timestamp = document.get(time_field)
+        if not timestamp:
+            continue
+        bucket_id = timestamp.astimezone(timezone.utc).strftime(fmt)
+        buckets.setdefault(bucket_id, []).append(document)
+    return buckets
+
+
+def _history_totals(collection_name, documents):
+    """计算历史记录的汇总计数：练习累计时长，成绩累计得分。"""
+    totals = {"count": len(documents)}
+    if collection_name == "exercises":
+        totals["duration"] = sum(d.get("duration", 0) for d in documents)
+    elif collection_name == "performances":
+        totals["score"] = sum(d.get("score", 0) for d in documents)
+    return totals
+
+
+def _to_total_increments(totals):
+    return {key: firestore.Increment(value) for key, value in totals.items()}
+
+
+def _merge_word_stats(collection_name, stats, deltas):
+    """将增量合并到单词统计中（原地修改 stats）。"""
+    for word, delta in deltas.items():
+        if collection_name == "performances":
+            if word not in stats:
+                stats[word] = {"passed": 0, "failed": 0}
+            stats[word]["passed"] += delta["passed"]
+            stats[word]["failed"] += delta["failed"]
+        else:
+            stats[word] = stats.get(word, 0) + delta
+    return stats
+
+
+def _to_increments(collection_name, deltas):
+    """将单词统计增量转换为 Firestore 的原子递增操作。"""
+    if collection_name == "performances":
+        return {
+            word: {
+                "passed": firestore.Increment(delta["passed"]),
+                "failed": firestore.Increment(delta["failed"]),
+            }
+            for word, delta in deltas.items()
+        }
+    return {word: firestore.Increment(delta) for word, delta in deltas.items()}
@@ -0,0 +1,202 @@
+"""
+预先生成的练习内容池。
+
+每个练习包（bundle）包含一次完整练习所需的全部内容：对话文本、概要、测试题和译文，
+语音则预先写入共享的语音缓存。练习包按 (CEFR 等级, 场景类别) 存放在 SQLite 中，
+页面取出后立即可用；池中数量低于低水位时，由后台线程补充到高水位。
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Optional
+
+from .constants import CURRENT_CWD
+
+# 创建或获取logger对象
+logger = logging.getLogger("streamlit")
+
+DEFAULT_EXERCISE_POOL_FP = CURRENT_CWD / "resource" / "exercise_pool.db"
+# 低于低水位时开始补充，补充到高水位为止
+DEFAULT_LOW_WATER = 2
+DEFAULT_HIGH_WATER = 4
+# 练习包的有效秒数，过期的练习包不再取出
+DEFAULT_BUNDLE_TTL = 30 * 24 * 60 * 60
+
+
+class ExercisePool:
+    """按 (等级, 类别) 存放练习包的先进先出队列，同一主机上的多个进程共享。"""
+
+    def __init__(
+        self,
+        path=DEFAULT_EXERCISE_POOL_FP,
+        low_water=DEFAULT_LOW_WATER,
+        high_water=DEFAULT_HIGH_WATER,
+        ttl=DEFAULT_BUNDLE_TTL,
+        timeout=10.0,
+    ):
+        """
+        Args:
+            path (str | Path, optional): SQLite 数据库文件路径。
+            low_water (int, optional): 低水位，池中数量低于该值时需要补充。
+            high_water (int, optional): 高水位，每次补充到该数量。
+            ttl (float, optional): 练习包的有效秒数，为 None 时永不过期。
+            timeout (float, optional): 等待数据库锁的秒数。
+        """
+        self.path = str(path)
+        self.low_water = low_water
+        self.high_water = high_water
+        self.ttl = ttl
+        self.timeout = timeout
+        self.local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS bundles ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, level TEXT NOT NULL, "
+            "category TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS bundles_key ON bundles (level, category)"
+        )
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            self.local.conn = conn
+        return conn
+
+    def _min_created(self):
+        return float("-inf") if self.ttl is None else time.time() - self.ttl
+
+    def size(self, level: str, category: str) -> int:
+        """返回池中未过期的练习包数量。"""
+        return (
+            self._connect()
+            .execute(
+                "SELECT COUNT(*) FROM bundles "
+                "WHERE level = ? AND category = ? AND created >= ?",
+                (level, category, self._min_created()),
+            )
+            .fetchone()[0]
+        )
+
+    def needs_refill(self, level: str, category: str) -> bool:
+        return self.size(level, category) < self.low_water
+
+    def push(self, level: str, category: str, bundle: dict):
+        """放入一个练习包。bundle 需可序列化为 JSON。"""
+        self._connect().execute(
+            "INSERT INTO bundles (level, category, payload, created) "
+            "VALUES (?, ?, ?, ?)",
+            (level, category, json.dumps(bundle, ensure_ascii=False), time.time()),
+        )
+
+    def pop(self, level: str, category: str) -> Optional[dict]:
+        """取出最早放入的未过期练习包，池为空时返回 None。"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM bundles WHERE created < ?", (self._min_created(),)
+            )
+            row = conn.execute(
+                "SELECT id, payload FROM bundles WHERE level = ? AND category = ? "
+                "ORDER BY id LIMIT 1",
+                (level, category),
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM bundles WHERE id = ?", (row[0],))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return json.loads(row[1]) if row is not None else None
+
+    def stats(self) -> dict:
+        """返回各 (等级, 类别) 的练习包数量。"""
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT level, category, COUNT(*) FROM bundles WHERE created >= ? "
+                "GROUP BY level, category",
+                (self._min_created(),),
+            )
+            .fetchall()
+        )
+        return {(level, category): n for level, category, n in rows}
+
+
+class ExercisePoolRefiller:
+    """
+    在后台线程中补充练习包，同一 (等级, 类别) 同时只有一个线程在补充。
+
+    内容池由所有用户共享，补充线程不绑定触发补充的用户会话，
+    而是在 context 提供的环境（例如系统身份）中运行。
+    """
+
+    def __init__(
+        self,
+        pool: ExercisePool,
+        context: Optional[Callable[[], ContextManager]] = None,
+    ):
+        """
+        Args:
+            pool (ExercisePool): 练习内容池。
+            context (Callable[[], ContextManager], optional): 每次补充时在线程中进入的
+                上下文，例如以系统身份调用模型。
+        """
+        self.pool = pool
+        self.context = context or nullcontext
+        self.lock = threading.Lock()
+        self.refilling = set()
+
+    def request_refill(
+        self,
+        level: str,
+        category: str,
+        build: Callable[[str, str], dict],
+    ) -> bool:
+        """
+        池中数量低于低水位时启动后台线程，调用 build(level, category) 补充到高水位。
+
+        Args:
+            level (str): CEFR 等级。
+            category (str): 场景类别。
+            build (Callable[[str, str], dict]): 生成一个练习包的函数，不应依赖用户会话。
+
+        Returns:
+            bool: 是否启动了新的补充线程。
+        """
+        key = (level, category)
+        with self.lock:
+            if key in self.refilling or not self.pool.needs_refill(level, category):
+                return False
+            self.refilling.add(key)
+        thread = threading.Thread(
+            target=self._refill,
+            args=(level, category, build),
+            name=f"exercise-pool-{level}-{category}",
+            daemon=True,
+        )
+        thread.start()
+        return True
+
+    def _refill(self, level, category, build):
+        try:
+            with self.context():
+                while self.pool.size(level, category) < self.pool.high_water:
+                    start = time.time()
+                    self.pool.push(level, category, build(level, category))
+                    logger.info(
+                        f"练习包 {level} {category} 用时 {time.time() - start:.1f} 秒"
+                    )
+        except Exception as e:
+            logger.error(f"补充练习包失败：{level} {category} {e}")
+        finally:
+            with self.lock:
+                self.refilling.discard((level, category))
@@ -0,0 +1,247 @@
+"""
+持久化的生成内容缓存，存储在 SQLite 中，同一主机上的多个进程共享。
+
+缓存键由模型名称、规范化后的提示模板、模板参数和生成配置共同决定。
+每个键可以保存多个变体（池模式）：池未满时调用模型生成新变体并加入池中，
+池满后按轮询方式返回已有变体，既免去模型延迟又保持内容的多样性。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from .constants import CURRENT_CWD
+
+DEFAULT_GENERATION_CACHE_FP = CURRENT_CWD / "resource" / "generation_cache.db"
+# 默认保留 7 天，最多 20000 个变体
+DEFAULT_GENERATION_CACHE_TTL = 7 * 24 * 60 * 60
+DEFAULT_GENERATION_CACHE_MAX_ENTRIES = 20000
+
+
+def normalize_template(template: str) -> str:
+    """合并连续空白，避免仅因缩进或换行不同而产生不同的键。"""
+    return " ".join(template.split())
+
+
+def make_generation_key(
+    model_name: str, template: str, args: dict, generation_config=None
+) -> str:
+    """
+    计算生成内容的缓存键。
+
+    Args:
+        model_name (str): 模型名称。
+        template (str): 提示模板。
+        args (dict): 模板参数。
+        generation_config (GenerationConfig | dict, optional): 生成配置。
+
+    Returns:
+        str: 十六进制的 SHA-256 摘要。
+    """
+    if hasattr(generation_config, "to_dict"):
+        generation_config = generation_config.to_dict()
+    payload = json.dumps(
+        [model_name, normalize_template(template), args, generation_config],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """按键存储生成结果的多个变体，支持过期时间、容量淘汰和轮询取用，线程安全。"""
+
+    def __init__(
+        self,
+        path=DEFAULT_GENERATION_CACHE_FP,
+        ttl=DEFAULT_GENERATION_CACHE_TTL,
+        max_entries=DEFAULT_GENERATION_CACHE_MAX_ENTRIES,
+        timeout=10.0,
+    ):
+        """
+        Args:
+            path (str | Path, optional): SQLite 数据库文件路径。
+            ttl (float, optional): 变体的有效秒数，为 None 时永不过期。
+            max_entries (int, optional): 最多保存的变体数量，超出时淘汰最久未使用的变体。
+            timeout (float, optional): 等待数据库锁的秒数。
+        """
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.local = threading.local()
+        self.metrics = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+        self.metrics_lock = threading.Lock()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS variants ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, "
+            "value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS variants_key ON variants (key)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS variants_accessed ON variants (accessed)"
+        )
+        # 每个键下一次返回的变体序号
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cursors "
+            "(key TEXT PRIMARY KEY, position INTEGER NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            self.local.conn = conn
+        return conn
+
+    def _count(self, name, n=1):
+        with self.metrics_lock:
+            self.metrics[name] += n
+
+    def _min_created(self, now):
+        return float("-inf") if self.ttl is None else now - self.ttl
+
+    # region 读写
+
+    def count(self, key: str) -> int:
+        """返回键下未过期的变体数量。"""
+        row = (
+            self._connect()
+            .execute(
+                "SELECT COUNT(*) FROM variants WHERE key = ? AND created >= ?",
+                (key, self._min_created(time.time())),
+            )
+            .fetchone()
+        )
+        return row[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """按轮询顺序返回键下的一个未过期变体，没有时返回 None。"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, value FROM variants WHERE key = ? AND created >= ? "
+                "ORDER BY id",
+                (key, self._min_created(now)),
+            ).fetchall()
+            if not rows:
+                conn.execute("COMMIT")
+                self._count("misses")
+                return None
+            row = conn.execute(
+                "SELECT position FROM cursors WHERE key = ?", (key,)
+            ).fetchone()
+            position = row[0] if row is not None else 0
+            id_, value = rows[position % len(rows)]
+            conn.execute(
+                "INSERT OR REPLACE INTO cursors (key, position) VALUES (?, ?)",
+                (key, (position + 1) % len(rows)),
+            )
+            conn.execute("UPDATE variants SET accessed = ? WHERE id = ?", (now, id_))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("hits")
+        return json.loads(value)
+
+    def put(self, key: str, value: Any):
+        """为键增加一个变体。value 需可序列化为 JSON。"""
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO variants (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), now, now),
+        )
+        self._count("puts")
+        self.evict()
+
+    def get_or_generate(
+        self, key: str, generate: Callable[[], Any], pool_size: int = 1
+    ) -> Any:
+        """
+        读取缓存，变体数量不足 pool_size 时调用 generate() 生成新变体。
+
+        pool_size 为 1 时等同于普通缓存；大于 1 时前 pool_size 次请求各生成一个变体，
+        此后在这些变体间轮询。
+        """
+        if self.count(key) < pool_size:
+            self._count("misses")
+            value = generate()
+            self.put(key, value)
+            return value
+        value = self.get(key)
+        if value is None:
+            # 变体恰好在两次查询之间过期
+            value = generate()
+            self.put(key, value)
+        return value
+
+    def fill(self, key: str, generate: Callable[[], Any], pool_size: int) -> int:
+        """
+        预先生成变体，直到键下有 pool_size 个未过期变体。
+
+        Returns:
+            int: 新生成的变体数量。
+        """
+        n = 0
+        for _ in range(pool_size - self.count(key)):
+            self.put(key, generate())
+            n += 1
+        return n
+
+    # endregion
+
+    # region 淘汰与统计
+
+    def evict(self) -> int:
+        """删除过期变体，并将变体总数控制在 max_entries 以内。"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            n = conn.execute(
+                "DELETE FROM variants WHERE created < ?", (self._min_created(now),)
+            ).rowcount
+            total = conn.execute("SELECT COUNT(*) FROM variants").fetchone()[0]
+            if total > self.max_entries:
+                n += conn.execute(
+                    "DELETE FROM variants WHERE id IN "
+                    "(SELECT id FROM variants ORDER BY accessed LIMIT ?)",
+                    (total - self.max_entries,),
+                ).rowcount
+            if n:
+                conn.execute(
+                    "DELETE FROM cursors WHERE key NOT IN (SELECT key FROM variants)"
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if n:
+            self._count("evictions", n)
+        return n
+
+    def stats(self) -> dict:
+        """返回命中次数、命中率、变体数量和键数量。"""
+        row = (
+            self._connect()
+            .execute("SELECT COUNT(*), COUNT(DISTINCT key) FROM variants")
+            .fetchone()
+        )
+        with self.metrics_lock:
+            stats = dict(self.metrics)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        stats["entries"], stats["keys"] = row
+        return stats
+
+    # endregion
@@ -1,13 +1,15 @@
 import json
 import logging
+import queue
 import sys
 import tempfile
 import threading
 import time
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from functools import partial
-from typing import Callable, List
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
 import pytz
 import requests
@@ -15,6 +17,7 @@ import streamlit as st
 import yaml
 from faker import Faker
 from moviepy.editor import VideoFileClip
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from vertexai.preview.generative_models import (
     GenerationConfig,
     GenerativeModel,
@@ -32,10 +35,26 @@ from .google_ai_prompts import (
     READING_COMPREHENSION_LOGIC_QUESTION,
     SINGLE_CHOICE_QUESTION,
 )
+from .generation_cache import GenerationCache, make_generation_key
 from .google_cloud_configuration import DEFAULT_SAFETY_SETTINGS
+from .rate_limiter import BATCH, INTERACTIVE, Quota, RateLimiter, create_backend
+from .streaming_json import IncrementalJSONParser
 
 MAX_CALLS = 10
 PER_SECONDS = 60
+# 后台计量每批处理的最大事件数及最长等待秒数
+METER_BATCH_SIZE = 20
+METER_BATCH_SECONDS = 2.0
+# 池模式下每个键保存的变体数量，温度为 0 的生成任务只需一个
+SCENARIO_POOL_SIZE = 3
+DIALOGUE_POOL_SIZE = 5
+READING_ARTICLE_POOL_SIZE = 5
+# 单词理解测试按块并发生成，每块的单词数、并发数和最多尝试次数
+WORD_TEST_CHUNK_SIZE = 5
+MAX_WORD_TEST_WORKERS = 4
+WORD_TEST_MAX_ATTEMPTS = 3
+# 流式解析 JSON 时回调的最大元素深度，2 表示根的子元素及其中列表或对象的元素
+STREAM_JSON_MAX_DEPTH = 2
 shanghai_tz = pytz.timezone("Asia/Shanghai")
 
 
@@ -141,7 +160,7 @@ def calculate_total_cost_by_rule(contents_info: List[dict], full_response):
     return total_cost
 
 
-def calculate_cost_by_model(model_name, contents, full_response):
+def calculate_cost_by_model(model_name, contents, full_response, model=None):
     """
     Calculate the cost of using a specific model for text generation.
 
@@ -149,11 +168,13 @@ def calculate_cost_by_model(model_name, contents, full_response):
         model_name (str): The name of the model to be used.
         contents (str): The input text contents.
         full_response (str): The generated full response.
+        model (GenerativeModel, optional): 已加载的模型，默认按名称加载。
 
     Returns:
         float: The cost of using the model for text generation.
     """
-    model = load_vertex_model(model_name)
+    if model is None:
+        model = load_vertex_model(model_name)
     input_token_count = model.count_tokens(contents)
     output_token_count = model.count_tokens(full_response)
     return calculate_gemini_pro_cost(
@@ -183,33 +204,26 @@ def parse_json_string(s, prefix="```python", suffix="```"):
     return d
 
 
-class ModelRateLimiter:
-    def __init__(self, max_calls, per_seconds):
-        self.max_calls = max_calls
-        self.per_seconds = per_seconds
-        self.calls = {}
-        self.lock = threading.Lock()
-
-    def _allow_call(self, model_name):
-        with self.lock:
-            now = time.time()
-            if model_name not in self.calls:
-                self.calls[model_name] = deque()
-            while (
-                self.calls[model_name]
-                and now - self.calls[model_name][0] > self.per_seconds
-            ):
-                self.calls[model_name].popleft()
-            if len(self.calls[model_name]) < self.max_calls:
-                self.calls[model_name].append(now)
-                return True
-            else:
-                return False
-
-    def call_func(self, model_name, func, *args, **kwargs):
-        while not self._allow_call(model_name):
-            time.sleep(0.2)
-        return func(*args, **kwargs)
+class ModelRateLimiter(RateLimiter):
+    """
+    按模型限流，每个模型每 per_seconds 秒 max_calls 次，允许突发 max_calls 次。
+
+    Args:
+        max_calls (int): 每个周期内的最大调用次数。
+        per_seconds (int): 周期秒数。
+        backend_url (str, optional): 限流后端，见 rate_limiter.create_backend。
+            多个副本共享配额时使用 Redis。
+        user_max_calls (int, optional): 每个用户每个周期内的最大调用次数。
+    """
+
+    def __init__(self, max_calls, per_seconds, backend_url=None, user_max_calls=None):
+        super().__init__(
+            Quota.per(max_calls, per_seconds),
+            backend=create_backend(backend_url),
+            user_quota=(
+                Quota.per(user_max_calls, per_seconds) if user_max_calls else None
+            ),
+        )
 
 
 # 在streamlit环境下使用装饰器
@@ -217,6 +231,220 @@ if "streamlit" in sys.modules:
     ModelRateLimiter = st.cache_resource(ModelRateLimiter)
 
 
+class UsageMeter:
+    """
+    后台计量：在工作线程中统计令牌、计算费用并批量写入数据库。
+
+    生成内容后只需调用 submit 入队，model.count_tokens 调用和 Firestore 写入
+    都不会阻塞页面。
+    """
+
+    def __init__(self, batch_size=METER_BATCH_SIZE, batch_seconds=METER_BATCH_SECONDS):
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.queue = queue.Queue()
+        self.models = {}
+        self.thread = threading.Thread(
+            target=self._run, name="usage-meter", daemon=True
+        )
+        self.thread.start()
+
+    def submit(
+        self,
+        dbi,
+        item_name: str,
+        model_name: str,
+        contents_info: List[dict],
+        full_response: str,
+        total_tokens: int,
+        elapsed_time: float,
+    ):
+        """将一次生成的用量加入计量队列。"""
+        self.queue.put(
+            {
+                "dbi": dbi,
+                # 入队时记录用户，避免处理时用户已退出
+                "phone_number": dbi.cache["user_info"]["phone_number"],
+                "item_name": item_name,
+                "model_name": model_name,
+                "contents_info": contents_info,
+                "full_response": full_response,
+                "total_tokens": total_tokens,
+                "elapsed_time": elapsed_time,
+                "timestamp": datetime.now(pytz.utc),
+            }
+        )
+
+    def flush(self):
+        """等待队列中的事件全部处理完毕。"""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.batch_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"计量失败：{e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _process(self, batch):
+        token_records = {}
+        for event in batch:
+            dbi = event["dbi"]
+            token_records.setdefault(id(dbi), (dbi, []))[1].append(
+                {
+                    "phone_number": event["phone_number"],
+                    "token_type": event["item_name"],
+                    "used_token_count": event["total_tokens"],
+                    "used_at": event["timestamp"],
+                }
+            )
+            dbi.add_usage_to_cache(self._to_usage(event))
+        for dbi, records in token_records.values():
+            dbi.add_token_records(records)
+
+    def _to_usage(self, event):
+        model_name = event["model_name"]
+        contents_info = event["contents_info"]
+        full_response = event["full_response"]
+        total_cost_1 = calculate_total_cost_by_rule(contents_info, full_response)
+        if model_name not in self.models:
+            self.models[model_name] = GenerativeModel(model_name)
+        try:
+            total_cost_2 = calculate_cost_by_model(
+                model_name,
+                [p["part"] for p in contents_info],
+                full_response,
+                self.models[model_name],
+            )
+        except Exception as e:
+            logger.error(f"统计令牌失败：{e}")
+            total_cost_2 = None
+        # logger.info(f"{total_cost_1=:.4f}, {total_cost_2=:.4f}")
+        return {
+            "service_name": "Google AI",
+            # 使用入队时记录的用户，处理时用户可能已退出或切换
+            "phone_number": event["phone_number"],
+            "item_name": event["item_name"],
+            "cost": total_cost_1,
+            "total_cost_google": total_cost_2,
+            "total_tokens": event["total_tokens"],
+            "model_name": model_name,
+            "elapsed_time": event["elapsed_time"],
+            "timestamp": event["timestamp"],
+        }
+
+
+@st.cache_resource
+def get_usage_meter():
+    return UsageMeter()
+
+
+@st.cache_resource
+def get_generation_cache():
+    fp = st.secrets.get("GENERATION_CACHE_FP")
+    return GenerationCache(fp) if fp else GenerationCache()
+
+
+def create_session_executor(max_workers, thread_name_prefix=""):
+    """
+    创建线程池，工作线程绑定当前会话的 ScriptRunContext。
+
+    工作线程中可以调用本模块的生成函数，它们依赖 st.session_state 中的限流器和
+    数据库接口。工作线程不应创建 Streamlit 元素，结果交由主线程显示。
+    """
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix=thread_name_prefix,
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+
+
+# 当前线程调用模型时的身份与限流优先级，见 run_as_system 和 generation_priority
+_thread_state = threading.local()
+
+
+class SystemIdentity(NamedTuple):
+    """后台任务的系统身份：记录费用的数据库接口和限流器。"""
+
+    dbi: object
+    rate_limiter: RateLimiter
+
+
+@contextmanager
+def run_as_system(identity: SystemIdentity):
+    """
+    在当前线程中以系统身份调用模型，用于不绑定用户会话的后台任务。
+
+    费用和令牌记录计入 identity.dbi 的系统账户，按 BATCH 优先级限流，
+    不读取也不更新任何用户会话，线程无需绑定 ScriptRunContext。
+    """
+    previous = getattr(_thread_state, "identity", None)
+    _thread_state.identity = identity
+    try:
+        with generation_priority(BATCH):
+            yield
+    finally:
+        _thread_state.identity = previous
+
+
+def current_system_identity() -> Optional[SystemIdentity]:
+    return getattr(_thread_state, "identity", None)
+
+
+def get_usage_dbi():
+    """返回记录费用的数据库接口：系统身份下为系统账户，否则为当前会话。"""
+    identity = current_system_identity()
+    return st.session_state.dbi if identity is None else identity.dbi
+
+
+@contextmanager
+def generation_priority(priority):
+    """
+    在当前线程中以指定优先级限流，例如后台预取时使用 BATCH，
+    只使用令牌桶中超出交互请求保留量的令牌。
+    """
+    previous = getattr(_thread_state, "priority", INTERACTIVE)
+    _thread_state.priority = priority
+    try:
+        yield
+    finally:
+        _thread_state.priority = previous
+
+
+def _rate_limit(model_name):
+    """按当前身份（会话用户或系统账户）和当前线程的优先级限流。"""
+    identity = current_system_identity()
+    rate_limiter = (
+        st.session_state.rate_limiter if identity is None else identity.rate_limiter
+    )
+    return rate_limiter.limit(
+        model_name,
+        user=get_usage_dbi().cache["user_info"].get("phone_number"),
+        priority=getattr(_thread_state, "priority", INTERACTIVE),
+    )
+
+
+def _count_session_tokens(total_tokens):
+    """修改会话中的令牌数。系统身份没有用户会话，不计数。"""
+    if current_system_identity() is None:
+        st.session_state.current_token_count = total_tokens
+        st.session_state.total_token_count += total_tokens
+
+
 # if "user_name" not in st.session_state:
 #     fake = Faker("zh_CN")
 #     st.session_state.user_name = fake.name()
@@ -249,14 +477,13 @@ def display_generated_content_and_update_token(
 ):
     contents = [p["part"] for p in contents_info]
     start_time = time.time()  # 记录开始时间
-    responses = st.session_state.rate_limiter.call_func(
-        model_name,
-        model_method,
-        contents,
-        generation_config=generation_config,
-        safety_settings=DEFAULT_SAFETY_SETTINGS,
-        stream=stream,
-    )
+    with _rate_limit(model_name):
+        responses = model_method(
+            contents,
+            generation_config=generation_config,
+            safety_settings=DEFAULT_SAFETY_SETTINGS,
+            stream=stream,
+        )
 
     full_response = ""
     total_tokens = 0
@@ -281,28 +508,19 @@ def display_generated_content_and_update_token(
     placeholder.markdown(full_response)
     elapsed_time = time.time() - start_time  # 计算用时
 
-    # 添加记录到数据库
-    st.session_state.dbi.add_token_record(item_name, total_tokens)
     # 修改会话中的令牌数
-    st.session_state.current_token_count = total_tokens
-    st.session_state.total_token_count += total_tokens
-
-    total_cost_1 = calculate_total_cost_by_rule(contents_info, full_response)
-    total_cost_2 = calculate_cost_by_model(model_name, contents, full_response)
-    # logger.info(f"{total_cost_1=:.4f}, {total_cost_2=:.4f}")
-
-    usage = {
-        "service_name": "Google AI",
-        "item_name": item_name,
-        "cost": total_cost_1,
-        "total_cost_google": total_cost_2,
-        "total_tokens": total_tokens,
-        "model_name": model_name,
-        "elapsed_time": elapsed_time,
-        "timestamp": datetime.now(pytz.utc),
-    }
-    st.session_state.dbi.add_usage_to_cache(usage)
-    # 保存到数据库
+    _count_session_tokens(total_tokens)
+
+    # 费用计算和数据库写入在后台完成
+    get_usage_meter().submit(
+        get_usage_dbi(),
+        item_name,
+        model_name,
+        contents_info,
+        full_response,
+        total_tokens,
+        elapsed_time,
+    )
 
 
 def parse_generated_content_and_update_token(
@@ -313,20 +531,27 @@ def parse_generated_content_and_update_token(
     generation_config: GenerationConfig,
     stream: bool,
     parser: Callable = lambda x: x,
+    on_item: Callable = None,
 ):
+    """
+    生成内容并解析结果。
+
+    流式生成且提供 on_item 时，增量解析输出中的 JSON，每当一个元素完整出现即调用
+    on_item(path, value)，path 为从根开始的键或序号元组，可用于逐步显示结构化结果。
+    """
     contents = [p["part"] for p in contents_info]
     start_time = time.time()  # 记录开始时间
-    responses = st.session_state.rate_limiter.call_func(
-        model_name,
-        model_method,
-        contents,
-        generation_config=generation_config,
-        safety_settings=DEFAULT_SAFETY_SETTINGS,
-        stream=stream,
-    )
+    with _rate_limit(model_name):
+        responses = model_method(
+            contents,
+            generation_config=generation_config,
+            safety_settings=DEFAULT_SAFETY_SETTINGS,
+            stream=stream,
+        )
 
     full_response = ""
     total_tokens = 0
+    json_parser = IncrementalJSONParser(STREAM_JSON_MAX_DEPTH) if on_item else None
     # 提取生成的内容
     if stream:
         for chunk in responses:
@@ -336,32 +561,28 @@ def parse_generated_content_and_update_token(
             except (IndexError, ValueError) as e:
                 st.write(chunk)
                 st.error(e)
+                continue
+            if json_parser is not None:
+                for path, value in json_parser.feed(chunk.text):
+                    on_item(path, value)
     else:
         full_response = responses.text
         total_tokens += responses._raw_response.usage_metadata.total_token_count
 
     elapsed_time = time.time() - start_time  # 计算用时
-    # 添加记录到数据库
-    st.session_state.dbi.add_token_record(item_name, total_tokens)
     # 修改会话中的令牌数
-    st.session_state.current_token_count = total_tokens
-    st.session_state.total_token_count += total_tokens
-
-    total_cost_1 = calculate_total_cost_by_rule(contents_info, full_response)
-    total_cost_2 = calculate_cost_by_model(model_name, contents, full_response)
-    # logger.info(f"{total_cost_1=:.4f}, {total_cost_2=:.4f}")
-
-    usage = {
-        "service_name": "Google AI",
-        "item_name": item_name,
-        "cost": total_cost_1,
-        "total_cost_google": total_cost_2,
-        "total_tokens": total_tokens,
-        "model_name": model_name,
-        "elapsed_time": elapsed_time,
-        "timestamp": datetime.now(pytz.utc),
-    }
-    st.session_state.dbi.add_usage_to_cache(usage)
+    _count_session_tokens(total_tokens)
+
+    # 费用计算和数据库写入在后台完成
+    get_usage_meter().submit(
+        get_usage_dbi(),
+        item_name,
+        model_name,
+        contents_info,
+        full_response,
+        total_tokens,
+        elapsed_time,
+    )
 
     return parser(full_response)
 
@@ -376,17 +597,44 @@ As an experienced English teacher, you are tasked with creating an examination f
 
 {guidelines}
 
-- Create a list of dictionaries, each representing a test question for each word.
+- Create a list of dictionaries, each representing a test question for each word, in the same order as the words. Include the tested word, exactly as given, under the key 'word'.
 - Output the list in JSON format. Note that 'question', 'options', and 'answer' in the dictionary should not use Markdown formatting.
 
 Words: {words}
 """
 
 
+def parse_word_tests(s, words):
+    """
+    解析单词测试题，并按 words 的顺序排列。
+
+    题目数量与单词数量不一致，或题目的 word 与单词不能一一对应时视为失败，不写入缓存。
+    """
+    tests = parse_json_string(s, prefix="```json", suffix="```")
+    return order_word_tests(words, tests)
+
+
+def order_word_tests(words, tests):
+    """按 words 的顺序排列测试题，不能一一对应时引发 ValueError。"""
+    if not isinstance(tests, list) or len(tests) != len(words):
+        raise ValueError(f"预期 {len(words)} 道测试题，实际为：{tests}")
+    by_word = {}
+    for test in tests:
+        word = test.get("word") if isinstance(test, dict) else None
+        if not isinstance(word, str):
+            raise ValueError(f"测试题缺少 word：{test}")
+        by_word[word.strip().lower()] = test
+    try:
+        return [by_word[word.strip().lower()] for word in words]
+    except KeyError as e:
+        raise ValueError(f"测试题与单词不对应：{e}，实际为：{list(by_word)}")
+
+
 def generate_word_tests(model_name, model, words, level):
     # 确定单词为列表
     if not isinstance(words, list):
         raise TypeError("words must be a list of words")
+    word_list = words
     words = " , ".join(words)
     prompt = WORDS_TEST_PROMPT_TEMPLATE.format(
         words=words, level=level, guidelines=SINGLE_CHOICE_QUESTION
@@ -396,17 +644,107 @@ def generate_word_tests(model_name, model, words, level):
         max_output_tokens=8192, temperature=0.0, top_p=1.0
     )
     contents_info = to_contents_info(contents)
-    return parse_generated_content_and_update_token(
-        "单词理解测试",
-        model_name,
-        model.generate_content,
-        contents_info,
-        generation_config,
-        stream=False,
-        parser=partial(parse_json_string, prefix="```json", suffix="```"),
+    return get_generation_cache().get_or_generate(
+        make_generation_key(
+            model_name,
+            WORDS_TEST_PROMPT_TEMPLATE,
+            {"words": words, "level": level, "guidelines": SINGLE_CHOICE_QUESTION},
+            generation_config,
+        ),
+        partial(
+            parse_generated_content_and_update_token,
+            "单词理解测试",
+            model_name,
+            model.generate_content,
+            contents_info,
+            generation_config,
+            stream=False,
+            parser=partial(parse_word_tests, words=word_list),
+        ),
     )
 
 
+class WordTestBatch:
+    """
+    分块并发生成单词理解测试题。
+
+    单词按 chunk_size 分块，各块在线程池中受限流器约束并发生成、独立解析，
+    失败的块单独重试。按单词顺序逐块返回结果，第一块完成即可开始答题。
+    工作线程绑定当前会话的 ScriptRunContext，以便使用 st.session_state 中的限流器；
+    学生正在等待的第一块按交互优先级限流，其余预取的块按 BATCH 优先级限流。
+    """
+
+    def __init__(
+        self,
+        model_name,
+        model,
+        words,
+        level,
+        chunk_size=WORD_TEST_CHUNK_SIZE,
+        max_workers=MAX_WORD_TEST_WORKERS,
+        max_attempts=WORD_TEST_MAX_ATTEMPTS,
+    ):
+        self.model_name = model_name
+        self.model = model
+        self.level = level
+        self.max_attempts = max_attempts
+        self.chunks = [
+            words[i : i + chunk_size] for i in range(0, len(words), chunk_size)
+        ]
+        executor = create_session_executor(max_workers, "word-tests")
+        self.futures = [
+            executor.submit(
+                self._generate_chunk, chunk, INTERACTIVE if i == 0 else BATCH
+            )
+            for i, chunk in enumerate(self.chunks)
+        ]
+        # 不等待，已提交的任务继续在后台执行
+        executor.shutdown(wait=False)
+        self.collected = 0
+
+    def _generate_chunk(self, chunk, priority):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with generation_priority(priority):
+                    tests = generate_word_tests(
+                        self.model_name, self.model, chunk, self.level
+                    )
+                # 数量或单词不对应时视为失败并重试，避免单词与测试题错配
+                return order_word_tests(chunk, tests)
+            except Exception as e:
+                logger.error(f"生成单词测试题失败（第 {attempt} 次）：{chunk} {e}")
+        return None
+
+    def done(self) -> bool:
+        return self.collected == len(self.futures)
+
+    def collect(self, wait_for: int = 0) -> List[Tuple[str, dict]]:
+        """
+        按顺序取出已完成的块中的测试题。
+
+        Args:
+            wait_for (int, optional): 至少等待的块数，0 表示只取出已完成的块。
+
+        Returns:
+            List[Tuple[str, dict]]: (单词, 测试题) 列表。多次尝试仍失败的块被跳过。
+        """
+        results = []
+        while self.collected < len(self.futures):
+            future = self.futures[self.collected]
+            if wait_for <= 0 and not future.done():
+                break
+            tests = future.result()
+            if tests is not None:
+                results.extend(zip(self.chunks[self.collected], tests))
+            self.collected += 1
+            wait_for -= 1
+        return results
+
+    def __iter__(self):
+        while not self.done():
+            yield from self.collect(wait_for=1)
+
+
 SCENARIO_TEMPLATE = """
 为以下场景模拟12个不同的子场景列表：
 
@@ -428,14 +766,21 @@ def generate_scenarios(model, subject):
         max_output_tokens=2048, temperature=0.8, top_p=1.0
     )
     contents_info = to_contents_info(contents)
-    return parse_generated_content_and_update_token(
-        "生成场景",
-        "gemini-pro",
-        model.generate_content,
-        contents_info,
-        generation_config,
-        stream=False,
-        parser=lambda x: [line for line in x.strip().splitlines() if line],
+    return get_generation_cache().get_or_generate(
+        make_generation_key(
+            "gemini-pro", SCENARIO_TEMPLATE, {"subject": subject}, generation_config
+        ),
+        partial(
+            parse_generated_content_and_update_token,
+            "生成场景",
+            "gemini-pro",
+            model.generate_content,
+            contents_info,
+            generation_config,
+            stream=False,
+            parser=lambda x: [line for line in x.strip().splitlines() if line],
+        ),
+        pool_size=SCENARIO_POOL_SIZE,
     )
 
 
@@ -524,7 +869,8 @@ LISTENING_TEST_TEMPLATE = """为了考察学生听力水平，根据学生语言
 对话：{dialogue}"""
 
 
-def generate_listening_test(model, level, dialogue, number=5):
+def generate_listening_test(model, level, dialogue, number=5, on_item=None):
+    """生成听力测试题。提供 on_item 时流式生成，每道题完整后逐条回调。"""
     prompt = LISTENING_TEST_TEMPLATE.format(
         level=level, dialogue=dialogue, number=number
     )
@@ -533,14 +879,24 @@ def generate_listening_test(model, level, dialogue, number=5):
         max_output_tokens=2048, temperature=0.2, top_p=1.0
     )
     contents_info = to_contents_info(contents)
-    return parse_generated_content_and_update_token(
-        "听力测试",
-        "gemini-pro",
-        model.generate_content,
-        contents_info,
-        generation_config,
-        stream=False,
-        parser=partial(parse_json_string, prefix="```json", suffix="```"),
+    return get_generation_cache().get_or_generate(
+        make_generation_key(
+            "gemini-pro",
+            LISTENING_TEST_TEMPLATE,
+            {"level": level, "dialogue": dialogue, "number": number},
+            generation_config,
+        ),
+        partial(
+            parse_generated_content_and_update_token,
+            "听力测试",
+            "gemini-pro",
+            model.generate_content,
+            contents_info,
+            generation_config,
+            stream=on_item is not None,
+            parser=partial(parse_json_string, prefix="```json", suffix="```"),
+            on_item=on_item,
+        ),
     )
 
 
@@ -570,14 +926,24 @@ def generate_reading_comprehension_article(model, genre, content, plot, level):
         max_output_tokens=2048, temperature=0.8, top_p=1.0
     )
     contents_info = to_contents_info(contents)
-    return parse_generated_content_and_update_token(
-        "阅读理解文章",
-        "gemini-pro",
-        model.generate_content,
-        contents_info,
-        generation_config,
-        stream=False,
-        parser=lambda x: x,
+    return get_generation_cache().get_or_generate(
+        make_generation_key(
+            "gemini-pro",
+            READING_ARTICLE_TEMPLATE,
+            {"genre": genre, "content": content, "plot": plot, "level": level},
+            generation_config,
+        ),
+        partial(
+            parse_generated_content_and_update_token,
+            "阅读理解文章",
+            "gemini-pro",
+            model.generate_content,
+            contents_info,
+            generation_config,
+            stream=False,
+            parser=lambda x: x,
+        ),
+        pool_size=READING_ARTICLE_POOL_SIZE,
     )
 
 
@@ -611,14 +977,29 @@ def generate_reading_comprehension_test(model, question_type, number, level, art
         max_output_tokens=2048, temperature=0.0, top_p=1.0
     )
     contents_info = to_contents_info(contents)
-    return parse_generated_content_and_update_token(
-        "阅读理解测试",
-        "gemini-pro",
-        model.generate_content,
-        contents_info,
-        generation_config,
-        stream=False,
-        parser=parse_json_string,
+    return get_generation_cache().get_or_generate(
+        make_generation_key(
+            "gemini-pro",
+            READING_COMPREHENSION_TEST_TEMPLATE,
+            {
+                "question_type": question_type,
+                "number": number,
+                "level": level,
+                "article": article,
+                "guidelines": guidelines,
+            },
+            generation_config,
+        ),
+        partial(
+            parse_generated_content_and_update_token,
+            "阅读理解测试",
+            "gemini-pro",
+            model.generate_content,
+            contents_info,
+            generation_config,
+            stream=False,
+            parser=parse_json_string,
+        ),
     )
 
 
@@ -797,7 +1178,10 @@ def generate_english_writing_exam_assessment(model, student_level, exam_topic):
 #     )
 
 
-def cefr_english_writing_ability_assessment(model, requirements, composition):
+def cefr_english_writing_ability_assessment(
+    model, requirements, composition, on_item=None
+):
+    """评估写作能力。提供 on_item 时流式生成，评分记录完整后逐条回调。"""
     prompt = CEFR_WRITING_SCORING_TEMPLATE.format(
         requirements=requirements, composition=composition
     )
@@ -806,12 +1190,22 @@ def cefr_english_writing_ability_assessment(model, requirements, composition):
         max_output_tokens=4096, temperature=0.1, top_p=1.0
     )
     contents_info = to_contents_info(contents)
-    return parse_generated_content_and_update_token(
-        "英语写作CEFR能力评估",
-        "gemini-pro",
-        model.generate_content,
-        contents_info,
-        generation_config,
-        stream=False,
-        parser=partial(parse_json_string, prefix="```json", suffix="```"),
+    return get_generation_cache().get_or_generate(
+        make_generation_key(
+            "gemini-pro",
+            CEFR_WRITING_SCORING_TEMPLATE,
+            {"requirements": requirements, "composition": composition},
+            generation_config,
+        ),
+        partial(
+            parse_generated_content_and_update_token,
+            "英语写作CEFR能力评估",
+            "gemini-pro",
+            model.generate_content,
+            contents_info,
+            generation_config,
+            stream=on_item is not None,
+            parser=partial(parse_json_string, prefix="```json", suffix="```"),
+            on_item=on_item,
+        ),
     )
@@ -0,0 +1,172 @@
+"""
+紧凑的只读词典文件，替代整体加载 mini_dict.json。
+
+构建时将词典编译为二进制文件，运行时用 mmap 打开：启动几乎不耗时，
+同一主机上的多个进程共享操作系统的页缓存，查询为 O(log n) 的二分查找。
+
+文件布局（整数均为小端序 uint32）：
+
+    头部        magic "LEX1"、词条数 n、等级表长度
+    等级表      JSON 数组，序号 0 表示没有等级
+    键偏移      n + 1 个，指向键区
+    文档偏移    n + 1 个，指向文档区
+    等级        n 个 uint8，等级表中的序号
+    键区        按 UTF-8 字节序排列的单词
+    文档区      各词条的 JSON 文档
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Optional
+
+from .constants import CURRENT_CWD
+
+MINI_DICT_FP = CURRENT_CWD / "resource" / "dictionary" / "mini_dict.json"
+MINI_DICT_LEXICON_FP = CURRENT_CWD / "resource" / "dictionary" / "mini_dict.lex"
+
+_MAGIC = b"LEX1"
+_HEADER = struct.Struct("<4sII")
+_UINT32 = struct.Struct("<I")
+
+
+def build_lexicon(entries: dict, fp):
+    """
+    将 {单词: 文档} 编译为词典文件。先写临时文件再替换，读者不会看到写了一半的文件。
+
+    Args:
+        entries (dict): 单词到文档的映射，文档中的 level 字段单独存放以便快速查询。
+        fp (str | Path): 输出文件路径。
+    """
+    items = sorted((word.encode("utf-8"), doc) for word, doc in entries.items())
+    levels = [None]
+    level_index = {None: 0}
+    keys = bytearray()
+    docs = bytearray()
+    key_offsets = [0]
+    doc_offsets = [0]
+    level_codes = bytearray()
+    for key, doc in items:
+        level = doc.get("level")
+        if level not in level_index:
+            level_index[level] = len(levels)
+            levels.append(level)
+        level_codes.append(level_index[level])
+        keys += key
+        key_offsets.append(len(keys))
+        docs += json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        doc_offsets.append(len(docs))
+    assert len(levels) <= 256, "等级种类过多"
+    level_table = json.dumps(levels, ensure_ascii=False).encode("utf-8")
+
+    tmp_fp = f"{fp}.{os.getpid()}.tmp"
+    with open(tmp_fp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(items), len(level_table)))
+        f.write(level_table)
+        f.write(struct.pack(f"<{len(key_offsets)}I", *key_offsets))
+        f.write(struct.pack(f"<{len(doc_offsets)}I", *doc_offsets))
+        f.write(level_codes)
+        f.write(keys)
+        f.write(docs)
+    os.replace(tmp_fp, fp)
+
+
+class Lexicon:
+    """
+    以 mmap 打开的词典文件，只读、线程安全。
+
+    支持 `word in lexicon`、`lexicon[word]` 和 `lexicon.get(word)`，
+    可以直接替代原先的 mini_dict 字典。
+    """
+
+    def __init__(self, fp):
+        with open(fp, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n, table_size = _HEADER.unpack_from(self.mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"不是词典文件：{fp}")
+        pos = _HEADER.size
+        self.levels = json.loads(self.mm[pos : pos + table_size])
+        pos += table_size
+        self.key_offsets_pos = pos
+        pos += (self.n + 1) * 4
+        self.doc_offsets_pos = pos
+        pos += (self.n + 1) * 4
+        self.levels_pos = pos
+        pos += self.n
+        self.keys_pos = pos
+        self.docs_pos = pos + self._offset(self.key_offsets_pos, self.n)
+
+    def _offset(self, base, i):
+        return _UINT32.unpack_from(self.mm, base + i * 4)[0]
+
+    def _key(self, i):
+        start = self.keys_pos + self._offset(self.key_offsets_pos, i)
+        end = self.keys_pos + self._offset(self.key_offsets_pos, i + 1)
+        return self.mm[start:end]
+
+    def _find(self, word: str) -> int:
+        """返回单词的序号，不存在时返回 -1。"""
+        key = word.encode("utf-8")
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n and self._key(lo) == key:
+            return lo
+        return -1
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, word):
+        return self._find(word) >= 0
+
+    def __getitem__(self, word):
+        i = self._find(word)
+        if i < 0:
+            raise KeyError(word)
+        start = self.docs_pos + self._offset(self.doc_offsets_pos, i)
+        end = self.docs_pos + self._offset(self.doc_offsets_pos, i + 1)
+        return json.loads(self.mm[start:end])
+
+    def get(self, word, default=None):
+        try:
+            return self[word]
+        except KeyError:
+            return default
+
+    def level(self, word) -> Optional[str]:
+        """返回单词的 CEFR 等级，不解析文档。单词不存在或没有等级时返回 None。"""
+        i = self._find(word)
+        if i < 0:
+            return None
+        return self.levels[self.mm[self.levels_pos + i]]
+
+    def close(self):
+        self.mm.close()
+
+
+_build_lock = threading.Lock()
+
+
+def open_lexicon(json_fp=MINI_DICT_FP, lexicon_fp=MINI_DICT_LEXICON_FP) -> Lexicon:
+    """
+    打开词典文件。JSON 源文件比词典文件新（或词典文件不存在）时先重新编译。
+
+    编译只在词典更新后的首次启动时发生，也可以用 scripts/build_lexicon.py 预先完成；
+    只部署词典文件时无需 JSON 源文件。
+    """
+    with _build_lock:
+        if os.path.exists(json_fp) and (
+            not os.path.exists(lexicon_fp)
+            or os.path.getmtime(lexicon_fp) < os.path.getmtime(json_fp)
+        ):
+            with open(json_fp, "r", encoding="utf-8") as f:
+                build_lexicon(json.load(f), lexicon_fp)
+    return Lexicon(lexicon_fp)
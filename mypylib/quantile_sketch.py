@@ -0,0 +1,144 @@
+"""
+可合并的分位数草图（KLL）。
+
+草图由若干层压缩器组成，第 h 层的每个元素代表 2^h 个原始数据。
+某层元素超过容量时排序后随机保留奇数位或偶数位的一半，升入上一层，
+总大小约为 O(k)，与数据量无关。两个草图逐层拼接后再压缩即可合并，
+因此可以按天、按省份分别汇总，查询时再合并。
+
+秩的误差约为 1.7 / k（k 默认为 200 时约 1%）。
+
+参考：Karnin, Lang, Liberty. Optimal Quantile Approximation in Streams. FOCS 2016.
+"""
+
+import math
+import random
+from typing import Iterable, Optional
+
+import numpy as np
+
+DEFAULT_K = 200
+# 上下相邻两层的容量比
+_CAPACITY_RATIO = 2 / 3
+
+
+class KLLSketch:
+    """
+    示例：
+        sketch = KLLSketch()
+        for score in scores:
+            sketch.update(score)
+        sketch.merge(other_sketch)
+        sketch.rank(80), sketch.quantile(0.5)
+    """
+
+    __slots__ = ("k", "count", "compactors", "_rng")
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.k = k
+        self.count = 0
+        self.compactors = [[]]
+        self._rng = random.Random(seed)
+
+    def __len__(self):
+        return self.count
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * _CAPACITY_RATIO**depth)), 2)
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for h, items in enumerate(self.compactors):
+                if len(items) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items.sort()
+                # 奇数个时保留最大值，保证总权重不变
+                keep = [items.pop()] if len(items) % 2 else []
+                offset = self._rng.getrandbits(1)
+                self.compactors[h + 1].extend(items[offset::2])
+                self.compactors[h] = keep
+                break
+
+    def update(self, value: float):
+        """加入一个数据。"""
+        self.compactors[0].append(float(value))
+        self.count += 1
+        if len(self.compactors[0]) >= self._capacity(0):
+            self._compress()
+
+    def extend(self, values: Iterable[float]):
+        for value in values:
+            self.update(value)
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """将另一个草图合并到当前草图（原地修改）。"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _weighted(self):
+        """返回按值排序的元素及其累计权重。"""
+        values = np.fromiter(
+            (value for items in self.compactors for value in items), dtype=np.float64
+        )
+        weights = np.concatenate(
+            [np.full(len(items), 2**h) for h, items in enumerate(self.compactors)]
+        )
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def cdf(self, xs) -> np.ndarray:
+        """返回低于各 x 的数据比例，同值者计一半。"""
+        xs = np.asarray(xs, dtype=np.float64)
+        if self.count == 0:
+            return np.zeros_like(xs)
+        values, cumulative = self._weighted()
+        cumulative = np.concatenate([[0], cumulative])
+        below = cumulative[np.searchsorted(values, xs, side="left")]
+        not_above = cumulative[np.searchsorted(values, xs, side="right")]
+        return (below + not_above) / 2 / self.count
+
+    def rank(self, value: float) -> float:
+        """返回低于 value 的数据比例，同值者计一半。"""
+        return float(self.cdf([value])[0])
+
+    def quantile(self, q: float) -> float:
+        """返回第 q 分位数（0 ≤ q ≤ 1）。"""
+        if self.count == 0:
+            return float("nan")
+        values, cumulative = self._weighted()
+        i = np.searchsorted(cumulative, q * self.count, side="left")
+        return float(values[min(i, len(values) - 1)])
+
+    def to_dict(self) -> dict:
+        # Firestore 不支持嵌套数组，各层元素展开存放，另记每层的数量
+        return {
+            "k": self.k,
+            "count": self.count,
+            "levels": [len(items) for items in self.compactors],
+            "items": [value for items in self.compactors for value in items],
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "KLLSketch":
+        sketch = cls(d["k"])
+        sketch.count = d["count"]
+        sketch.compactors = []
+        start = 0
+        for size in d["levels"]:
+            sketch.compactors.append(list(d["items"][start : start + size]))
+            start += size
+        return sketch
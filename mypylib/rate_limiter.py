@@ -0,0 +1,288 @@
+"""
+令牌桶限流器，支持进程内、SQLite（同一主机多进程）和 Redis（多副本）三种后端。
+
+- 每个模型一个令牌桶，可选每个用户一个令牌桶，请求需同时从所有相关桶中取得令牌；
+- 批量生成（BATCH）只能使用桶中超出保留量的令牌，保证交互请求（INTERACTIVE）优先；
+- acquire 按所需等待时间休眠，acquire_async 可在事件循环中等待，均不轮询。
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# 批量请求需为交互请求保留的令牌比例
+BATCH_RESERVE_RATIO = 0.5
+
+
+class Quota(NamedTuple):
+    """令牌桶配额：capacity 为突发上限，rate 为每秒补充的令牌数。"""
+
+    capacity: float
+    rate: float
+
+    @classmethod
+    def per(cls, max_calls, per_seconds):
+        """每 per_seconds 秒 max_calls 次，允许一次性突发 max_calls 次。"""
+        return cls(float(max_calls), max_calls / per_seconds)
+
+
+# (键, 容量, 每秒补充量, 保留量)
+Bucket = Tuple[str, float, float, float]
+
+
+def _refill(tokens, updated, capacity, rate, now):
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _plan(levels: List[float], buckets: List[Bucket], tokens: float) -> float:
+    """根据各桶当前令牌数计算需要等待的秒数，0 表示可以立即取得。"""
+    wait = 0.0
+    for level, (_, _, rate, reserve) in zip(levels, buckets):
+        need = tokens + reserve
+        if level < need:
+            wait = max(wait, (need - level) / rate)
+    return wait
+
+
+# region 后端
+
+
+class InMemoryBackend:
+    """进程内后端，适用于单进程。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = {}
+
+    def try_acquire(self, buckets: List[Bucket], tokens: float, now: float) -> float:
+        with self.lock:
+            levels = []
+            for key, capacity, rate, _ in buckets:
+                state = self.states.get(key, (capacity, now))
+                levels.append(_refill(state[0], state[1], capacity, rate, now))
+            wait = _plan(levels, buckets, tokens)
+            if wait == 0:
+                for level, (key, _, _, _) in zip(levels, buckets):
+                    self.states[key] = (level - tokens, now)
+            return wait
+
+
+class SQLiteBackend:
+    """SQLite 后端，同一主机上的多个进程共享一个数据库文件。"""
+
+    def __init__(self, path, timeout=10.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self.local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            self.local.conn = conn
+        return conn
+
+    def try_acquire(self, buckets: List[Bucket], tokens: float, now: float) -> float:
+        conn = self._connect()
+        # IMMEDIATE 事务在读取前即获得写锁，保证多进程间的原子性
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            for key, capacity, rate, _ in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                state = row if row is not None else (capacity, now)
+                levels.append(_refill(state[0], state[1], capacity, rate, now))
+            wait = _plan(levels, buckets, tokens)
+            if wait == 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (key, level - tokens, now)
+                        for level, (key, _, _, _) in zip(levels, buckets)
+                    ],
+                )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_REDIS_SCRIPT = """
+local now = tonumber(ARGV[1])
+local n = tonumber(ARGV[2])
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local base = 3 + (i - 1) * 3
+    local capacity = tonumber(ARGV[base])
+    local rate = tonumber(ARGV[base + 1])
+    local reserve = tonumber(ARGV[base + 2])
+    local state = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    local level = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    levels[i] = level
+    if level < n + reserve then
+        wait = math.max(wait, (n + reserve - level) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local base = 3 + (i - 1) * 3
+    local capacity = tonumber(ARGV[base])
+    local rate = tonumber(ARGV[base + 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - n), 'updated', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return '0'
+"""
+
+
+class RedisBackend:
+    """Redis 后端，多个副本共享配额。client 为 redis.Redis 或兼容的客户端。"""
+
+    def __init__(self, client, prefix="rate_limiter:"):
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(_REDIS_SCRIPT)
+
+    def try_acquire(self, buckets: List[Bucket], tokens: float, now: float) -> float:
+        keys = [self.prefix + key for key, _, _, _ in buckets]
+        args = [now, tokens]
+        for _, capacity, rate, reserve in buckets:
+            args += [capacity, rate, reserve]
+        return float(self.script(keys=keys, args=args))
+
+
+def create_backend(url: Optional[str] = None):
+    """
+    根据 URL 创建后端。
+
+    Args:
+        url (str, optional): None 或 "memory" 为进程内后端；"sqlite:///<路径>" 为
+            SQLite 后端；"redis://..." 为 Redis 后端（需要安装 redis）。
+    """
+    if not url or url == "memory":
+        return InMemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///") :])
+    if url.startswith(("redis://", "rediss://")):
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(url))
+    raise ValueError(f"不支持的限流后端：{url}")
+
+
+# endregion
+
+
+class RateLimiter:
+    """按模型和用户限流的令牌桶限流器，线程安全。"""
+
+    def __init__(
+        self,
+        model_quota: Quota,
+        backend=None,
+        model_quotas: Dict[str, Quota] = None,
+        user_quota: Quota = None,
+    ):
+        """
+        Args:
+            model_quota (Quota): 模型的默认配额。
+            backend (optional): 存储令牌桶状态的后端，默认为进程内后端。
+            model_quotas (Dict[str, Quota], optional): 按模型名称覆盖默认配额。
+            user_quota (Quota, optional): 每个用户的配额，为 None 时不按用户限流。
+        """
+        self.model_quota = model_quota
+        self.backend = backend or InMemoryBackend()
+        self.model_quotas = model_quotas or {}
+        self.user_quota = user_quota
+
+    def _buckets(self, model_name, user, priority, tokens) -> List[Bucket]:
+        quotas = [
+            (f"model:{model_name}", self.model_quotas.get(model_name, self.model_quota))
+        ]
+        if user is not None and self.user_quota is not None:
+            quotas.append((f"user:{user}", self.user_quota))
+        buckets = []
+        for key, quota in quotas:
+            reserve = 0.0
+            if priority == BATCH:
+                reserve = min(
+                    quota.capacity * BATCH_RESERVE_RATIO, quota.capacity - tokens
+                )
+            buckets.append((key, quota.capacity, quota.rate, max(reserve, 0.0)))
+        return buckets
+
+    def try_acquire(
+        self, model_name, user=None, priority=INTERACTIVE, tokens=1
+    ) -> float:
+        """
+        尝试取得令牌。
+
+        Returns:
+            float: 0 表示已取得；否则为至少还需等待的秒数。
+        """
+        return self.backend.try_acquire(
+            self._buckets(model_name, user, priority, tokens), tokens, time.time()
+        )
+
+    def acquire(
+        self, model_name, user=None, priority=INTERACTIVE, tokens=1, timeout=None
+    ) -> bool:
+        """阻塞直到取得令牌。超过 timeout 秒仍未取得时返回 False。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(model_name, user, priority, tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    async def acquire_async(
+        self, model_name, user=None, priority=INTERACTIVE, tokens=1, timeout=None
+    ) -> bool:
+        """acquire 的协程版本，等待期间不阻塞事件循环。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(model_name, user, priority, tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            await asyncio.sleep(wait)
+
+    @contextmanager
+    def limit(self, model_name, user=None, priority=INTERACTIVE):
+        """在 with 语句中调用模型：with limiter.limit(model_name): ..."""
+        self.acquire(model_name, user, priority)
+        yield
+
+    def call_func(self, model_name, func, *args, **kwargs):
+        self.acquire(model_name)
+        return func(*args, **kwargs)
@@ -0,0 +1,185 @@
+"""
+单词复习调度器。
+
+每个用户一个调度器，复习状态（难度系数、间隔、到期时间、通过与失败次数、学习时长）
+按列存放在 NumPy 数组中。抽取单词时只对候选单词计算权重并做不放回加权抽样，
+每次答题后只更新该单词所在的一行。
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+DAY = 24 * 60 * 60
+# 答错后的重学间隔，与艾宾浩斯遗忘曲线的首次复习时间一致
+RELEARN_INTERVAL = 20 * 60
+# 首次答对后的间隔
+FIRST_INTERVAL = DAY
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_EASE = 3.0
+# 未到期单词的权重系数，候选单词大多未到期时仍可抽样
+NOT_DUE_WEIGHT = 0.1
+
+
+class ReviewScheduler:
+    """
+    基于 SM-2 的简化复习调度：答对时间隔乘以难度系数，答错时回到重学间隔。
+
+    示例：
+        scheduler = ReviewScheduler.from_stats(word_pass_stats, word_duration_stats)
+        words = scheduler.sample(word_list, 20)
+        scheduler.record("apple", True)
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.words: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.ease = np.full(capacity, DEFAULT_EASE)
+        self.interval = np.zeros(capacity)
+        self.due = np.zeros(capacity)
+        self.passed = np.zeros(capacity, dtype=np.int32)
+        self.failed = np.zeros(capacity, dtype=np.int32)
+        self.duration = np.zeros(capacity)
+        self.total_duration = 0.0
+
+    @classmethod
+    def from_stats(
+        cls,
+        word_pass_stats: dict,
+        word_duration_stats: dict,
+        now: Optional[float] = None,
+    ) -> "ReviewScheduler":
+        """
+        由已保存的单词测试统计和学习时长统计初始化，所有单词视为当前到期。
+
+        Args:
+            word_pass_stats (dict): {单词: {"passed": 通过次数, "failed": 失败次数}}。
+            word_duration_stats (dict): {单词: 学习秒数}。
+            now (float, optional): 当前时间戳。
+        """
+        now = time.time() if now is None else now
+        words = set(word_pass_stats) | set(word_duration_stats)
+        scheduler = cls(max(len(words), 1024))
+        for word in words:
+            i = scheduler._ensure(word, now)
+            stats = word_pass_stats.get(word, {})
+            passed, failed = stats.get("passed", 0), stats.get("failed", 0)
+            scheduler.passed[i] = passed
+            scheduler.failed[i] = failed
+            scheduler.ease[i] = min(
+                max(DEFAULT_EASE + 0.1 * passed - 0.2 * failed, MIN_EASE), MAX_EASE
+            )
+            scheduler.duration[i] = word_duration_stats.get(word, 0)
+        scheduler.total_duration = float(scheduler.duration[: len(words)].sum())
+        return scheduler
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.index
+
+    def _grow(self):
+        capacity = len(self.ease) * 2
+        for name in ("ease", "interval", "due", "passed", "failed", "duration"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+        self.ease[len(self.words) :] = DEFAULT_EASE
+
+    def _ensure(self, word: str, now: float) -> int:
+        i = self.index.get(word)
+        if i is None:
+            if len(self.words) == len(self.ease):
+                self._grow()
+            i = len(self.words)
+            self.words.append(word)
+            self.index[word] = i
+            self.due[i] = now
+        return i
+
+    def _indices(self, words: Iterable[str], now: float) -> np.ndarray:
+        return np.fromiter((self._ensure(word, now) for word in words), dtype=np.intp)
+
+    def weights(self, idx: np.ndarray, now: float) -> np.ndarray:
+        """
+        计算候选单词的抽样权重。
+
+        到期越久权重越高，未到期单词乘以 NOT_DUE_WEIGHT；
+        失败率高的单词权重高、通过率高的单词权重低；学习时长越长权重略低。
+        """
+        interval = np.maximum(self.interval[idx], RELEARN_INTERVAL)
+        overdue = now - self.due[idx]
+        urgency = np.where(overdue >= 0, 1 + overdue / interval, NOT_DUE_WEIGHT)
+        passed = self.passed[idx]
+        failed = self.failed[idx]
+        attempts = np.maximum(passed + failed, 1)
+        difficulty = (1 - 0.5 * passed / attempts) * (1 + 0.5 * failed / attempts)
+        weights = urgency * difficulty
+        if self.total_duration > 0:
+            weights *= 1 - 0.1 * self.duration[idx] / self.total_duration
+        return weights
+
+    def due_words(self, words: Iterable[str], now: Optional[float] = None) -> list:
+        """返回候选单词中已到期的单词。"""
+        now = time.time() if now is None else now
+        idx = self._indices(words, now)
+        return [self.words[i] for i in idx[self.due[idx] <= now]]
+
+    def sample(
+        self,
+        words: Iterable[str],
+        k: int,
+        now: Optional[float] = None,
+        rng: Optional[np.random.Generator] = None,
+    ) -> list:
+        """
+        从候选单词中按权重不放回地抽取 k 个单词，不足 k 个时全部返回。
+
+        Args:
+            words (Iterable[str]): 候选单词，未见过的单词作为新词加入。
+            k (int): 抽取数量。
+            now (float, optional): 当前时间戳。
+            rng (np.random.Generator, optional): 随机数生成器。
+        """
+        now = time.time() if now is None else now
+        rng = np.random.default_rng() if rng is None else rng
+        idx = np.unique(self._indices(words, now))
+        if len(idx) == 0:
+            return []
+        weights = self.weights(idx, now)
+        chosen = rng.choice(
+            idx, size=min(k, len(idx)), replace=False, p=weights / weights.sum()
+        )
+        return [self.words[i] for i in chosen]
+
+    def record(self, word: str, passed: bool, now: Optional[float] = None):
+        """记录一次答题结果并安排下次复习。"""
+        now = time.time() if now is None else now
+        i = self._ensure(word, now)
+        if passed:
+            self.passed[i] += 1
+            if self.interval[i] < FIRST_INTERVAL:
+                self.interval[i] = FIRST_INTERVAL
+            else:
+                self.interval[i] *= self.ease[i]
+            self.ease[i] = min(self.ease[i] + 0.1, MAX_EASE)
+        else:
+            self.failed[i] += 1
+            self.interval[i] = RELEARN_INTERVAL
+            self.ease[i] = max(self.ease[i] - 0.2, MIN_EASE)
+        self.due[i] = now + self.interval[i]
+
+    def record_results(self, word_results: dict, now: Optional[float] = None):
+        """记录一组答题结果 {单词: 是否正确}。"""
+        for word, passed in word_results.items():
+            self.record(word, passed, now)
+
+    def record_duration(self, word: str, seconds: float):
+        """累加单词的学习时长。"""
+        i = self._ensure(word, time.time())
+        self.duration[i] += seconds
+        self.total_duration += seconds
@@ -26,10 +26,23 @@ from .azure_pronunciation_assessment import (
     get_syllable_durations_and_offsets,
     pronunciation_assessment_from_stream,
 )
-from .azure_speech import synthesize_speech
-from .constants import USD_TO_CNY_EXCHANGE_RATE
+from .audio_cache import AudioCache, get_wav_duration
+from .azure_speech import (
+    MAX_SYNTHESIS_WORKERS,
+    iter_concurrent_synthesis,
+    synthesize_speech,
+)
+from .constants import SYSTEM_USER, USD_TO_CNY_EXCHANGE_RATE
 from .db_interface import DbInterface
-from .google_ai import MAX_CALLS, PER_SECONDS, ModelRateLimiter
+from .exercise_pool import ExercisePool, ExercisePoolRefiller
+from .google_ai import (
+    MAX_CALLS,
+    PER_SECONDS,
+    ModelRateLimiter,
+    SystemIdentity,
+    get_usage_dbi,
+    run_as_system,
+)
 from .google_cloud_configuration import (
     LOCATION,
     PROJECT_ID,
@@ -38,10 +51,10 @@ from .google_cloud_configuration import (
 )
 from .html_constants import TIPPY_JS
 from .html_fmt import pronunciation_assessment_word_format
+from .lexicon import open_lexicon
 from .utils import calculate_audio_duration
 from .word_utils import (
     audio_autoplay_elem,
-    get_mini_dict,
     get_word_image_urls,
     load_image_bytes_from_url,
 )
@@ -151,6 +164,16 @@ def get_firestore_client():
     return firestore.Client(credentials=credentials, project=PROJECT_ID)
 
 
+def get_rate_limiter():
+    """返回按模型和用户限流的限流器，所有会话和后台任务共享模型配额。"""
+    return ModelRateLimiter(
+        MAX_CALLS,
+        PER_SECONDS,
+        st.secrets.get("RATE_LIMITER_URL"),
+        st.secrets.get("RATE_LIMITER_USER_MAX_CALLS"),
+    )
+
+
 def configure_google_apis():
     # 配置 AI 服务
     if st.secrets["env"] in ["streamlit", "azure"]:
@@ -160,7 +183,8 @@ def configure_google_apis():
             st.session_state["inited_google_ai"] = True
 
         if "rate_limiter" not in st.session_state:
-            st.session_state.rate_limiter = ModelRateLimiter(MAX_CALLS, PER_SECONDS)
+            # 设置 RATE_LIMITER_URL 后，多个副本或进程共享限流配额
+            st.session_state.rate_limiter = get_rate_limiter()
 
         if "google_translate_client" not in st.session_state:
             st.session_state["google_translate_client"] = get_translation_client()
@@ -203,7 +227,7 @@ def google_translate(
     # Location must be 'us-central1' or 'global'.
     parent = f"projects/{PROJECT_ID}/locations/global"
 
-    client = st.session_state.google_translate_client
+    client = get_translation_client()
     # Detail on supported types can be found here:
     # https://cloud.google.com/translate/docs/supported-formats
     response = client.translate_text(
@@ -228,7 +252,7 @@ def google_translate(
         "item_name": item_name,
         "timestamp": datetime.now(pytz.UTC),
     }
-    st.session_state.dbi.add_usage_to_cache(usage)
+    get_usage_dbi().add_usage_to_cache(usage)
     # logger.info(f"翻译费用：{cost:.4f}元，字符数：{char_count}")
     return res if is_list else res[0]
 
@@ -258,6 +282,58 @@ def get_blob_container_client(container_name):
     return blob_service_client.get_container_client(container_name)
 
 
+@st.cache_resource
+def get_audio_cache():
+    # 在 secrets 中设置 AUDIO_CACHE_CONTAINER 后启用 Blob 层，供多个副本共享
+    container_name = st.secrets.get("AUDIO_CACHE_CONTAINER")
+    container_client = (
+        get_blob_container_client(container_name) if container_name else None
+    )
+    return AudioCache(container_client=container_client)
+
+
+# endregion
+
+# region 练习内容池
+
+
+@st.cache_resource
+def get_system_identity():
+    """
+    后台任务使用的系统身份：独立的数据库接口，费用和令牌记录计入系统账户；
+    限流器与会话共享模型配额，系统账户有单独的用户配额。
+    """
+    dbi = DbInterface(get_firestore_client(), st.secrets.get("HISTORY_BUCKET"))
+    dbi.cache["user_info"] = {"phone_number": SYSTEM_USER, "display_name": "系统"}
+    return SystemIdentity(dbi, get_rate_limiter())
+
+
+@st.cache_resource
+def get_exercise_pool_refiller():
+    fp = st.secrets.get("EXERCISE_POOL_FP")
+    identity = get_system_identity()
+    return ExercisePoolRefiller(
+        ExercisePool(fp) if fp else ExercisePool(),
+        context=lambda: run_as_system(identity),
+    )
+
+
+def pop_exercise_bundle(level, category, build):
+    """
+    从内容池中取出一个练习包，并在池中数量低于低水位时启动后台补充。
+
+    内容池由所有用户共享，后台补充以系统身份按 BATCH 优先级调用模型，
+    不绑定当前会话，因此 build 不能使用 st.session_state。
+
+    Returns:
+        dict | None: 练习包，池为空时返回 None。
+    """
+    refiller = get_exercise_pool_refiller()
+    bundle = refiller.pool.pop(level, category)
+    refiller.request_refill(level, category, build)
+    return bundle
+
+
 # endregion
 
 # region 播放显示
@@ -443,10 +519,8 @@ def is_aside(text):
     return re.match(r"^\(.*\)$", text) is not None
 
 
-@st.cache_data(max_entries=10000, ttl=timedelta(days=1), show_spinner=False)
-def get_synthesis_speech(text, voice):
-    # 首先处理text，删除text中的空白行
-    text = re.sub("\n\\s*\n*", "\n", text)
+def _synthesize_speech_with_fallback(text, voice):
+    """优先使用免费密钥合成语音，失败时改用付费密钥。可在工作线程中调用。"""
     is_free = True
     try:
         result = synthesize_speech(
@@ -467,7 +541,10 @@ def get_synthesis_speech(text, voice):
             st.secrets["Microsoft"]["SPEECH_REGION"],
             voice,
         )
+    return result, is_free
 
+
+def _add_synthesis_usage(text, is_free):
     if is_free:
         cost0 = 0.0
         cost1 = 0.0
@@ -498,23 +575,76 @@ def get_synthesis_speech(text, voice):
         "item_name": "语音合成",
         "timestamp": datetime.now(pytz.UTC),
     }
-    st.session_state.dbi.add_usage_to_cache(usage)
+    get_usage_dbi().add_usage_to_cache(usage)
     # logger.info(f"语音合成费用：{cost:.4f}元，字符数：{char_count}")
     # free_flag = "免费" if is_free else "付费"
     # logger.info(
     #     f"语音合成费用：{cost0:.4f}元，字符数：{char_count}，是否免费：{free_flag}，费用1：{cost1:.4f}元"
     # )
-    return {"audio_data": result.audio_data, "audio_duration": result.audio_duration}
+
+
+def _get_or_synthesize_speech(audio_cache, text, voice):
+    """
+    先查询语音缓存，未命中时合成并写入缓存。可在工作线程中调用。
+
+    Returns:
+        tuple: (音频数据, 是否免费)。命中缓存时第二项为 None，表示没有产生费用。
+    """
+    audio_data = audio_cache.get(text, voice)
+    if audio_data is not None:
+        return audio_data, None
+    result, is_free = _synthesize_speech_with_fallback(text, voice)
+    # 只缓存合成成功的音频
+    if result.reason == ResultReason.SynthesizingAudioCompleted:
+        audio_cache.put(text, voice, result.audio_data)
+    return result.audio_data, is_free
+
+
+def get_synthesis_speech(text, voice):
+    # 首先处理text，删除text中的空白行
+    text = re.sub("\n\\s*\n*", "\n", text)
+    audio_data, is_free = _get_or_synthesize_speech(get_audio_cache(), text, voice)
+    if is_free is not None:
+        _add_synthesis_usage(text, is_free)
+    return {"audio_data": audio_data, "audio_duration": get_wav_duration(audio_data)}
+
+
+def iter_synthesis_speech(items, max_workers=MAX_SYNTHESIS_WORKERS):
+    """
+    并发合成多段文本，按输入顺序逐个返回合成结果。
+
+    第一段合成完成即可开始播放，其余段落在后台继续合成。
+    费用记录在主线程中完成，工作线程不访问 st.session_state。
+
+    Args:
+        items (list): (文本, 语音名称) 列表。
+        max_workers (int, optional): 最大并发数。默认为 MAX_SYNTHESIS_WORKERS。
+
+    Yields:
+        dict: 与 get_synthesis_speech 相同，包含 audio_data 和 audio_duration。
+    """
+    items = [(re.sub("\n\\s*\n*", "\n", text), voice) for text, voice in items]
+    audio_cache = get_audio_cache()
+    results = iter_concurrent_synthesis(
+        items,
+        lambda text, voice: _get_or_synthesize_speech(audio_cache, text, voice),
+        max_workers,
+    )
+    for (text, _), (audio_data, is_free) in zip(items, results):
+        if is_free is not None:
+            _add_synthesis_usage(text, is_free)
+        yield {
+            "audio_data": audio_data,
+            "audio_duration": get_wav_duration(audio_data),
+        }
 
 
 @st.cache_resource
 def load_mini_dict():
-    return get_mini_dict()
+    # 以 mmap 打开编译后的词典，各进程共享页缓存，无需整体解析 JSON
+    return open_lexicon()
 
 
-@st.cache_resource(
-    show_spinner="提取简版词典单词信息...", ttl=timedelta(days=1)
-)  # 缓存有效期为24小时
 def get_mini_dict_doc(word):
     w = word.replace("/", " or ")
     mini_dict = load_mini_dict()
@@ -672,7 +802,14 @@ def left_paragraph_aligned_text(text1, words):
 # region 个人记录
 
 
-def on_project_changed(project_name):
+def on_project_changed(project_name, word=None):
+    """
+    切换当前计时的项目。
+
+    Args:
+        project_name (str): 项目名称。
+        word (str, optional): 单词练习项目对应的单词，随练习记录一起保存。
+    """
     if not st.session_state.get("role"):
         return
 
@@ -693,6 +830,7 @@ def on_project_changed(project_name):
             duration += t
 
             st.session_state["project-timer"][previous_project] = {
+                **st.session_state["project-timer"][previous_project],
                 "start_time": None,
                 "end_time": time.time(),
                 "duration": duration,
@@ -709,6 +847,7 @@ def on_project_changed(project_name):
         "start_time": time.time(),
         "end_time": None,
         "duration": previous_duration,
+        "word": word,
     }
     st.session_state["current-project"] = project_name
 
@@ -757,13 +896,14 @@ def add_exercises_to_db(force=False):
                 )
 
             if project_data["duration"] <= ABNORMAL_DURATION:
-                docs.append(
-                    {
-                        "item": project_name,
-                        "duration": project_data["duration"],
-                        "timestamp": datetime.now(pytz.UTC),
-                    }
-                )
+                doc = {
+                    "item": project_name,
+                    "duration": project_data["duration"],
+                    "timestamp": datetime.now(pytz.UTC),
+                }
+                if project_data.get("word"):
+                    doc["word"] = project_data["word"]
+                docs.append(doc)
 
         # 保存数据到 Firestore
         st.session_state.dbi.add_documents_to_user_history("exercises", docs)
@@ -0,0 +1,136 @@
+"""
+增量 JSON 解析器，用于流式输出的结构化内容。
+
+模型以文本块的形式返回 JSON，解析器逐块扫描，每当列表中的一项或对象中的一个字段
+完整出现时立即返回，无需等待全部输出。根值之前的文本（例如 ```json 围栏）和
+根值之后的文本均被忽略。
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+_decoder = json.JSONDecoder()
+
+
+class _Frame:
+    """正在扫描的列表或对象。"""
+
+    __slots__ = ("kind", "path", "start", "index")
+
+    def __init__(self, kind, path, start):
+        self.kind = kind
+        self.path = path
+        # 当前元素在缓冲区中的起始位置
+        self.start = start
+        self.index = 0
+
+
+class IncrementalJSONParser:
+    """
+    逐块解析 JSON，返回已完整的元素。
+
+    示例：
+        parser = IncrementalJSONParser()
+        for chunk in chunks:
+            for path, value in parser.feed(chunk):
+                ...
+        result = parser.result()
+
+    路径为从根开始的键或序号组成的元组，例如 ("scoringRecords", 0)。
+    """
+
+    def __init__(self, max_depth: int = 1):
+        """
+        Args:
+            max_depth (int, optional): 返回元素的最大深度。根的直接子元素深度为 1。
+        """
+        self.max_depth = max_depth
+        self.buffer = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.in_string = False
+        self.escape = False
+        self.root_start: Optional[int] = None
+        self.root_end: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        """根值是否已经完整。"""
+        return self.root_end is not None
+
+    def feed(self, chunk: str) -> List[Tuple[tuple, Any]]:
+        """
+        追加文本块。
+
+        Returns:
+            List[Tuple[tuple, Any]]: 本次新完整的 (路径, 值) 列表，按出现顺序排列。
+        """
+        self.buffer += chunk
+        events = []
+        buf = self.buffer
+        i = self.pos
+        n = len(buf)
+        while i < n and not self.done:
+            c = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif not self.stack:
+                # 跳过根值之前的围栏和说明文字
+                if c in "{[":
+                    self.root_start = i
+                    self.stack.append(_Frame(c, (), i + 1))
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                top = self.stack[-1]
+                key = self._child_key(top, i)
+                self.stack.append(_Frame(c, top.path + (key,), i + 1))
+            elif c in ",]}":
+                top = self.stack[-1]
+                self._complete(top, i, events)
+                if c == ",":
+                    top.start = i + 1
+                    top.index += 1
+                else:
+                    self.stack.pop()
+                    if not self.stack:
+                        self.root_end = i + 1
+            i += 1
+        self.pos = i
+        return events
+
+    def result(self) -> Any:
+        """返回完整的根值。根值尚未完整时引发 ValueError。"""
+        if not self.done:
+            raise ValueError("JSON 尚未完整")
+        return json.loads(self.buffer[self.root_start : self.root_end])
+
+    def _child_key(self, frame, end):
+        if frame.kind == "[":
+            return frame.index
+        # 对象中的子容器，键位于元素起始位置与冒号之间
+        text = self.buffer[frame.start : end].strip()
+        return json.loads(text[:-1].strip())
+
+    def _complete(self, frame, end, events):
+        text = self.buffer[frame.start : end].strip()
+        if not text or len(frame.path) + 1 > self.max_depth:
+            return
+        try:
+            if frame.kind == "[":
+                key, value = frame.index, json.loads(text)
+            else:
+                key, idx = _decoder.raw_decode(text)
+                rest = text[idx:].lstrip()
+                if not rest.startswith(":"):
+                    return
+                value = json.loads(rest[1:])
+        except ValueError:
+            # 不合法的元素留给完整解析时报告
+            return
+        events.append((frame.path + (key,), value))
@@ -0,0 +1,117 @@
+"""
+按用户维护的单词状态索引：学习时长、测试通过与失败次数、最近学习时间。
+
+索引在会话中首次使用时由数据库中的单词统计初始化，此后随新增的练习和测试记录
+增量更新，抽样、报告和今日已学列表都直接读取索引，无需再从项目名称中解析单词。
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# 各集合中记录时间的字段
+_TIME_FIELDS = {"exercises": "timestamp", "performances": "record_time"}
+
+
+class WordState:
+    __slots__ = ("duration", "passed", "failed", "last_seen")
+
+    def __init__(self):
+        self.duration = 0.0
+        self.passed = 0
+        self.failed = 0
+        self.last_seen: Optional[datetime] = None
+
+    def touch(self, timestamp: Optional[datetime]):
+        if timestamp is not None and (
+            self.last_seen is None or timestamp > self.last_seen
+        ):
+            self.last_seen = timestamp
+
+
+class WordStateIndex:
+    """单词到 WordState 的映射。"""
+
+    def __init__(self, phone_number: str):
+        self.phone_number = phone_number
+        self.states: Dict[str, WordState] = {}
+
+    @classmethod
+    def from_stats(
+        cls, phone_number: str, word_pass_stats: dict, word_duration_stats: dict
+    ) -> "WordStateIndex":
+        """由数据库中的 word_pass_stats 和 word_duration_stats 初始化。"""
+        index = cls(phone_number)
+        for word, stats in word_pass_stats.items():
+            state = index._state(word)
+            state.passed = stats.get("passed", 0)
+            state.failed = stats.get("failed", 0)
+        for word, duration in word_duration_stats.items():
+            index._state(word).duration = duration
+        return index
+
+    def _state(self, word: str) -> WordState:
+        state = self.states.get(word)
+        if state is None:
+            state = self.states[word] = WordState()
+        return state
+
+    def __contains__(self, word):
+        return word in self.states
+
+    def __len__(self):
+        return len(self.states)
+
+    def get(self, word: str) -> Optional[WordState]:
+        return self.states.get(word)
+
+    def seen(self, word: str, timestamp: Optional[datetime] = None):
+        """记录单词在 timestamp（默认为当前时间）被学习。"""
+        self._state(word).touch(timestamp or datetime.now(timezone.utc))
+
+    def add_documents(self, collection_name: str, documents: List[dict]):
+        """
+        合并新增的学习历史。
+
+        练习记录使用 word 字段累加学习时长，测试记录使用 word_results 累加通过与失败次数。
+        """
+        time_field = _TIME_FIELDS.get(collection_name)
+        for document in documents:
+            timestamp = document.get(time_field)
+            if collection_name == "exercises":
+                word = document.get("word")
+                if word:
+                    state = self._state(word)
+                    state.duration += document.get("duration", 0)
+                    state.touch(timestamp)
+            elif collection_name == "performances":
+                for word, passed in (document.get("word_results") or {}).items():
+                    state = self._state(word)
+                    if passed:
+                        state.passed += 1
+                    else:
+                        state.failed += 1
+                    state.touch(timestamp)
+
+    def learned_since(self, since: datetime) -> List[str]:
+        """返回 since 之后学习过的单词。"""
+        return [
+            word
+            for word, state in self.states.items()
+            if state.last_seen is not None and state.last_seen >= since
+        ]
+
+    def pass_stats(self) -> dict:
+        """返回与 word_pass_stats 格式相同的通过与失败次数。"""
+        return {
+            word: {"passed": state.passed, "failed": state.failed}
+            for word, state in self.states.items()
+            if state.passed or state.failed
+        }
+
+    def duration_stats(self) -> dict:
+        """返回与 word_duration_stats 格式相同的学习时长。"""
+        return {
+            word: state.duration
+            for word, state in self.states.items()
+            if state.duration
+        }
@@ -6,11 +6,13 @@ import os
 import random
 import re
 import string
-from collections import defaultdict
+import threading
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 from typing import List, Union
 
+import numpy as np
 import requests
 import spacy
 from azure.storage.blob import BlobClient, BlobServiceClient, ContainerClient
@@ -18,9 +20,24 @@ from PIL import Image
 from pydub import AudioSegment
 
 from .azure_speech import synthesize_speech_to_file
+from .lexicon import Lexicon
 
 CURRENT_CWD: Path = Path(__file__).parent.parent
 
+SPACY_MODEL_NAME = "en_core_web_sm"
+# 词形还原只需要 tagger、attribute_ruler 和 lemmatizer，依存句法分析从不使用
+SPACY_DISABLED_COMPONENTS = ["parser"]
+SPACY_BATCH_SIZE = 64
+# 共享词典的词元等级在进程内缓存的数量
+LEMMA_LEVEL_CACHE_SIZE = 65536
+
+UNGRADED_LEVEL = "未分级"
+# 等级编码，0 为未分级；词典中出现的其他等级在运行时追加
+CEFR_LEVELS = [UNGRADED_LEVEL, "A1", "A2", "B1", "B2", "C1", "C2"]
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
 
 def get_word_cefr_map(name, fp):
     assert name in ("us", "uk"), "只支持`US、UK`二种发音。"
@@ -87,7 +104,15 @@ def get_mini_dict():
         return json.load(f)
 
 
+@lru_cache(maxsize=LEMMA_LEVEL_CACHE_SIZE)
+def _lexicon_level(lexicon, word):
+    # 词典只读，按 (词典, 词元) 缓存，同一进程内的各个页面和会话共用
+    return lexicon.level(word)
+
+
 def get_cefr_level(word, mini_dict):
+    if isinstance(mini_dict, Lexicon):
+        return _lexicon_level(mini_dict, word)
     if word in mini_dict:
         return mini_dict[word]["level"]
     return None
@@ -96,26 +121,15 @@ def get_cefr_level(word, mini_dict):
 def count_words_and_get_levels(
     text, mini_dict, percentage=False, exclude_persons=False, excluded_words=[]
 ):
-    level_words = get_cefr_vocabulary_list(
-        [text], mini_dict, exclude_persons, excluded_words
-    )
-    # 初始化字典
-    levels = defaultdict(int)
-    # 遍历分级词汇列表
-    for level, words in level_words.items():
-        # 增加对应级别的计数
-        levels[level] = len(words)
-
-    total_words = sum(len(words) for words in level_words.values())
-
+    profile = profile_texts([text], mini_dict, exclude_persons, excluded_words)[0]
+    levels = profile["counts"]
     if percentage:
-        for level in levels:
-            levels[level] = (
-                f"{levels[level]} ({levels[level] / total_words * 100:.2f}%)"
-            )
-
+        levels = {
+            level: f"{n} ({profile['percentages'][level]:.2f}%)"
+            for level, n in levels.items()
+        }
     # 返回总字数和字典
-    return total_words, dict(levels)
+    return profile["total"], levels
 
 
 # TODO:废弃
@@ -200,31 +214,53 @@ def load_image_bytes_from_url(img_url: str) -> bytes:
     return img_byte_arr
 
 
+def get_nlp():
+    """返回进程内共享的 spaCy 管线，首次调用时加载。"""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = spacy.load(SPACY_MODEL_NAME, disable=SPACY_DISABLED_COMPONENTS)
+    return _nlp
+
+
 def get_cefr_vocabulary_list(
-    texts: List[str], mini_dict: dict, exclude_persons=False, excluded_words=[]
+    texts: List[str],
+    mini_dict: dict,
+    exclude_persons=False,
+    excluded_words=[],
+    batch_size=SPACY_BATCH_SIZE,
+    n_process=1,
 ):
+    """
+    按 CEFR 等级对文本中的单词（词元）分组。
+
+    Args:
+        texts (List[str]): 文本列表，批量交给 nlp.pipe 处理。
+        mini_dict (dict): 简版词典，提供单词的 CEFR 等级。
+        exclude_persons (bool, optional): 是否排除人名。只有此时才运行实体识别。
+        excluded_words (list, optional): 需要排除的单词。
+        batch_size (int, optional): nlp.pipe 的批大小。
+        n_process (int, optional): nlp.pipe 的进程数。文本量很大时才值得大于 1。
+
+    Returns:
+        dict: 以 CEFR 等级为键、词元集合为值的字典，词典中没有的词元归入"未分级"。
+    """
     assert isinstance(texts, list), "texts must be a list of strings"
-    model_name = "en_core_web_sm"
-    nlp = spacy.load(model_name)
+    nlp = get_nlp()
     cefr_vocabulary = {}
-    excluded_words = [
+    excluded_words = {
         word.lower() for word in excluded_words
-    ]  # 将排除词汇列表转换为小写
-    for text in texts:
-        doc = nlp(text)
-        if exclude_persons:
-            tokens = [token for token in doc if token.ent_type_ != "PERSON"]
-        else:
-            tokens = doc
-        lemmatized_words = [
-            token.lemma_
-            for token in tokens
-            if token.is_alpha and token.lemma_.lower() not in excluded_words
-        ]  # 在这里排除词汇
-        for lemma in lemmatized_words:
-            cefr_level = get_cefr_level(lemma, mini_dict)
-            if cefr_level is None:
-                cefr_level = "未分级"
+    }  # 将排除词汇列表转换为小写
+    docs = nlp.pipe(
+        texts,
+        batch_size=batch_size,
+        n_process=n_process,
+        disable=[] if exclude_persons else ["ner"],
+    )
+    for doc in docs:
+        for lemma in _doc_lemmas(doc, exclude_persons, excluded_words):
+            cefr_level = get_cefr_level(lemma, mini_dict) or UNGRADED_LEVEL
             if cefr_level not in cefr_vocabulary:
                 cefr_vocabulary[cefr_level] = set()
             cefr_vocabulary[cefr_level].add(lemma)
@@ -232,6 +268,133 @@ def get_cefr_vocabulary_list(
     return cefr_vocabulary
 
 
+def _doc_lemmas(doc, exclude_persons, excluded_words):
+    if exclude_persons:
+        tokens = [token for token in doc if token.ent_type_ != "PERSON"]
+    else:
+        tokens = doc
+    return [
+        token.lemma_
+        for token in tokens
+        if token.is_alpha and token.lemma_.lower() not in excluded_words
+    ]  # 在这里排除词汇
+
+
+def _level_counts(levels, counts):
+    return {level: int(n) for level, n in zip(levels, counts) if n}
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """按换行拆分段落，忽略空行。"""
+    return [p.strip() for p in text.split("\n") if p.strip()]
+
+
+def profile_texts(
+    texts: List[str],
+    mini_dict: dict,
+    exclude_persons=False,
+    excluded_words=[],
+    batch_size=SPACY_BATCH_SIZE,
+    n_process=1,
+) -> List[dict]:
+    """
+    一次处理多篇文本，统计各 CEFR 等级的不重复词元数量。
+
+    全部段落一次交给 nlp.pipe，词元映射为整数等级编码后用 np.bincount 计数，
+    文本和段落的统计在同一遍中完成。
+
+    Args:
+        texts (List[str]): 文本列表。
+        mini_dict (dict): 简版词典，提供单词的 CEFR 等级。
+        exclude_persons (bool, optional): 是否排除人名。
+        excluded_words (list, optional): 需要排除的单词。
+        batch_size (int, optional): nlp.pipe 的批大小。
+        n_process (int, optional): nlp.pipe 的进程数。
+
+    Returns:
+        List[dict]: 与 texts 一一对应，每项包含：
+            total: 不重复词元总数；
+            counts: 各等级的词元数量，数量为 0 的等级不列出；
+            percentages: 各等级所占百分比；
+            unknown_words: 未分级的词元；
+            paragraphs: 各段落的 text、total 和 counts。
+    """
+    assert isinstance(texts, list), "texts must be a list of strings"
+    nlp = get_nlp()
+    excluded_words = {word.lower() for word in excluded_words}
+    paragraphs = [split_paragraphs(text) for text in texts]
+    levels = list(CEFR_LEVELS)
+    level_codes = {level: i for i, level in enumerate(levels)}
+    lemma_ids = {}
+    lemmas = []
+    lemma_levels = []
+    # 每篇文本中各词元所在的段落序号和词元编号
+    para_idx = [[] for _ in texts]
+    lemma_idx = [[] for _ in texts]
+    docs = nlp.pipe(
+        (
+            (paragraph, (i, j))
+            for i, ps in enumerate(paragraphs)
+            for j, paragraph in enumerate(ps)
+        ),
+        as_tuples=True,
+        batch_size=batch_size,
+        n_process=n_process,
+        disable=[] if exclude_persons else ["ner"],
+    )
+    for doc, (i, j) in docs:
+        for lemma in _doc_lemmas(doc, exclude_persons, excluded_words):
+            k = lemma_ids.get(lemma)
+            if k is None:
+                k = lemma_ids[lemma] = len(lemmas)
+                lemmas.append(lemma)
+                level = get_cefr_level(lemma, mini_dict) or UNGRADED_LEVEL
+                if level not in level_codes:
+                    level_codes[level] = len(levels)
+                    levels.append(level)
+                lemma_levels.append(level_codes[level])
+            para_idx[i].append(j)
+            lemma_idx[i].append(k)
+
+    n_levels = len(levels)
+    n_lemmas = max(len(lemmas), 1)
+    code_of = np.array(lemma_levels, dtype=np.intp)
+    profiles = []
+    for i, ps in enumerate(paragraphs):
+        tok_para = np.array(para_idx[i], dtype=np.intp)
+        tok_lemma = np.array(lemma_idx[i], dtype=np.intp)
+        unique_lemmas = np.unique(tok_lemma)
+        unique_codes = code_of[unique_lemmas]
+        counts = np.bincount(unique_codes, minlength=n_levels)
+        # 段落内去重后按 (段落, 等级) 计数
+        pairs = np.unique(tok_para * n_lemmas + tok_lemma)
+        para_counts = np.bincount(
+            pairs // n_lemmas * n_levels + code_of[pairs % n_lemmas],
+            minlength=len(ps) * n_levels,
+        ).reshape(len(ps), n_levels)
+        total = int(counts.sum())
+        profiles.append(
+            {
+                "total": total,
+                "counts": _level_counts(levels, counts),
+                "percentages": {
+                    level: n / total * 100
+                    for level, n in _level_counts(levels, counts).items()
+                },
+                "unknown_words": [lemmas[k] for k in unique_lemmas[unique_codes == 0]],
+                "paragraphs": [
+                    {
+                        "text": paragraph,
+                        "total": int(row.sum()),
+                        "counts": _level_counts(levels, row),
+                    }
+                    for paragraph, row in zip(ps, para_counts)
+                ],
+            }
+        )
+    return profiles
+
+
 def is_phrase_combination_description(word, exclude_pattern="^either .+ or"):
     """
     判断一个单词是否是短语组合的描述。
@@ -5,7 +5,6 @@ import uuid
 from datetime import timedelta
 from pathlib import Path
 
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import pytz
@@ -17,6 +16,7 @@ from azure.storage.blob import BlobServiceClient
 from PIL import Image
 from menu import menu
 
+from mypylib.analytics import merge_distributions
 from mypylib.auth_utils import is_valid_email
 from mypylib.constants import CEFR_LEVEL_MAPS, PROVINCES, calculate_required_hours
 from mypylib.db_interface import DbInterface
@@ -28,13 +28,12 @@ from mypylib.st_helper import (
     setup_logger,
 )
 from mypylib.statistics_report import (
-    get_performance_data,
     display_average_scores,
     display_study_time,
     display_word_study,
-    get_exercises,
-    get_performances,
-    get_valid_exercise_time,
+    get_score_cohorts,
+    get_user_item_scores,
+    get_valid_exercise_minutes,
     plot_student_score_ranking,
 )
 from mypylib.utils import get_current_monday
@@ -261,14 +260,6 @@ with tabs[get_item_index("学习报告")]:
         end_date = st.date_input("结束日期", value=now.date())
         period = st.selectbox("统计周期", ["天", "小时"], index=0)
 
-    # 创建列映射
-    column_mapping = {
-        "item": "项目",
-        "duration": "时长",
-        "timestamp": "学习日期",
-        "phone_number": "手机号码",
-    }
-
     study_report_items = [
         "📚 单词",
         "⏰ 时间",
@@ -285,16 +276,7 @@ with tabs[get_item_index("学习报告")]:
             key="study_word_button",
             help="✨ 点击查看学习单词分析报告。",
         ):
-            df = pd.DataFrame(get_exercises(phone_number, start_date, end_date))
-            df_previous_period = pd.DataFrame(
-                get_exercises(phone_number, start_date, end_date, previous_period=True)
-            )
-            if df.empty:
-                st.warning("当前期间内没有学习记录。", icon="⚠️")
-            else:
-                display_word_study(
-                    df, df_previous_period, column_mapping, user_tz, period
-                )
+            display_word_study(phone_number, start_date, end_date, user_tz, period)
 
     with study_report_tabs[study_report_items.index("⏰ 时间")]:
         st.subheader("⏰ 学习时间", divider="rainbow")
@@ -303,16 +285,7 @@ with tabs[get_item_index("学习报告")]:
             key="study_time_button",
             help="✨ 点击查看学习时间分析报告。",
         ):
-            df = pd.DataFrame(get_exercises(phone_number, start_date, end_date))
-            df_previous_period = pd.DataFrame(
-                get_exercises(phone_number, start_date, end_date, previous_period=True)
-            )
-            if df.empty:
-                st.warning("当前期间内没有学习记录。", icon="⚠️")
-            else:
-                display_study_time(
-                    df, df_previous_period, column_mapping, user_tz, period
-                )
+            display_study_time(phone_number, start_date, end_date, user_tz, period)
 
     with study_report_tabs[study_report_items.index("📈 进度")]:
         st.subheader("📈 学习进度", divider="rainbow")
@@ -321,17 +294,16 @@ with tabs[get_item_index("学习报告")]:
             key="study_progress_button",
             help="✨ 点击查看学习进度报告。",
         ):
-            df = pd.DataFrame(get_exercises(phone_number))
-            if df.empty:
+            total_minutes = get_valid_exercise_minutes(phone_number)
+            if total_minutes == 0:
                 st.warning("当前期间内没有学习记录。", icon="⚠️")
             else:
                 # logger.info(st.session_state.dbi.cache["user_info"])
                 current_level = st.session_state.dbi.cache["user_info"]["current_level"]
                 target_level = st.session_state.dbi.cache["user_info"]["target_level"]
                 hours = calculate_required_hours(current_level, target_level)
-                exercise_time = get_valid_exercise_time(df, column_mapping)
                 # 统计时长，转换为小时，比较差异，画出进度条
-                total_time = exercise_time["时长"].sum() / 60.0
+                total_time = total_minutes / 60.0
                 progress = total_time / hours
                 cols = st.columns(2)
                 # 显示进度条
@@ -345,16 +317,7 @@ with tabs[get_item_index("学习报告")]:
         if st.button(
             "查阅[:eyes:]", key="score_trend_button", help="✨ 点击查看成绩趋势报告。"
         ):
-            df = pd.DataFrame(get_performances(phone_number, start_date, end_date))
-            df_previous_period = pd.DataFrame(
-                get_performances(
-                    phone_number, start_date, end_date, previous_period=True
-                )
-            )
-            if df.empty:
-                st.warning("当前期间内没有成绩记录。", icon="⚠️")
-            else:
-                display_average_scores(df, df_previous_period, user_tz)
+            display_average_scores(phone_number, start_date, end_date, user_tz)
 
     with study_report_tabs[study_report_items.index("🏆 排名")]:
         st.subheader("🏆 成绩排名", divider="rainbow")
@@ -362,38 +325,29 @@ with tabs[get_item_index("学习报告")]:
         if st.button(
             "查阅[:eyes:]", key="score_rank_button", help="✨ 点击查看成绩排位报告。"
         ):
-            utc_now = datetime.datetime.now(pytz.utc)
-            # 获取性能数据
-            df = get_performance_data(utc_now)
+            utc_today = datetime.datetime.now(pytz.utc).date()
+            # 预汇总的得分分布
+            cohort_date, cohorts = get_score_cohorts(utc_today)
+            # 用户在同一期间内各项目的平均得分
+            user_scores = get_user_item_scores(phone_number, cohort_date)
 
-            if df.empty:
+            if not cohorts or user_scores.empty:
                 st.warning("当前期间内没有成绩记录。", icon="⚠️")
             else:
-                st.markdown("#### 全国成绩排位")
-                # 根据手机号码找出用户的各项成绩
-                user_df = df[df["手机号码"] == phone_number]
-                # 生成所有的项目名称
-                items = df["项目"].unique()
-                for item in items:
-                    try:
-                        score = user_df[user_df["项目"] == item]["得分"].item()
-                        item_df = df[df["项目"] == item]
-                        # 对每一项绘制其全国排名
-                        plot_student_score_ranking(item_df, score, "得分", item)
-                    except ValueError:
-                        continue
-
-                st.markdown(f"#### {province}成绩排位")
-                for item in items:
-                    try:
-                        score = user_df[user_df["项目"] == item]["得分"].item()
-                        province_df = df[
-                            (df["项目"] == item) & (df["省份"] == province)
-                        ]
-                        # 对每一项绘制其全省排名
-                        plot_student_score_ranking(province_df, score, "得分", item)
-                    except ValueError:
+                st.markdown(f"#### 全国与{province}成绩排位")
+                for item, score in user_scores.items():
+                    # 合并各省的分布得到全国分布
+                    dists = {
+                        "全国": merge_distributions(
+                            dist for (name, _), dist in cohorts.items() if name == item
+                        )
+                    }
+                    if dists["全国"].count == 0:
                         continue
+                    if (item, province) in cohorts:
+                        dists[province] = cohorts[(item, province)]
+                    # 对每一项绘制其全国与全省排名
+                    plot_student_score_ranking(dists, score, item)
 
 
 # endregion
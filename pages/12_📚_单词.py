@@ -19,8 +19,8 @@ from menu import menu
 from mypylib.constants import CEFR_LEVEL_MAPS
 
 # from mypylib.db_model import LearningTime
-from mypylib.google_ai import generate_word_tests, load_vertex_model, pick_a_phrase
-from mypylib.personalized_task import calculate_sampling_probabilities
+from mypylib.google_ai import WordTestBatch, load_vertex_model, pick_a_phrase
+from mypylib.review_scheduler import ReviewScheduler
 from mypylib.st_helper import (  # end_and_save_learning_records,
     add_exercises_to_db,
     check_access,
@@ -112,42 +112,49 @@ def load_word_dict():
         return json.load(f)
 
 
-# 使用手机号码防止缓存冲突
-@st.cache_data(
-    show_spinner="单词概率抽样...", ttl=timedelta(days=1)
-)  # 缓存有效期为24小时
-def get_sampled_word(phone_number, words, num_words):
+def get_word_state_index():
+    phone_number = st.session_state.dbi.cache["user_info"]["phone_number"]
+    return st.session_state.dbi.get_word_state_index(phone_number)
+
+
+def get_today_learned_words():
+    """返回用户时区今天学习过的单词。"""
+    tz = pytz.timezone(user_tz)
+    today = tz.localize(datetime.combine(datetime.now(tz).date(), datetime.min.time()))
+    return get_word_state_index().learned_since(today)
+
+
+def get_review_scheduler(phone_number):
     """
-    从给定的单词列表中根据概率进行抽样，返回抽样结果。
+    返回当前用户的单词复习调度器。
+
+    首次调用时由已保存的测试统计和学习时长统计初始化，此后每次答题只更新对应单词。
 
     Args:
         phone_number (str): 手机号码。
-        words (list): 单词列表。
-        num_words (int): 抽样的单词数量。
 
     Returns:
-        list: 抽样结果，包含抽样的单词列表。
-
+        ReviewScheduler: 复习调度器。
     """
-    word_duration_stats = st.session_state.dbi.generate_word_duration_stats(
-        phone_number, "exercises"
-    )
-    word_pass_stats = st.session_state.dbi.generate_word_pass_stats(
-        phone_number, "performances"
-    )
-    duration_records = [
-        (word, duration) for word, duration in word_duration_stats.items()
-    ]
-    pass_records = [
-        (word, d["passed"], d["failed"]) for word, d in word_pass_stats.items()
-    ]
-    probabilities = calculate_sampling_probabilities(
-        words, duration_records, pass_records
-    )
-    # 根据概率进行抽样
-    words = list(probabilities.keys())
-    probs = list(probabilities.values())
-    return random.choices(words, weights=probs, k=num_words)
+    scheduler = st.session_state.get("review-scheduler")
+    if (
+        scheduler is None
+        or st.session_state.get("review-scheduler-user") != phone_number
+    ):
+        with st.spinner("加载单词复习记录..."):
+            index = st.session_state.dbi.get_word_state_index(phone_number)
+        scheduler = ReviewScheduler.from_stats(
+            index.pass_stats(), index.duration_stats()
+        )
+        st.session_state["review-scheduler"] = scheduler
+        st.session_state["review-scheduler-user"] = phone_number
+    return scheduler
+
+
+def record_word_results(word_results):
+    """将答题结果交给复习调度器，安排各单词的下次复习时间。"""
+    phone_number = st.session_state.dbi.cache["user_info"]["phone_number"]
+    get_review_scheduler(phone_number).record_results(word_results)
 
 
 def generate_page_words(
@@ -156,7 +163,7 @@ def generate_page_words(
     # 根据from_today_learned参数决定从哪里获取单词
     # 集合转换为列表
     if from_today_learned:
-        words = list(st.session_state["today-learned"])
+        words = get_today_learned_words()
     else:
         words = list(st.session_state.word_dict[word_lib_name])
 
@@ -171,10 +178,8 @@ def generate_page_words(
 
     phone_number = st.session_state.dbi.cache["user_info"]["phone_number"]
     n = min(num_words, len(words))
-    word_lib = get_sampled_word(phone_number, words, n * 10)
-    # logger.info(f"{from_today_learned=} {word_lib}")
-    # 随机选择单词
-    st.session_state[key] = random.sample(word_lib, n)
+    # 按复习调度器的权重不放回抽样
+    st.session_state[key] = get_review_scheduler(phone_number).sample(words, n)
     if not from_today_learned:
         name = word_lib_name.split("-", maxsplit=1)[1]
         st.toast(f"当前单词列表名称：{name} 单词数量: {len(st.session_state[key])}")
@@ -198,15 +203,34 @@ def get_word_info(word):
     return st.session_state.dbi.find_word(word)
 
 
-@st.cache_data(
-    ttl=timedelta(hours=24),
-    max_entries=10000,
-    show_spinner="AI正在生成单词理解测试题...",
-)
-def generate_word_tests_for(words, level):
+def start_word_tests(words, level):
+    """分块并发生成单词理解测试题，等待第一块完成后即可开始答题。"""
     model_name = "gemini-pro"
     model = load_vertex_model(model_name)
-    return generate_word_tests(model_name, model, words, level)
+    st.session_state["word-test-batch"] = WordTestBatch(model_name, model, words, level)
+    with st.spinner("AI正在生成单词理解测试题..."):
+        sync_word_tests(wait_for=1)
+
+
+def sync_word_tests(wait_for=0):
+    """
+    将已生成的测试题追加到 word-tests。
+
+    test-words 的前 len(word-tests) 个单词与测试题一一对应，其后为尚在生成的单词；
+    生成失败的单词会从 test-words 中移除。
+    """
+    batch = st.session_state.get("word-test-batch")
+    if batch is None:
+        return
+    n = len(st.session_state["word-tests"])
+    words = st.session_state["test-words"][:n]
+    for word, test in batch.collect(wait_for):
+        words.append(word)
+        st.session_state["word-tests"].append(test)
+    pending = [w for chunk in batch.chunks[batch.collected :] for w in chunk]
+    st.session_state["test-words"] = words + pending
+    if batch.done():
+        del st.session_state["word-test-batch"]
 
 
 def word_lib_format_func(word_lib_name):
@@ -245,26 +269,9 @@ def display_word_images(word, container):
 
 # region 闪卡状态
 
-# 获取用户时区的当前日期
-now = datetime.now(pytz.timezone(user_tz)).date()
-
 if "flashcard-words" not in st.session_state:
     st.session_state["flashcard-words"] = []
 
-if (
-    "today-learned" not in st.session_state
-    or "today-learned-date" not in st.session_state
-):
-    # 如果today-learned或其创建日期不存在，创建它们
-    st.session_state["today-learned"] = set()
-    st.session_state["today-learned-date"] = now
-else:
-    # 如果today-learned和其创建日期都存在，检查创建日期是否是今天
-    if st.session_state["today-learned-date"] != now:
-        # 如果不是今天，清空today-learned并更新创建日期
-        st.session_state["today-learned"] = set()
-        st.session_state["today-learned-date"] = now
-
 if "flashcard-word-info" not in st.session_state:
     st.session_state["flashcard-word-info"] = {}
 
@@ -367,9 +374,9 @@ def get_flashcard_project():
     words = st.session_state["flashcard-words"]
     project = "闪卡记忆"
     if idx == -1 or len(words) == 0:
-        return f"单词练习-{project}"
+        return f"单词练习-{project}", None
     else:
-        return f"单词练习-{project}-{words[idx]}"
+        return f"单词练习-{project}-{words[idx]}", words[idx]
 
 
 def play_word_audio(
@@ -435,9 +442,9 @@ def auto_play_flash_word(voice_style):
         st.session_state["flashcard-idx"] = idx
 
         word = st.session_state["flashcard-words"][idx]
-        st.session_state["today-learned"].add(word)
+        get_word_state_index().seen(word)
 
-        on_project_changed(get_flashcard_project())
+        on_project_changed(*get_flashcard_project())
 
         play_word_audio(voice_style, True)
         view_flash_word(elem, False, placeholder)
@@ -481,9 +488,9 @@ def get_puzzle_project():
     word = st.session_state["puzzle-words"][idx]
     project = "单词拼图"
     if idx == -1:
-        return f"单词练习-{project}"
+        return f"单词练习-{project}", None
     else:
-        return f"单词练习-{project}-{word}"
+        return f"单词练习-{project}-{word}", word
 
 
 def get_word_definition(word):
@@ -574,6 +581,7 @@ def check_puzzle(puzzle_container):
             "word_results": st.session_state.puzzle_test_score,
         }
         st.session_state.dbi.add_documents_to_user_history("performances", [d])
+        record_word_results(st.session_state.puzzle_test_score)
 
 
 def handle_puzzle():
@@ -762,6 +770,7 @@ def check_pic_answer(container):
     }
     # st.session_state.dbi.save_daily_quiz_results(d)
     st.session_state.dbi.add_documents_to_user_history("performances", [d])
+    record_word_results(word_results)
 
 
 # endregion
@@ -784,6 +793,7 @@ if "user-answer" not in st.session_state:
 
 
 def reset_test_words():
+    st.session_state.pop("word-test-batch", None)
     st.session_state["word-test-idx"] = -1
     st.session_state["word-tests"] = []
     st.session_state["user-answer"] = []
@@ -802,9 +812,9 @@ def get_word_test_project():
     word = st.session_state["test-words"][idx]
     project = "词意测试"
     if idx == -1:
-        return f"单词练习-{project}"
+        return f"单词练习-{project}", None
     else:
-        return f"单词练习-{project}-{word}"
+        return f"单词练习-{project}-{word}", word
 
 
 def check_word_test_answer(container, level):
@@ -861,6 +871,7 @@ def check_word_test_answer(container, level):
     }
     # st.session_state.dbi.save_daily_quiz_results(test_dict)
     st.session_state.dbi.add_documents_to_user_history("performances", [test_dict])
+    record_word_results(word_results)
     # container.divider()
 
 
@@ -1076,12 +1087,12 @@ if item_menu and item_menu.endswith("闪卡记忆"):
             st.warning("请先点击`🔄`按钮生成记忆闪卡。")
             st.stop()
 
-        on_project_changed(get_flashcard_project())
+        on_project_changed(*get_flashcard_project())
 
         # 添加当天学习的单词
         idx = st.session_state["flashcard-idx"]
         word = st.session_state["flashcard-words"][idx]
-        st.session_state["today-learned"].add(word)
+        get_word_state_index().seen(word)
 
         view_flash_word(container)
         if autoplay:
@@ -1092,12 +1103,12 @@ if item_menu and item_menu.endswith("闪卡记忆"):
             st.warning("请先点击`🔄`按钮生成记忆闪卡。")
             st.stop()
 
-        on_project_changed(get_flashcard_project())
+        on_project_changed(*get_flashcard_project())
 
         # 添加当天学习的单词
         idx = st.session_state["flashcard-idx"]
         word = st.session_state["flashcard-words"][idx]
-        st.session_state["today-learned"].add(word)
+        get_word_state_index().seen(word)
 
         view_flash_word(container)
 
@@ -1105,7 +1116,7 @@ if item_menu and item_menu.endswith("闪卡记忆"):
             play_word_audio(voice_style)
 
     if play_btn:
-        on_project_changed(get_flashcard_project())
+        on_project_changed(*get_flashcard_project())
         play_word_audio(voice_style)
 
     if add_btn:
@@ -1220,13 +1231,13 @@ elif item_menu and item_menu.endswith("拼图游戏"):
         st.rerun()
 
     if prev_btn:
-        on_project_changed(get_puzzle_project())
+        on_project_changed(*get_puzzle_project())
         if autoplay:
             play_word_audio(voice_style, words_key="puzzle-words", idx_key="puzzle-idx")
         prepare_puzzle()
 
     if next_btn:
-        on_project_changed(get_puzzle_project())
+        on_project_changed(*get_puzzle_project())
         if autoplay:
             play_word_audio(voice_style, words_key="puzzle-words", idx_key="puzzle-idx")
         prepare_puzzle()
@@ -1248,7 +1259,7 @@ elif item_menu and item_menu.endswith("拼图游戏"):
         st.toast(f"从个人词库中删除单词：{word}。")
 
     if st.session_state["puzzle-idx"] != -1:
-        on_project_changed(get_puzzle_project())
+        on_project_changed(*get_puzzle_project())
         handle_puzzle()
 
 # endregion
@@ -1342,7 +1353,7 @@ elif item_menu and item_menu.endswith("看图猜词"):
     elif st.session_state.pic_idx != -1:
         idx = st.session_state.pic_idx
         answer = st.session_state.pic_tests[idx]["answer"]
-        on_project_changed(f"单词练习-看图猜词-{answer}")
+        on_project_changed(f"单词练习-看图猜词-{answer}", answer)
         view_pic_question(container)
 
 
@@ -1393,6 +1404,19 @@ elif item_menu and item_menu.endswith("词意测试"):
     if "text-model" not in st.session_state:
         st.session_state["text-model"] = load_vertex_model("gemini-pro")
 
+    # 取出后台已生成的测试题；当前题目尚未生成时等待
+    sync_word_tests()
+    test_idx = st.session_state["word-test-idx"]
+    while "word-test-batch" in st.session_state and test_idx >= len(
+        st.session_state["word-tests"]
+    ):
+        with st.spinner("AI正在生成单词理解测试题..."):
+            sync_word_tests(wait_for=1)
+    # 生成失败的单词被移除后，题目序号不能越界
+    st.session_state["word-test-idx"] = min(
+        test_idx, len(st.session_state["word-tests"]) - 1
+    )
+
     cols = st.columns(2)
     update_and_display_progress(
         (
@@ -1459,10 +1483,10 @@ elif item_menu and item_menu.endswith("词意测试"):
     container = st.container()
 
     if prev_test_btn:
-        on_project_changed(get_word_test_project())
+        on_project_changed(*get_word_test_project())
 
     if next_test_btn:
-        on_project_changed(get_word_test_project())
+        on_project_changed(*get_word_test_project())
         # logger.info(st.session_state["test-words"])
 
     if refresh_btn:
@@ -1470,9 +1494,7 @@ elif item_menu and item_menu.endswith("词意测试"):
         reset_test_words()
         st.session_state["user-answer"] = [None] * test_num  # type: ignore
         generate_page_words(word_lib, test_num, "test-words", True, True)
-        st.session_state["word-tests"] = generate_word_tests_for(
-            st.session_state["test-words"], level
-        )
+        start_word_tests(st.session_state["test-words"], level)
         st.rerun()
 
     if (
@@ -1480,11 +1502,11 @@ elif item_menu and item_menu.endswith("词意测试"):
         and len(st.session_state["word-tests"]) >= 1
         and not sumbit_test_btn
     ):
-        on_project_changed(get_word_test_project())
+        on_project_changed(*get_word_test_project())
         view_test_word(container)
 
     if sumbit_test_btn:
-        on_project_changed(get_word_test_project())
+        on_project_changed(*get_word_test_project())
         container.empty()
         if count_non_none(st.session_state["user-answer"]) != count_non_none(
             st.session_state["word-tests"]
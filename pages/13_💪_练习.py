@@ -28,12 +28,16 @@ from mypylib.constants import (
 
 # from mypylib.db_model import LearningTime
 from mypylib.google_ai import (
+    DIALOGUE_POOL_SIZE,
+    DIALOGUE_TEMPLATE,
     generate_dialogue,
     generate_listening_test,
     generate_reading_comprehension_article,
     generate_reading_comprehension_test,
     generate_scenarios,
+    get_generation_cache,
     load_vertex_model,
+    make_generation_key,
     summarize_in_one_sentence,
 )
 from mypylib.st_helper import (
@@ -51,7 +55,9 @@ from mypylib.st_helper import (
     get_synthesis_speech,
     is_answer_correct,
     is_aside,
+    iter_synthesis_speech,
     on_project_changed,
+    pop_exercise_bundle,
     setup_logger,
     translate_text,
     update_sidebar_status,
@@ -159,10 +165,15 @@ def count_words_and_get_levels_for(text, excluded_words=[]):
     return count_words_and_get_levels(text, mini_dict, True, True, excluded_words)
 
 
-def display_text_word_count_summary(container, text, excluded_words=[]):
-    total_words, level_dict = count_words_and_get_levels_for(text, excluded_words)
+def display_text_word_count_summary(
+    container, text, excluded_words=[], word_counts=None
+):
+    # 内容池中的练习包已预先统计
+    total_words, level_dict = word_counts or count_words_and_get_levels_for(
+        text, excluded_words
+    )
     container.markdown(f"**字数统计：{len(text.split())}字**")
-    level_dict.update({"单词总量": total_words})
+    level_dict = {**level_dict, "单词总量": total_words}
     view_md_badges(container, level_dict, WORD_COUNT_BADGE_MAPS)
 
 
@@ -198,7 +209,9 @@ def display_dialogue_summary(container, dialogue, summarize):
     dialogue_text = " ".join(text)
     boy_name = dialogue["boy_name"]
     girl_name = dialogue["girl_name"]
-    display_text_word_count_summary(container, dialogue_text, [boy_name, girl_name])
+    display_text_word_count_summary(
+        container, dialogue_text, [boy_name, girl_name], dialogue.get("word_counts")
+    )
     container.markdown("**对话内容**")
     for d in text:
         container.markdown(d)
@@ -207,11 +220,12 @@ def display_dialogue_summary(container, dialogue, summarize):
 # endregion
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="正在生成听力测试题，请稍候...")
-def generate_listening_test_for(difficulty: str, conversation: str):
-    return generate_listening_test(
-        st.session_state["text_model"], difficulty, conversation, 5
-    )
+def generate_listening_test_for(difficulty: str, conversation: str, on_item=None):
+    # 结果由生成缓存保存；回调会更新页面元素，不能放在 st.cache_data 中重放
+    with st.spinner("正在生成听力测试题，请稍候..."):
+        return generate_listening_test(
+            st.session_state["text_model"], difficulty, conversation, 5, on_item
+        )
 
 
 @st.cache_data(ttl=timedelta(days=1), show_spinner="正在生成阅读理解测试题，请稍候...")
@@ -227,39 +241,52 @@ def generate_reading_test_for(difficulty: str, exercise_type, article: List[str]
     return test
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="正在加载场景类别，请稍候...")
+# 场景、对话和文章由持久化的生成缓存以池模式提供，每次刷新轮流返回不同的变体，
+# 因此不再使用 st.cache_data
 def generate_scenarios_for(category: str):
-    return generate_scenarios(st.session_state["text_model"], category)
+    with st.spinner("正在加载场景类别，请稍候..."):
+        return generate_scenarios(st.session_state["text_model"], category)
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="正在生成模拟场景，请稍候...")
 def generate_dialogue_for(selected_scenario, interesting_plot, difficulty):
-    boy_name = random.choice(NAMES["en-US"]["male"])
-    girl_name = random.choice(NAMES["en-US"]["female"])
     scenario = selected_scenario.split(".")[1]
-    dialogue = generate_dialogue(
-        st.session_state["text_model"],
-        boy_name,
-        girl_name,
-        scenario,
-        interesting_plot if interesting_plot else "",
-        difficulty,
+    plot = interesting_plot if interesting_plot else ""
+
+    def generate():
+        boy_name = random.choice(NAMES["en-US"]["male"])
+        girl_name = random.choice(NAMES["en-US"]["female"])
+        dialogue = generate_dialogue(
+            st.session_state["text_model"],
+            boy_name,
+            girl_name,
+            scenario,
+            plot,
+            difficulty,
+        )
+        return {"text": dialogue, "boy_name": boy_name, "girl_name": girl_name}
+
+    # 人物姓名随机选取，不计入缓存键，与对话内容一起保存
+    key = make_generation_key(
+        "gemini-pro",
+        DIALOGUE_TEMPLATE,
+        {"scenario": scenario, "plot": plot, "difficulty": difficulty},
     )
-    return {"text": dialogue, "boy_name": boy_name, "girl_name": girl_name}
+    with st.spinner("正在生成模拟场景，请稍候..."):
+        return get_generation_cache().get_or_generate(
+            key, generate, pool_size=DIALOGUE_POOL_SIZE
+        )
 
 
-@st.cache_data(
-    ttl=timedelta(days=1), show_spinner="正在生成阅读理解练习文章，请稍候..."
-)
 def generate_reading_comprehension_article_for(genre, contents, plot, difficulty):
     content = ",".join(contents)
-    return generate_reading_comprehension_article(
-        st.session_state["text_model"],
-        genre,
-        content,
-        plot,
-        difficulty,
-    )
+    with st.spinner("正在生成阅读理解练习文章，请稍候..."):
+        return generate_reading_comprehension_article(
+            st.session_state["text_model"],
+            genre,
+            content,
+            plot,
+            difficulty,
+        )
 
 
 @st.cache_data(ttl=timedelta(days=1), show_spinner="正在生成对话概要，请稍候...")
@@ -267,18 +294,74 @@ def summarize_in_one_sentence_for(dialogue: str):
     return summarize_in_one_sentence(st.session_state["text_model"], dialogue)
 
 
+def load_en_us_voices():
+    """返回美式英语的男声和女声列表。"""
+    with open(VOICES_FP, "r", encoding="utf-8") as f:
+        voices = json.load(f)["en-US"]
+    m_voices = [v for v in voices if v[1] == "Male"]
+    fm_voices = [v for v in voices if v[1] == "Female"]
+    return m_voices, fm_voices
+
+
+def build_listening_bundle(level, category):
+    """
+    生成一个完整的听说练习包，由内容池的后台线程以系统身份调用，不使用会话状态。
+
+    依次生成场景、对话、概要、听力测试题和译文，并使用默认语音预先合成对话，
+    音频写入共享的语音缓存。
+    """
+    model = load_vertex_model("gemini-pro")
+    scenario = random.choice(generate_scenarios(model, category))
+    boy_name = random.choice(NAMES["en-US"]["male"])
+    girl_name = random.choice(NAMES["en-US"]["female"])
+    text = generate_dialogue(
+        model, boy_name, girl_name, scenario.split(".")[1], "", level
+    )
+    m_voices, fm_voices = load_en_us_voices()
+    m_voice = m_voices[0]
+    fm_voice = fm_voices[0]
+    items = [
+        (
+            re.sub(r"^\w+:\s", "", sentence.replace("**", "")),
+            get_voice_style(
+                sentence, boy_name, girl_name, m_voice, fm_voice, "en-US-AnaNeural"
+            ),
+        )
+        for sentence in text
+    ]
+    for _ in iter_synthesis_speech(items):
+        pass
+    word_counts = count_words_and_get_levels(
+        " ".join(text), load_mini_dict(), True, True, [boy_name, girl_name]
+    )
+    return {
+        "scenario": scenario,
+        "dialogue": {
+            "text": text,
+            "boy_name": boy_name,
+            "girl_name": girl_name,
+            "translations": translate_text("听说练习", text, "zh-CN", True),
+            "word_counts": word_counts,
+        },
+        "summarize": summarize_in_one_sentence(model, text),
+        "test": generate_listening_test(model, level, text, 5),
+    }
+
+
 def get_and_combine_audio_data():
     dialogue = st.session_state.conversation_scene["text"]
-    audio_data_list = []
+    items = []
     for i, sentence in enumerate(dialogue):
         voice_style = m_voice_style if i % 2 == 0 else fm_voice_style
         style = "en-US-AnaNeural" if is_aside(sentence) else voice_style[0]
         sentence_without_speaker_name = re.sub(
             r"^\w+:\s", "", sentence.replace("**", "")
         )
-        with st.spinner(f"使用 Azure 将文本合成语音..."):
-            result = get_synthesis_speech(sentence_without_speaker_name, style)
-        audio_data_list.append(result["audio_data"])
+        items.append((sentence_without_speaker_name, style))
+    with st.spinner(f"使用 Azure 将文本合成语音..."):
+        audio_data_list = [
+            result["audio_data"] for result in iter_synthesis_speech(items)
+        ]
     return combine_audio_data(audio_data_list)
 
 
@@ -286,17 +369,11 @@ def autoplay_audio_and_display_article(container):
     container.empty()
     content_cols = container.columns(2)
     article = st.session_state["reading-article"]
-    audio_data_list = []
-    durations = []
     total = 0
-    for i, paragraph in enumerate(article):
-        voice_style = m_voice_style if i % 2 == 0 else fm_voice_style
-        with st.spinner(f"微软语音合成 第{i+1}段文本..."):
-            result = get_synthesis_speech(paragraph, voice_style[0])
-        audio_data_list.append(result["audio_data"])
-        duration = result["audio_duration"]
-        total += duration.total_seconds()
-        durations.append(duration)
+    items = [
+        (paragraph, (m_voice_style if i % 2 == 0 else fm_voice_style)[0])
+        for i, paragraph in enumerate(article)
+    ]
 
     # 创建一个空的插槽
     slot_1 = content_cols[0].empty()
@@ -305,11 +382,12 @@ def autoplay_audio_and_display_article(container):
     if st.session_state.get("ra-display-state", "英文") != "英文":
         cns = translate_text("阅读理解练习", article, "zh-CN", True)
 
-    # 播放音频并同步显示文本
-    for i, duration in enumerate(durations):
-        # 计算这一段音频的播放长度与总长度的占比
+    # 并发合成，每段合成完成即播放并同步显示文本
+    for i, result in enumerate(iter_synthesis_speech(items)):
+        duration = result["audio_duration"]
+        total += duration.total_seconds()
         # 播放音频
-        audio_html = audio_autoplay_elem(audio_data_list[i], fmt="wav")
+        audio_html = audio_autoplay_elem(result["audio_data"], fmt="wav")
         components.html(audio_html)
 
         # 检查 session state 的值
@@ -368,7 +446,10 @@ def display_dialogue(dialogue_placeholder):
     idx = st.session_state["listening-idx"]
     if idx == -1:
         return
-    cns = translate_text("听说练习", dialogue, "zh-CN", True)
+    # 内容池中的练习包已附带译文
+    cns = st.session_state.conversation_scene.get("translations") or translate_text(
+        "听说练习", dialogue, "zh-CN", True
+    )
     sentence = dialogue[idx]
 
     content_cols = dialogue_placeholder.columns(2)
@@ -610,10 +691,7 @@ def check_reading_test_answer(container, difficulty, exercise_type, genre):
 # region 会话状态
 
 if "m_voices" not in st.session_state and "fm_voices" not in st.session_state:
-    with open(VOICES_FP, "r", encoding="utf-8") as f:
-        voices = json.load(f)["en-US"]
-    st.session_state["m_voices"] = [v for v in voices if v[1] == "Male"]
-    st.session_state["fm_voices"] = [v for v in voices if v[1] == "Female"]
+    st.session_state["m_voices"], st.session_state["fm_voices"] = load_en_us_voices()
 
 if "conversation_scene" not in st.session_state:
     st.session_state["conversation_scene"] = {}
@@ -818,6 +896,12 @@ if item_menu is not None and item_menu.endswith("听说练习"):
                 key="generate-dialogue",
                 help="✨ 点击按钮，生成对话场景。",
             )
+            pool_btn = session_cols[1].button(
+                "随机[:game_die:]",
+                key="pop-dialogue-bundle",
+                help="✨ 点击按钮，从预先生成的练习中随机选取当前等级和类别的对话场景、听力测试题，无需等待。",
+                disabled=scenario_category is None,
+            )
 
             if gen_btn:
                 if selected_scenario is None:
@@ -838,6 +922,28 @@ if item_menu is not None and item_menu.endswith("听说练习"):
                 st.session_state.conversation_scene = dialogue
                 st.session_state.summarize_in_one = summarize
 
+            elif pool_btn:
+                bundle = pop_exercise_bundle(
+                    difficulty, scenario_category, build_listening_bundle
+                )
+                if bundle is None:
+                    # 内容池为空时当场生成，后台线程同时开始补充
+                    with st.spinner("正在生成练习内容，请稍候..."):
+                        bundle = build_listening_bundle(difficulty, scenario_category)
+
+                container.empty()
+                st.session_state["listening-learning-times"] = 0
+                st.session_state["listening-idx"] = -1
+                st.session_state.conversation_scene = bundle["dialogue"]
+                st.session_state.summarize_in_one = bundle["summarize"]
+                st.session_state["listening-test"] = bundle["test"]
+                st.session_state["listening-test-idx"] = -1
+                st.session_state["listening-test-answer"] = [None] * len(bundle["test"])
+                st.session_state["listening-start-time"] = time.time()
+                display_dialogue_summary(
+                    container, bundle["dialogue"], bundle["summarize"]
+                )
+
             elif len(st.session_state.conversation_scene.get("text", [])) > 0:
                 display_dialogue_summary(
                     container,
@@ -1031,9 +1137,7 @@ if item_menu is not None and item_menu.endswith("听说练习"):
             text = dialogue["text"]
             boy_name = dialogue["boy_name"]
             girl_name = dialogue["girl_name"]
-            audio_data_list = []
-            duration_list = []
-            total = 0
+            items = []
             for i, sentence in enumerate(text):
                 # 如果是旁白，使用小女孩的声音
                 # voice_style = m_voice_style if i % 2 == 0 else fm_voice_style
@@ -1049,20 +1153,18 @@ if item_menu is not None and item_menu.endswith("听说练习"):
                 sentence_without_speaker_name = re.sub(
                     r"^\w+:\s", "", sentence.replace("**", "")
                 )
-                with st.spinner(f"微软语音合成 第 {i+1:2d} 轮对话..."):
-                    result = get_synthesis_speech(sentence_without_speaker_name, style)
-                audio_data_list.append(result["audio_data"])
-                duration_list.append(result["audio_duration"])
-                total += result["audio_duration"].total_seconds()
+                items.append((sentence_without_speaker_name, style))
 
             current_idx = st.session_state["listening-idx"]
 
-            for i, duration in enumerate(duration_list):
+            # 并发合成全部对话，每轮合成完成即播放，无需等待后续语句
+            for i, result in enumerate(iter_synthesis_speech(items)):
                 on_project_changed(f"听说练习-第{i:2d}轮")
                 st.session_state["listening-idx"] = i
                 display_dialogue(dialogue_placeholder)
-                play_and_record_dialogue(m_voice_style, fm_voice_style)
-                time.sleep(duration.total_seconds() + 0.5)
+                audio_html = audio_autoplay_elem(result["audio_data"], fmt="wav")
+                components.html(audio_html)
+                time.sleep(result["audio_duration"].total_seconds() + 0.5)
             # 恢复指针
             st.session_state["listening-idx"] = current_idx
             st.session_state["listening-learning-times"] = len(
@@ -1162,8 +1264,15 @@ if item_menu is not None and item_menu.endswith("听说练习"):
 
         if refresh_test_btn:
             on_project_changed(f"听说练习-测试题目")
+            progress = container.empty()
+
+            def on_test_item(path, value):
+                # 每完整生成一道题即更新进度
+                if len(path) == 1:
+                    progress.caption(f"已生成第 {path[0] + 1} 道题...")
+
             st.session_state["listening-test"] = generate_listening_test_for(
-                difficulty, st.session_state.conversation_scene["text"]
+                difficulty, st.session_state.conversation_scene["text"], on_test_item
             )
             st.session_state["listening-test-idx"] = -1
             st.session_state["listening-test-answer"] = [None] * len(
@@ -1,3 +1,4 @@
+from concurrent.futures import as_completed
 from datetime import timedelta
 import difflib
 import logging
@@ -10,8 +11,11 @@ from vertexai.preview.generative_models import Content, GenerationConfig, Part
 
 from menu import menu
 from mypylib.google_ai import (
+    create_session_executor,
     display_generated_content_and_update_token,
+    get_generation_cache,
     load_vertex_model,
+    make_generation_key,
     parse_generated_content_and_update_token,
     parse_json_string,
     to_contents_info,
@@ -102,6 +106,18 @@ def initialize_writing_chat():
     st.session_state["writing-chat"] = model.start_chat(history=history)
 
 
+def detect_language_error(article):
+    """检查 article 是否为英文文本 [字符数量少容易被错判]，不是英文时返回错误结果。"""
+    detected_language = detect(article)
+    if detected_language in ["zh-cn", "ja"]:
+        return {
+            "corrected": f"The anticipated language is English, however, {detected_language} was detected",
+            "explanations": [],
+            "error_type": "LanguageError",
+        }
+    return None
+
+
 GRAMMAR_CHECK_TEMPLATE = """\
 As an English grammar expert, your primary task is to inspect and correct any grammatical errors in the following "Article".
 
@@ -142,17 +158,8 @@ Article:
 GRAMMAR_CHECK_CONFIG = {"max_output_tokens": 2048, "temperature": 0.0}
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="正在检查语法...")
-def check_grammar(article):
-    # 检查 article 是否为英文文本 [字符数量少容易被错判]
-    detected_language = detect(article)
-    if detected_language in ["zh-cn", "ja"]:
-        return {
-            "corrected": f"The anticipated language is English, however, {detected_language} was detected",
-            "explanations": [],
-            "error_type": "LanguageError",
-        }
-
+def _check_grammar(article, on_item=None):
+    """检查语法。提供 on_item 时流式生成，修改后的文本和每条解释完整后逐项回调。"""
     prompt = GRAMMAR_CHECK_TEMPLATE.format(article=article)
     contents = [prompt]
     contents_info = [
@@ -160,14 +167,25 @@ def check_grammar(article):
         for content in contents
     ]
     model = st.session_state["text-model"]
-    result = parse_generated_content_and_update_token(
-        "写作练习-语法检查",
-        "gemini-pro",
-        model.generate_content,
-        contents_info,
-        GenerationConfig(**GRAMMAR_CHECK_CONFIG),
-        stream=False,
-        parser=partial(parse_json_string, prefix="```json", suffix="```"),
+    # 命中生成缓存时不回调
+    result = get_generation_cache().get_or_generate(
+        make_generation_key(
+            "gemini-pro",
+            GRAMMAR_CHECK_TEMPLATE,
+            {"article": article},
+            GRAMMAR_CHECK_CONFIG,
+        ),
+        partial(
+            parse_generated_content_and_update_token,
+            "写作练习-语法检查",
+            "gemini-pro",
+            model.generate_content,
+            contents_info,
+            GenerationConfig(**GRAMMAR_CHECK_CONFIG),
+            stream=on_item is not None,
+            parser=partial(parse_json_string, prefix="```json", suffix="```"),
+            on_item=on_item,
+        ),
     )
     result["error_type"] = "GrammarError"
     result["character_count"] = (
@@ -176,6 +194,34 @@ def check_grammar(article):
     return result
 
 
+@st.cache_data(ttl=timedelta(days=1), show_spinner="正在检查语法...")
+def check_grammar(article):
+    return detect_language_error(article) or _check_grammar(article)
+
+
+def check_grammar_streaming(article, container):
+    """
+    检查语法，修改后的文本生成完毕即在 container 中预览，解释随后补齐。
+
+    回调会更新 st.cache_data 之外创建的元素，命中缓存时无法重放，因此直接调用
+    _check_grammar，结果由生成缓存保存。
+    """
+    placeholder = container.empty()
+    explanations = []
+
+    def on_item(path, value):
+        if path == ("corrected",):
+            placeholder.markdown(value, unsafe_allow_html=True)
+        elif len(path) == 2 and path[0] == "explanations":
+            explanations.append(value)
+            placeholder.caption(f"已发现 {len(explanations)} 处错误，正在生成解释...")
+
+    with st.spinner("正在检查语法..."):
+        result = detect_language_error(article) or _check_grammar(article, on_item)
+    placeholder.empty()
+    return result
+
+
 WORD_SPELL_CHECK_TEMPLATE = """\
 As an English writing instructor, your primary task is to inspect and correct any spelling errors in the following "Article".
 
@@ -213,17 +259,7 @@ Article:
 WORD_SPELL_CHECK_CONFIG = {"max_output_tokens": 2048, "temperature": 0.0}
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="正在检查单词拼写...")
-def check_spelling(article):
-    # 检查 article 是否为英文文本 [字符数量少容易被错判]
-    detected_language = detect(article)
-    if detected_language in ["zh-cn", "ja"]:
-        return {
-            "corrected": f"The anticipated language is English, however, {detected_language} was detected",
-            "explanations": [],
-            "error_type": "LanguageError",
-        }
-
+def _check_spelling(article):
     prompt = WORD_SPELL_CHECK_TEMPLATE.format(article=article)
     contents = [prompt]
     contents_info = [
@@ -247,6 +283,11 @@ def check_spelling(article):
     return result
 
 
+@st.cache_data(ttl=timedelta(days=1), show_spinner="正在检查单词拼写...")
+def check_spelling(article):
+    return detect_language_error(article) or _check_spelling(article)
+
+
 ARTICLE_POLISH_TEMPLATE = """\
 As an English writing master, your primary task is to utilize your extensive experience to polish the following "Article", ensuring the accuracy and idiomaticity of vocabulary and sentence structure.
 
@@ -265,17 +306,7 @@ Article:
 ARTICLE_POLISH_CONFIG = {"max_output_tokens": 2048, "temperature": 0.75}
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="正在润色文章...")
-def polish_article(article):
-    # 检查 article 是否为英文文本 [字符数量少容易被错判]
-    detected_language = detect(article)
-    if detected_language in ["zh-cn", "ja"]:
-        return {
-            "corrected": f"The anticipated language is English, however, {detected_language} was detected",
-            "explanations": [],
-            "error_type": "LanguageError",
-        }
-
+def _polish_article(article):
     prompt = ARTICLE_POLISH_TEMPLATE.format(article=article)
     contents = [prompt]
     contents_info = [
@@ -299,6 +330,11 @@ def polish_article(article):
     return result
 
 
+@st.cache_data(ttl=timedelta(days=1), show_spinner="正在润色文章...")
+def polish_article(article):
+    return detect_language_error(article) or _polish_article(article)
+
+
 LOGIC_STRUCTURE_TEMPLATE = """\
 As an English writing assistant, your main task is to ensure that the "article" has a clear structure, a logical sequence, and uses appropriate conjunctions or transition words to represent the logical relationship between different parts.
 Please proceed as follows:
@@ -313,17 +349,7 @@ Article:
 LOGIC_STRUCTURE_CONFIG = {"max_output_tokens": 2048, "temperature": 0.45}
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="正在检查、修正文章逻辑结构...")
-def logic_article(article):
-    # 检查 article 是否为英文文本 [字符数量少容易被错判]
-    detected_language = detect(article)
-    if detected_language in ["zh-cn", "ja"]:
-        return {
-            "corrected": f"The anticipated language is English, however, {detected_language} was detected",
-            "explanations": [],
-            "error_type": "LanguageError",
-        }
-
+def _logic_article(article):
     prompt = LOGIC_STRUCTURE_TEMPLATE.format(article=article)
     contents = [prompt]
     contents_info = [
@@ -352,6 +378,116 @@ def logic_article(article):
     return result
 
 
+@st.cache_data(ttl=timedelta(days=1), show_spinner="正在检查、修正文章逻辑结构...")
+def logic_article(article):
+    return detect_language_error(article) or _logic_article(article)
+
+
+def display_polish_result(container, result):
+    if not result:
+        container.write("文字表述很完美，我无需进行任何润色。👏👏👏")
+    else:
+        container.markdown("建议文稿：")
+        container.markdown(result["corrected"], unsafe_allow_html=True)
+        container.divider()
+        container.write("解释：")
+        container.write(result["explanation"])
+
+
+def display_logic_result(container, result):
+    if not result:
+        container.write("很好，文章的结构和逻辑已经很完善了。👏👏👏")
+    else:
+        container.markdown("建议文稿：")
+        if result["corrected"]:
+            container.markdown(result["corrected"], unsafe_allow_html=True)
+            container.divider()
+        container.write("解释：")
+        container.write(result["explanation"])
+
+
+# 全面检查的各项：(键, 标题, 检查函数, 显示函数)
+FULL_REVIEW_SECTIONS = [
+    (
+        "spelling",
+        "单词",
+        _check_spelling,
+        lambda c, r: c.markdown(
+            display_word_spell_errors(r) + TIPPY_JS, unsafe_allow_html=True
+        ),
+    ),
+    (
+        "grammar",
+        "语法",
+        _check_grammar,
+        lambda c, r: c.markdown(
+            display_grammar_errors(r) + TIPPY_JS, unsafe_allow_html=True
+        ),
+    ),
+    ("logic", "逻辑", _logic_article, display_logic_result),
+    ("polish", "润色", _polish_article, display_polish_result),
+]
+
+
+def full_review(article, container):
+    """
+    全面检查：只检测一次语言，然后并发进行四项检查，每项完成即显示。
+
+    Returns:
+        dict: 以检查项为键的合并报告；不是英文时只包含 language 一项。
+    """
+    language_error = detect_language_error(article)
+    if language_error:
+        container.markdown(
+            display_grammar_errors(language_error) + TIPPY_JS, unsafe_allow_html=True
+        )
+        return {"language": language_error}
+
+    placeholders = {}
+    for key, title, _, _ in FULL_REVIEW_SECTIONS:
+        container.markdown(f"**{title}**")
+        placeholders[key] = container.empty()
+        placeholders[key].caption("检查中...")
+        container.divider()
+
+    report = {}
+    with create_session_executor(
+        len(FULL_REVIEW_SECTIONS), "writing-review"
+    ) as executor:
+        futures = {
+            executor.submit(check, article): (key, display)
+            for key, _, check, display in FULL_REVIEW_SECTIONS
+        }
+        # 各项检查相互独立，先完成的先显示
+        for future in as_completed(futures):
+            key, display = futures[future]
+            try:
+                report[key] = future.result()
+            except Exception as e:
+                logger.error(f"写作检查失败：{key} {e}")
+                placeholders[key].error(f"检查失败：{e}")
+                continue
+            display(placeholders[key].container(), report[key])
+    return report
+
+
+def display_full_review(container, report):
+    """按检查项顺序显示 full_review 的报告，用于页面重新运行后恢复显示。"""
+    if "language" in report:
+        container.markdown(
+            display_grammar_errors(report["language"]) + TIPPY_JS,
+            unsafe_allow_html=True,
+        )
+        return
+    for key, title, _, display in FULL_REVIEW_SECTIONS:
+        container.markdown(f"**{title}**")
+        if key in report:
+            display(container.container(), report[key])
+        else:
+            container.caption("检查失败")
+        container.divider()
+
+
 # endregion
 
 # region 主体
@@ -456,6 +592,16 @@ rvn_btn = w_btn_cols[6].button(
     "修正[:wrench:]", key="revision", help="✨ 点击按钮，接受AI修正建议。"
 )
 
+all_btn = w_btn_cols[7].button(
+    "全面[:clipboard:]",
+    key="full-review",
+    help="✨ 点击按钮，同时检查单词、语法、逻辑并润色文章。",
+)
+
+# 全面检查的报告保留到文章修改或进行其他检查为止
+if rfh_btn or wrd_btn or grm_btn or lgc_btn or plh_btn:
+    st.session_state.pop("writing-review", None)
+
 if rfh_btn:
     on_project_changed("写作练习-刷新")
     suggestions.empty()
@@ -469,7 +615,7 @@ if clr_btn:
 if grm_btn:
     on_project_changed("写作练习-语法")
     suggestions.empty()
-    result = check_grammar(st.session_state["writing-text"])
+    result = check_grammar_streaming(st.session_state["writing-text"], suggestions)
     html = display_grammar_errors(result)
     suggestions.markdown(html + TIPPY_JS, unsafe_allow_html=True)
     update_sidebar_status(sidebar_status)
@@ -485,29 +631,26 @@ if plh_btn:
     on_project_changed("写作练习-润色")
     suggestions.empty()
     result = polish_article(st.session_state["writing-text"])
-
-    if not result:
-        suggestions.write("文字表述很完美，我无需进行任何润色。👏👏👏")
-    else:
-        suggestions.markdown("建议文稿：")
-        suggestions.markdown(result["corrected"], unsafe_allow_html=True)
-        suggestions.divider()
-        suggestions.write("解释：")
-        suggestions.write(result["explanation"])
+    display_polish_result(suggestions, result)
 
 if lgc_btn:
     on_project_changed("写作练习-逻辑")
     suggestions.empty()
     result = logic_article(st.session_state["writing-text"])
-    if not result:
-        suggestions.write("很好，文章的结构和逻辑已经很完善了。👏👏👏")
-    else:
-        suggestions.markdown("建议文稿：")
-        if result["corrected"]:
-            suggestions.markdown(result["corrected"], unsafe_allow_html=True)
-            suggestions.divider()
-        suggestions.write("解释：")
-        suggestions.write(result["explanation"])
+    display_logic_result(suggestions, result)
+
+if all_btn:
+    on_project_changed("写作练习-全面检查")
+    suggestions.empty()
+    st.session_state["writing-review"] = {
+        "article": st.session_state["writing-text"],
+        "report": full_review(st.session_state["writing-text"], suggestions),
+    }
+    update_sidebar_status(sidebar_status)
+elif review := st.session_state.get("writing-review"):
+    # 页面因其他操作重新运行时，文章未修改则恢复显示全面检查的结果
+    if review["article"] == st.session_state["writing-text"]:
+        display_full_review(suggestions, review["report"])
 
 if rvn_btn:
     on_project_changed("写作练习-修正")
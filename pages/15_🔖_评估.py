@@ -748,11 +748,24 @@ def english_writing_exam_assessment_for(student_level, exam_topic):
     )
 
 
-@st.cache_data(ttl=timedelta(days=1), show_spinner="AI 正在评估，请稍候...")
-def cefr_english_writing_ability_assessment_for(requirements, composition):
-    return cefr_english_writing_ability_assessment(
-        st.session_state["text_model"], requirements, composition
-    )
+def cefr_english_writing_ability_assessment_for(requirements, composition, container):
+    """流式评估写作能力，每完成一项评分即在 container 中显示。结果由生成缓存保存。"""
+    placeholder = container.empty()
+    records = []
+
+    def on_item(path, value):
+        if len(path) == 2 and path[0] == "scoringRecords":
+            records.append(value)
+            display_writing_assessment_results(
+                placeholder, {"scoringRecords": records, "review": "..."}
+            )
+
+    with st.spinner("AI 正在评估，请稍候..."):
+        assessment = cefr_english_writing_ability_assessment(
+            st.session_state["text_model"], requirements, composition, on_item
+        )
+    placeholder.empty()
+    return assessment
 
 
 def calculate_writing_total_score(data):
@@ -870,7 +883,7 @@ if item_menu and item_menu.endswith("写作评估"):
         start = datetime.now()
         requirements = st.session_state["writing-evaluation-exam"]
         assessment = cefr_english_writing_ability_assessment_for(
-            requirements, composition
+            requirements, composition, container_2
         )
         try:
             total_score = calculate_writing_total_score(assessment)
@@ -287,8 +287,16 @@ def get_phone_numbers():
 
 @st.cache_data(ttl=datetime.timedelta(hours=1))  # 缓存有效期为1小时
 def get_usage_records(phone_number, start_date, end_date):
-    data = st.session_state.dbi.get_usage_records(phone_number, start_date, end_date)
-    df = pd.DataFrame(data)
+    df = st.session_state.dbi.get_usage_records(phone_number, start_date, end_date)
+    if not df.empty:
+        df["cost"] = df["cost"].round(2)
+    return df
+
+
+@st.cache_data(ttl=datetime.timedelta(hours=1))  # 缓存有效期为1小时
+def get_usage_rollups(start_date, end_date):
+    # 所有用户的费用直接读取每日汇总，无需扫描全部使用记录
+    df = st.session_state.dbi.get_usage_rollups(start_date, end_date)
     if not df.empty:
         df["cost"] = df["cost"].round(2)
     return df
@@ -1007,7 +1015,10 @@ elif item_menu == "统计分析":
 
         st.markdown("##### 运行费用")
         if st.button("统计"):
-            df = get_usage_records(phone_number, start_date, end_date)
+            if phone_number == "ALL":
+                df = get_usage_rollups(start_date, end_date)
+            else:
+                df = get_usage_records(phone_number, start_date, end_date)
             if df.empty:
                 st.warning("没有记录")
                 st.stop()
@@ -0,0 +1,36 @@
+# 汇总截至指定日期（UTC）最近 7 天所有用户的平均成绩，按 (项目, 省份) 写入 score_cohorts 集合
+# 用法：python aggregate_score_cohorts.py [日期 YYYY-MM-DD ...]
+# 不指定日期时汇总昨天和今天；汇总为覆盖写入，可每晚执行并在白天定时重算当天
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.append("..")
+
+from google.cloud import firestore
+from google.oauth2.service_account import Credentials
+
+from mypylib.db_interface import DbInterface
+from mypylib.google_cloud_configuration import (
+    PROJECT_ID,
+    get_google_service_account_info,
+)
+from mypylib.utils import get_secrets
+
+if len(sys.argv) > 1:
+    dates = [date.fromisoformat(arg) for arg in sys.argv[1:]]
+else:
+    today = datetime.now(timezone.utc).date()
+    dates = [today - timedelta(days=1), today]
+
+secrets = get_secrets()
+credentials = Credentials.from_service_account_info(
+    get_google_service_account_info(secrets)
+)
+db = firestore.Client(credentials=credentials, project=PROJECT_ID)
+dbi = DbInterface(db)
+# 脚本不需要定时保存缓存
+dbi.timer.cancel()
+
+for d in dates:
+    n = dbi.aggregate_score_cohorts(d)
+    print(f"score_cohorts: {d} 写入 {n} 个分布")
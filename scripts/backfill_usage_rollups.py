@@ -0,0 +1,32 @@
+# 根据已有的使用记录重建 usage_rollups 集合中的每日费用汇总
+# 用法：python backfill_usage_rollups.py [开始日期 YYYY-MM-DD] [结束日期 YYYY-MM-DD]
+# 汇总为覆盖写入，建议在 migrate_usages.py 之后、业务低峰期运行
+import sys
+from datetime import date
+
+sys.path.append("..")
+
+from google.cloud import firestore
+from google.oauth2.service_account import Credentials
+
+from mypylib.db_interface import DbInterface
+from mypylib.google_cloud_configuration import (
+    PROJECT_ID,
+    get_google_service_account_info,
+)
+from mypylib.utils import get_secrets
+
+start_date = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+end_date = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+
+secrets = get_secrets()
+credentials = Credentials.from_service_account_info(
+    get_google_service_account_info(secrets)
+)
+db = firestore.Client(credentials=credentials, project=PROJECT_ID)
+dbi = DbInterface(db)
+# 脚本不需要定时保存缓存
+dbi.timer.cancel()
+
+n = dbi.backfill_usage_rollups(start_date, end_date)
+print(f"usage_rollups: 写入 {n} 天的汇总")
@@ -0,0 +1,26 @@
+# 将简版词典 resource/dictionary/mini_dict.json 编译为 mmap 词典文件 mini_dict.lex
+# 用法：python build_lexicon.py [JSON 文件] [输出文件]
+# 部署前运行一次，应用启动时直接打开编译结果，无需解析 JSON。
+import json
+import sys
+import time
+
+sys.path.append("..")
+
+from mypylib.lexicon import MINI_DICT_FP, MINI_DICT_LEXICON_FP, Lexicon, build_lexicon
+
+json_fp = sys.argv[1] if len(sys.argv) > 1 else MINI_DICT_FP
+lexicon_fp = sys.argv[2] if len(sys.argv) > 2 else MINI_DICT_LEXICON_FP
+
+start = time.time()
+with open(json_fp, "r", encoding="utf-8") as f:
+    entries = json.load(f)
+build_lexicon(entries, lexicon_fp)
+
+# 逐条核对
+lexicon = Lexicon(lexicon_fp)
+assert len(lexicon) == len(entries)
+for word, doc in entries.items():
+    assert lexicon[word] == doc, word
+    assert lexicon.level(word) == doc.get("level"), word
+print(f"{len(entries)} 个单词，用时 {time.time() - start:.1f} 秒：{lexicon_fp}")
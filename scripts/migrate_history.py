@@ -0,0 +1,38 @@
+# 将 exercises、performances 文档中的 history 数组迁移为分桶子集合
+# 用法：python migrate_history.py [day|month] [--remove-history]
+# 迁移完成后，在 .streamlit/secrets.toml 中设置 HISTORY_BUCKET = "day"（或 "month"）
+# 已迁移的文档会被跳过，中断后可以直接重新运行
+import sys
+
+sys.path.append("..")
+
+from google.cloud import firestore
+from google.oauth2.service_account import Credentials
+
+from mypylib.db_interface import DbInterface
+from mypylib.google_cloud_configuration import (
+    PROJECT_ID,
+    get_google_service_account_info,
+)
+from mypylib.utils import get_secrets
+
+bucket = (
+    sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "--remove-history" else "day"
+)
+remove_history = "--remove-history" in sys.argv
+
+secrets = get_secrets()
+credentials = Credentials.from_service_account_info(
+    get_google_service_account_info(secrets)
+)
+db = firestore.Client(credentials=credentials, project=PROJECT_ID)
+dbi = DbInterface(db)
+# 脚本不需要定时保存缓存
+dbi.timer.cancel()
+
+for collection_name in ["exercises", "performances"]:
+    for doc in db.collection(collection_name).list_documents():
+        n = dbi.migrate_history_to_buckets(
+            collection_name, doc.id, bucket, remove_history
+        )
+        print(f"{collection_name}/{doc.id}: 迁移 {n} 条记录")
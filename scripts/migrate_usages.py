@@ -0,0 +1,28 @@
+# 将 usages 文档中的 usages 数组迁移为 usage_events 子集合中的事件文档
+# 用法：python migrate_usages.py
+import sys
+
+sys.path.append("..")
+
+from google.cloud import firestore
+from google.oauth2.service_account import Credentials
+
+from mypylib.db_interface import DbInterface
+from mypylib.google_cloud_configuration import (
+    PROJECT_ID,
+    get_google_service_account_info,
+)
+from mypylib.utils import get_secrets
+
+secrets = get_secrets()
+credentials = Credentials.from_service_account_info(
+    get_google_service_account_info(secrets)
+)
+db = firestore.Client(credentials=credentials, project=PROJECT_ID)
+dbi = DbInterface(db)
+# 脚本不需要定时保存缓存
+dbi.timer.cancel()
+
+for doc in db.collection("usages").list_documents():
+    n = dbi.migrate_usages_to_events(doc.id)
+    print(f"usages/{doc.id}: 迁移 {n} 条记录")
@@ -0,0 +1,102 @@
+# 为词库中的全部单词预先合成语音，写入 resource/word_voices/<voice>/e<md5>.wav
+# 用法：python synthesize_word_voices.py [语音名称 ...]
+# 默认使用单词页面的美式、英式语音。已存在的文件会被跳过，中断后重新运行即可继续。
+# 语音文件约 1 GB，不纳入版本库，每次部署新主机时运行本脚本。
+# 如果 secrets 中设置了 AUDIO_CACHE_CONTAINER，Blob 中已有的语音直接下载，
+# 新合成的语音同时上传，供其他主机使用；单词页面之后只读取本地文件。
+import json
+import sys
+import time
+
+sys.path.append("..")
+
+from azure.cognitiveservices.speech import (
+    CancellationReason,
+    ResultReason,
+    SpeechSynthesisCancellationDetails,
+)
+from azure.storage.blob import BlobServiceClient
+
+from mypylib.audio_cache import (
+    PREBUILT_AUDIO_DIR,
+    AudioCache,
+    load_word_list_items,
+)
+from mypylib.azure_speech import iter_concurrent_synthesis, synthesize_speech
+from mypylib.constants import VOICES_FP
+from mypylib.utils import get_secrets
+
+# 并发数，S0 定价层的默认并发上限为 200，这里保守设置
+MAX_WORKERS = 8
+# 遇到限流时的最大重试次数及初始等待秒数
+MAX_RETRIES = 5
+RETRY_DELAY = 2
+
+secrets = get_secrets()
+speech_key = secrets["Microsoft"]["SPEECH_KEY"]
+service_region = secrets["Microsoft"]["SPEECH_REGION"]
+
+if len(sys.argv) > 1:
+    voices = sys.argv[1:]
+else:
+    with open(VOICES_FP, "r", encoding="utf-8") as f:
+        voice_options = json.load(f)
+    # 与单词页面一致，使用各发音标准的第一个语音
+    voices = [voice_options["en-US"][0][0], voice_options["en-GB"][0][0]]
+
+container_client = None
+if secrets.get("AUDIO_CACHE_CONTAINER"):
+    container_client = BlobServiceClient.from_connection_string(
+        secrets["Microsoft"]["AZURE_STORAGE_CONNECTION_STRING"]
+    ).get_container_client(secrets["AUDIO_CACHE_CONTAINER"])
+# 直接写入预合成目录。应用只读取该目录，不会淘汰其中的文件
+audio_cache = AudioCache(
+    root=PREBUILT_AUDIO_DIR,
+    prebuilt_root=None,
+    max_disk_bytes=float("inf"),
+    container_client=container_client,
+)
+
+
+def synthesize(text, voice):
+    """合成单词语音，遇到限流时指数退避重试。"""
+    delay = RETRY_DELAY
+    for _ in range(MAX_RETRIES):
+        result = synthesize_speech(text, speech_key, service_region, voice)
+        if result.reason == ResultReason.SynthesizingAudioCompleted:
+            return result.audio_data
+        details = SpeechSynthesisCancellationDetails(result)
+        if details.reason != CancellationReason.Error or (
+            "429" not in details.error_details
+            and "Too many" not in details.error_details
+        ):
+            raise RuntimeError(f"{voice} {text}: {details.error_details}")
+        time.sleep(delay)
+        delay *= 2
+    raise RuntimeError(f"{voice} {text}: 超过最大重试次数")
+
+
+def synthesize_word(text, voice):
+    # 单个单词失败不影响其他单词，下次运行时会重新合成
+    try:
+        audio_cache.get_or_create(text, voice, synthesize)
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+
+items = load_word_list_items(voices)
+missing = [
+    (word, voice) for word, voice in items if not audio_cache.contains(word, voice)
+]
+print(f"共 {len(items)} 个（单词，语音），需下载或合成 {len(missing)} 个")
+
+start = time.time()
+n_failed = 0
+for i, ok in enumerate(
+    iter_concurrent_synthesis(missing, synthesize_word, MAX_WORKERS), start=1
+):
+    n_failed += not ok
+    if i % 100 == 0 or i == len(missing):
+        print(f"{i}/{len(missing)} 失败 {n_failed} 用时 {time.time() - start:.0f} 秒")
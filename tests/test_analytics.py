@@ -0,0 +1,94 @@
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from mypylib.analytics import (
+    ScoreDistribution,
+    average_score_stats,
+    merge_distributions,
+    records_to_frame,
+    study_time_stats,
+    word_study_stats,
+)
+
+
+def t(day, hour=12):
+    return datetime(2024, 3, day, hour, tzinfo=timezone.utc)
+
+
+EXERCISES = [
+    {"item": "单词练习-闪卡记忆-apple", "duration": 30, "timestamp": t(5)},
+    {
+        "item": "单词练习-闪卡记忆",
+        "word": "ice cream",
+        "duration": 90,
+        "timestamp": t(6),
+    },
+    {"item": "Home", "duration": 100, "timestamp": t(6)},
+    {"item": "听说练习-对话", "duration": 600, "timestamp": t(2)},
+    {"item": "单词练习-闪卡记忆-pear", "duration": 60, "timestamp": t(1)},
+]
+
+
+def test_records_to_frame_is_typed_and_sorted():
+    frame = records_to_frame("exercises", EXERCISES)
+    assert frame["item"].dtype == "category"
+    assert frame["ts"].dtype == np.int64
+    assert frame["duration"].dtype == np.float32
+    assert frame["ts"].is_monotonic_increasing
+    # 旧记录从项目名称中提取单词
+    assert list(frame["word"].dropna()) == ["pear", "apple", "ice cream"]
+
+
+def test_period_over_period():
+    frame = records_to_frame("exercises", EXERCISES)
+    start, end = date(2024, 3, 4), date(2024, 3, 7)
+    stats, current, previous = word_study_stats(
+        frame, start, end, "Asia/Shanghai", max_duration=60
+    )
+    assert list(stats["学习单词次数"]) == [1, 1]
+    assert current["学习时间"] == 1.5
+    assert previous["学习单词次数"] == 1
+
+    stats, current, previous = study_time_stats(frame, start, end, "Asia/Shanghai")
+    assert set(stats["项目"]) == {"单词练习"}
+    assert (current["时长"], previous["时长"]) == (2, 11)
+
+    _, current, previous = word_study_stats(
+        frame, date(2024, 5, 1), date(2024, 5, 2), "Asia/Shanghai"
+    )
+    assert current["学习时间"] == 0 and previous is None
+
+
+def test_average_scores():
+    frame = records_to_frame(
+        "performances",
+        [
+            {"item": "词意测试", "score": 80, "record_time": t(5)},
+            {"item": "词意测试", "score": 60, "record_time": t(5)},
+            {"item": "词意测试", "score": 40, "record_time": t(1)},
+        ],
+    )
+    daily, by_item = average_score_stats(
+        frame, date(2024, 3, 4), date(2024, 3, 7), "Asia/Shanghai"
+    )
+    assert list(daily["score"]) == [70]
+    assert by_item.loc["词意测试"].tolist() == [70, 40]
+
+
+def test_score_distributions_merge_across_days_and_provinces():
+    rng = np.random.default_rng(0)
+    parts = [rng.uniform(0, 100, size) for size in (50, 1, 200)]
+    dists = []
+    for scores in parts:
+        dist = ScoreDistribution()
+        for score in scores:
+            dist.add(score)
+        dists.append(ScoreDistribution.from_dict(dist.to_dict()))
+    merged = merge_distributions(dists)
+    scores = np.concatenate(parts)
+    assert merged.count == len(scores)
+    assert np.isclose(merged.mean, scores.mean())
+    assert np.isclose(merged.std, scores.std(ddof=1))
+    assert abs(merged.rank(60) - (scores < 60).mean()) < 0.01
+    assert abs(merged.quantile(0.5) - np.median(scores)) <= 1
@@ -0,0 +1,106 @@
+import os
+
+from azure.core.exceptions import ResourceNotFoundError
+
+from mypylib.audio_cache import AudioCache
+
+
+class FakeBlob:
+    def __init__(self, blobs, name):
+        self.blobs = blobs
+        self.name = name
+
+    def download_blob(self):
+        if self.name not in self.blobs:
+            raise ResourceNotFoundError(self.name)
+        return self
+
+    def readall(self):
+        return self.blobs[self.name]
+
+    def upload_blob(self, data, overwrite=False):
+        self.blobs[self.name] = data
+
+
+class FakeContainer:
+    def __init__(self):
+        self.blobs = {}
+
+    def get_blob_client(self, name):
+        return FakeBlob(self.blobs, name)
+
+
+def test_memory_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(tmp_path, max_memory_bytes=10)
+    cache.put("a", "v", b"aaaa")
+    cache.put("b", "v", b"bbbb")
+    assert cache.get("a", "v") == b"aaaa"
+    cache.put("c", "v", b"cccc")
+
+    assert cache.relative_path("b", "v") not in cache.memory
+    assert cache.get("b", "v") == b"bbbb"
+    stats = cache.stats()
+    assert stats["memory_evictions"] == 2
+    assert stats["memory_hits"] == 1
+    assert stats["disk_hits"] == 1
+
+
+def test_disk_evicts_oldest_files_first(tmp_path):
+    cache = AudioCache(tmp_path, max_disk_bytes=25)
+    for i, text in enumerate(["a", "b", "c"]):
+        cache.put(text, "v", b"x" * 10)
+        os.utime(cache.path_for(text, "v"), (i, i))
+
+    cache.put("d", "v", b"x" * 10)
+
+    assert not cache.path_for("a", "v").exists()
+    assert not cache.path_for("b", "v").exists()
+    assert cache.path_for("c", "v").exists()
+    assert cache.path_for("d", "v").exists()
+    assert cache.stats()["disk_bytes"] == 20
+
+
+def test_blob_hit_is_promoted_to_disk_and_memory(tmp_path):
+    container = FakeContainer()
+    writer = AudioCache(tmp_path / "other", container_client=container)
+    writer.put("hello", "v", b"audio")
+
+    cache = AudioCache(tmp_path / "local", container_client=container)
+    assert cache.get("hello", "v") == b"audio"
+    assert cache.path_for("hello", "v").read_bytes() == b"audio"
+    assert cache.get("hello", "v") == b"audio"
+    assert cache.get("missing", "v") is None
+
+    stats = cache.stats()
+    assert stats["blob_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_disk_write_errors_are_logged_not_raised(tmp_path):
+    root = tmp_path / "not-a-directory"
+    root.write_bytes(b"")
+    cache = AudioCache(root)
+
+    cache.put("a", "v", b"aaaa")
+
+    assert cache.get("a", "v") == b"aaaa"
+    assert cache.stats()["disk_bytes"] == 0
+
+
+def test_prebuilt_voices_are_read_but_never_evicted(tmp_path):
+    prebuilt = AudioCache(tmp_path / "prebuilt", prebuilt_root=None)
+    prebuilt.put("word", "v", b"x" * 100)
+
+    cache = AudioCache(
+        tmp_path / "cache", prebuilt_root=tmp_path / "prebuilt", max_disk_bytes=15
+    )
+    assert cache.contains("word", "v")
+    assert cache.get("word", "v") == b"x" * 100
+    cache.put("a", "v", b"x" * 10)
+    cache.put("b", "v", b"x" * 10)
+
+    assert prebuilt.path_for("word", "v").exists()
+    assert not cache.path_for("word", "v").exists()
+    assert cache.stats()["prebuilt_hits"] == 1
+    assert cache.stats()["disk_evictions"] == 1
@@ -0,0 +1,327 @@
+import copy
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+firestore = pytest.importorskip("google.cloud.firestore")
+
+from mypylib.db_interface import (
+    HISTORY_CACHE_TRIGGER_SIZE,
+    DbInterface,
+    _group_history_by_bucket,
+)
+
+
+def apply_update(target, data, merge):
+    """按 Firestore 的语义应用写入，支持嵌套合并、Increment、ArrayUnion 与 DELETE_FIELD。"""
+    if not merge:
+        target.clear()
+    for key, value in data.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, firestore.Increment):
+            target[key] = target.get(key, 0) + value.value
+        elif isinstance(value, firestore.ArrayUnion):
+            items = target.setdefault(key, [])
+            items.extend(v for v in value.values if v not in items)
+        elif isinstance(value, dict):
+            nested = target.get(key)
+            if not isinstance(nested, dict):
+                nested = target[key] = {}
+            apply_update(nested, value, merge=True)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeQuery:
+    def __init__(self, client, match, filters=()):
+        self.client = client
+        self.match = match
+        self.filters = filters
+
+    def where(self, filter):
+        return FakeQuery(self.client, self.match, self.filters + (filter,))
+
+    def select(self, fields):
+        return self
+
+    def stream(self):
+        ops = {
+            "==": lambda a, b: a == b,
+            ">=": lambda a, b: a is not None and a >= b,
+            "<=": lambda a, b: a is not None and a <= b,
+            "in": lambda a, b: a in b,
+        }
+        for path, data in sorted(self.client.docs.items()):
+            if self.match(path) and all(
+                ops[f.op_string](data.get(f.field_path), f.value) for f in self.filters
+            ):
+                yield FakeSnapshot(FakeDocument(self.client, path), data)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, lambda p: len(p) == len(path) + 1 and p[:-1] == path)
+        self.path = path
+
+    def document(self, doc_id):
+        return FakeDocument(self.client, self.path + (doc_id,))
+
+
+class FakeDocument:
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return FakeCollection(self.client, self.path + (name,))
+
+    def get(self):
+        self.client.reads.append(self.path)
+        return FakeSnapshot(self, self.client.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        apply_update(self.client.docs.setdefault(self.path, {}), data, merge)
+
+    def update(self, data):
+        apply_update(self.client.docs[self.path], data, merge=True)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref, data, merge))
+
+    def commit(self):
+        if self.client.fail_commits:
+            raise RuntimeError("unavailable")
+        self.client.commits.append(self.writes)
+        for ref, data, merge in self.writes:
+            ref.set(data, merge=merge)
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.docs = {}
+        self.reads = []
+        self.commits = []
+        self.fail_commits = False
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def collection_group(self, name):
+        return FakeQuery(self, lambda p: len(p) >= 2 and p[-2] == name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, refs):
+        return [ref.get() for ref in refs]
+
+
+T0 = datetime(2024, 3, 1, 8, tzinfo=timezone.utc)
+
+
+def performance(word, passed, minutes=0, score=80):
+    return {
+        "item": "拼写练习",
+        "record_time": T0 + timedelta(minutes=minutes),
+        "score": score,
+        "word_results": {word: passed},
+    }
+
+
+@pytest.fixture
+def make_dbi():
+    created = []
+
+    def make(client, phone_number="A", history_bucket=None):
+        dbi = DbInterface(client, history_bucket=history_bucket)
+        dbi.timer.cancel()
+        dbi.cache["user_info"] = {
+            "phone_number": phone_number,
+            "session_id": "s",
+            "timezone": "Asia/Shanghai",
+        }
+        created.append(dbi)
+        return dbi
+
+    yield make
+    for dbi in created:
+        dbi.timer.cancel()
+
+
+def test_flush_is_one_batch_when_size_threshold_is_reached(make_dbi):
+    client = FakeFirestore()
+    dbi = make_dbi(client)
+    documents = [performance("apple", i % 2 == 0, i) for i in range(20)]
+
+    dbi.add_documents_to_user_history(
+        "performances", documents[: HISTORY_CACHE_TRIGGER_SIZE - 1]
+    )
+    assert client.commits == []
+    dbi.add_documents_to_user_history(
+        "performances", documents[HISTORY_CACHE_TRIGGER_SIZE - 1 :]
+    )
+
+    assert len(client.commits) == 1
+    doc = client.docs[("performances", "A")]
+    assert len(doc["history"]) == 20
+    assert doc["word_pass_stats"] == {"apple": {"passed": 10, "failed": 10}}
+
+
+def test_flush_when_age_threshold_is_reached(make_dbi):
+    client = FakeFirestore()
+    dbi = make_dbi(client)
+    dbi.add_documents_to_user_history("performances", [performance("apple", True)])
+    assert client.commits == []
+
+    dbi.cache["history"]["A"]["performances"]["last_commit_time"] -= 3600
+    dbi.add_documents_to_user_history("performances", [performance("pear", True, 1)])
+
+    assert len(client.commits) == 1
+    assert len(client.docs[("performances", "A")]["history"]) == 2
+
+
+def test_word_stats_are_read_once_then_incremented(make_dbi):
+    client = FakeFirestore()
+    client.docs[("performances", "A")] = {
+        "word_pass_stats": {"apple": {"passed": 3, "failed": 1}}
+    }
+    dbi = make_dbi(client)
+
+    for i in range(3):
+        dbi.add_documents_to_user_history(
+            "performances", [performance("apple", False, i)]
+        )
+        assert dbi.flush_history()
+
+    assert client.reads == [("performances", "A")]
+    assert len(client.commits) == 3
+    assert client.docs[("performances", "A")]["word_pass_stats"] == {
+        "apple": {"passed": 3, "failed": 4}
+    }
+    assert dbi.generate_word_pass_stats("A", "performances") == {
+        "apple": {"passed": 3, "failed": 4}
+    }
+    assert client.reads == [("performances", "A")]
+
+
+def test_legacy_document_gets_full_stats_then_increments(make_dbi):
+    client = FakeFirestore()
+    client.docs[("performances", "A")] = {"history": [performance("apple", True)]}
+    dbi = make_dbi(client)
+
+    dbi.add_documents_to_user_history("performances", [performance("apple", True, 1)])
+    dbi.flush_history()
+    first = client.commits[0][0][1]["word_pass_stats"]
+    assert first == {"apple": {"passed": 2, "failed": 0}}
+    assert dbi.cache["word_stats"]["performances"]["synced"]
+
+    dbi.add_documents_to_user_history("performances", [performance("apple", False, 2)])
+    dbi.flush_history()
+    second = client.commits[1][0][1]["word_pass_stats"]
+    assert isinstance(second["apple"]["failed"], firestore.Increment)
+    assert client.docs[("performances", "A")]["word_pass_stats"] == {
+        "apple": {"passed": 2, "failed": 1}
+    }
+
+
+def test_failed_flush_is_never_written_to_the_next_user(make_dbi):
+    client = FakeFirestore()
+    dbi = make_dbi(client, "A")
+    dbi.add_documents_to_user_history("performances", [performance("apple", True)])
+
+    client.fail_commits = True
+    dbi.logout()
+    dbi.cache["user_info"].update({"phone_number": "B", "session_id": "s2"})
+    dbi.add_documents_to_user_history("performances", [performance("pear", False)])
+
+    client.fail_commits = False
+    assert dbi.flush_history()
+
+    assert list(client.docs[("performances", "A")]["word_pass_stats"]) == ["apple"]
+    assert list(client.docs[("performances", "B")]["word_pass_stats"]) == ["pear"]
+    assert list(dbi.cache["history"]) == ["B"]
+
+
+def test_group_history_by_bucket_uses_utc_dates():
+    cst = timezone(timedelta(hours=8))
+    documents = [
+        {"record_time": datetime(2024, 3, 1, 23, 30, tzinfo=cst)},
+        {"record_time": datetime(2024, 3, 2, 7, 59, tzinfo=cst)},
+        {"record_time": datetime(2024, 3, 2, 8, 0, tzinfo=cst)},
+        {"record_time": None},
+    ]
+    buckets = _group_history_by_bucket("performances", documents, "day")
+    assert {k: len(v) for k, v in buckets.items()} == {"2024-03-01": 2, "2024-03-02": 1}
+    buckets = _group_history_by_bucket("performances", documents, "month")
+    assert {k: len(v) for k, v in buckets.items()} == {"2024-03": 3}
+
+
+def test_bucketed_flush_increments_totals_and_reads_by_range(make_dbi):
+    client = FakeFirestore()
+    dbi = make_dbi(client, history_bucket="day")
+    day = 24 * 60
+    documents = [
+        performance("apple", True, 0, score=60),
+        performance("pear", True, day, score=70),
+        performance("plum", False, 2 * day, score=80),
+    ]
+    dbi.add_documents_to_user_history("performances", documents[:2])
+    dbi.flush_history()
+    dbi.add_documents_to_user_history("performances", documents[1:])
+    dbi.flush_history()
+
+    bucket = client.docs[("performances", "A", "buckets", "2024-03-02")]
+    assert len(bucket["history"]) == 1
+    assert bucket["totals"] == {"count": 2, "score": 140}
+    user_doc = client.docs[("performances", "A")]
+    assert "history" not in user_doc
+    assert user_doc["totals"] == {"count": 4, "score": 280}
+
+    records = dbi.get_user_history(
+        "performances", "A", T0 + timedelta(hours=1), T0 + timedelta(days=2)
+    )
+    assert [r["word_results"] for r in records] == [{"pear": True}, {"plum": False}]
+    assert len(dbi.get_user_history("performances", "A")) == 3
+
+
+def test_migrate_history_to_buckets_twice_is_a_no_op(make_dbi):
+    client = FakeFirestore()
+    day = 24 * 60
+    history = [performance("apple", i % 2 == 0, i * day) for i in range(3)]
+    client.docs[("performances", "A")] = {"history": history}
+    dbi = make_dbi(client)
+
+    assert dbi.migrate_history_to_buckets("performances", "A") == 3
+    migrated = copy.deepcopy(client.docs)
+    assert migrated[("performances", "A")]["totals"] == {"count": 3, "score": 240}
+    assert migrated[("performances", "A")]["word_pass_stats"] == {
+        "apple": {"passed": 2, "failed": 1}
+    }
+
+    assert dbi.migrate_history_to_buckets("performances", "A") == 0
+    assert client.docs == migrated
+
+    # 中断在写入用户文档之前时，重跑只补写尚未迁移的分桶
+    del client.docs[("performances", "A", "buckets", "2024-03-03")]
+    client.docs[("performances", "A")] = {"history": history}
+    assert dbi.migrate_history_to_buckets("performances", "A") == 3
+    assert client.docs == migrated
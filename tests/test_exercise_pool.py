@@ -0,0 +1,78 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from mypylib.exercise_pool import ExercisePool, ExercisePoolRefiller
+
+
+def wait_for_refills(refiller, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while refiller.refilling and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not refiller.refilling
+
+
+def test_pop_is_fifo_and_returns_none_when_empty(tmp_path):
+    pool = ExercisePool(tmp_path / "pool.db")
+    assert pool.pop("A1", "日常") is None
+    pool.push("A1", "日常", {"n": 1})
+    pool.push("A1", "日常", {"n": 2})
+    pool.push("B1", "日常", {"n": 3})
+
+    assert pool.pop("A1", "日常") == {"n": 1}
+    assert pool.pop("A1", "日常") == {"n": 2}
+    assert pool.pop("A1", "日常") is None
+    assert pool.stats() == {("B1", "日常"): 1}
+
+
+def test_refill_starts_below_low_water_and_stops_at_high_water(tmp_path):
+    pool = ExercisePool(tmp_path / "pool.db", low_water=2, high_water=4)
+    refiller = ExercisePoolRefiller(pool)
+    pool.push("A1", "日常", {})
+    pool.push("A1", "日常", {})
+    assert not pool.needs_refill("A1", "日常")
+    assert not refiller.request_refill("A1", "日常", lambda level, category: {})
+
+    pool.pop("A1", "日常")
+    assert refiller.request_refill(
+        "A1", "日常", lambda level, category: {"level": level}
+    )
+    wait_for_refills(refiller)
+    assert pool.size("A1", "日常") == 4
+
+
+def test_concurrent_refill_requests_start_one_thread_in_context(tmp_path):
+    pool = ExercisePool(tmp_path / "pool.db", low_water=1, high_water=2)
+    local = threading.local()
+
+    @contextmanager
+    def system_context():
+        local.identity = "system"
+        yield
+
+    release = threading.Event()
+    identities = []
+
+    def build(level, category):
+        release.wait(5)
+        identities.append(getattr(local, "identity", None))
+        return {}
+
+    refiller = ExercisePoolRefiller(pool, context=system_context)
+    started = []
+    threads = [
+        threading.Thread(
+            target=lambda: started.append(refiller.request_refill("A1", "日常", build))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    wait_for_refills(refiller)
+
+    assert started.count(True) == 1
+    assert identities == ["system", "system"]
+    assert pool.size("A1", "日常") == 2
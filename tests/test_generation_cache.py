@@ -0,0 +1,82 @@
+import itertools
+import threading
+import time
+
+from mypylib.generation_cache import GenerationCache, make_generation_key
+
+
+def test_key_ignores_whitespace_and_argument_order():
+    key = make_generation_key(
+        "m", "Write  a\n   story about {topic}.", {"a": 1, "b": 2}
+    )
+    assert key == make_generation_key(
+        "m", "Write a story about {topic}.", {"b": 2, "a": 1}
+    )
+    assert key != make_generation_key("m", "Write a story about {topic}.", {"a": 2})
+    assert key != make_generation_key("other", "Write a story about {topic}.", {})
+    assert key != make_generation_key(
+        "m", "Write a story about {topic}.", {"a": 1, "b": 2}, {"temperature": 0.5}
+    )
+
+
+def test_expired_variants_are_not_returned(tmp_path):
+    cache = GenerationCache(tmp_path / "cache.db", ttl=0.1)
+    cache.put("k", {"text": "old"})
+    assert cache.get("k") == {"text": "old"}
+    time.sleep(0.15)
+
+    assert cache.count("k") == 0
+    assert cache.get("k") is None
+    assert cache.get_or_generate("k", lambda: {"text": "new"}) == {"text": "new"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_pool_mode_generates_then_round_robins(tmp_path):
+    cache = GenerationCache(tmp_path / "cache.db")
+    counter = itertools.count()
+
+    def generate():
+        return next(counter)
+
+    values = [cache.get_or_generate("k", generate, pool_size=3) for _ in range(7)]
+    assert values == [0, 1, 2, 0, 1, 2, 0]
+    assert cache.fill("k", generate, pool_size=4) == 1
+    assert cache.count("k") == 4
+
+
+def test_capacity_evicts_least_recently_used(tmp_path):
+    cache = GenerationCache(tmp_path / "cache.db", max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_concurrent_access_from_threads_and_instances(tmp_path):
+    fp = tmp_path / "cache.db"
+    shared = GenerationCache(fp)
+    errors = []
+
+    def worker(i):
+        # 偶数线程共享一个实例，奇数线程各自打开数据库，模拟多个进程
+        cache = shared if i % 2 == 0 else GenerationCache(fp)
+        try:
+            for j in range(20):
+                cache.put(f"k{j % 4}", [i, j])
+                assert cache.get(f"k{j % 4}") is not None
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    stats = shared.stats()
+    assert stats["entries"] == 8 * 20
+    assert stats["keys"] == 4
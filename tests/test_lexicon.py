@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from mypylib.lexicon import Lexicon, build_lexicon, open_lexicon
+
+ENTRIES = {
+    "apple": {"level": "A1", "translation": "苹果", "image_urls": ["a.png"]},
+    "zebra": {"level": "A2", "translation": "斑马"},
+    "ice cream": {"level": "A1", "translation": "冰淇淋"},
+    "café": {"level": None, "translation": "咖啡馆"},
+    "Apple": {"translation": "苹果公司"},
+}
+
+
+@pytest.fixture
+def lexicon(tmp_path):
+    fp = tmp_path / "mini_dict.lex"
+    build_lexicon(ENTRIES, fp)
+    lexicon = Lexicon(fp)
+    yield lexicon
+    lexicon.close()
+
+
+def test_lookup(lexicon):
+    assert len(lexicon) == len(ENTRIES)
+    for word, doc in ENTRIES.items():
+        assert word in lexicon
+        assert lexicon[word] == doc
+        assert lexicon.level(word) == doc.get("level")
+    assert "apples" not in lexicon
+    assert lexicon.get("apples", {}) == {}
+    assert lexicon.level("a") is None
+    with pytest.raises(KeyError):
+        lexicon["zzz"]
+
+
+def test_open_lexicon_rebuilds_when_source_changes(tmp_path):
+    json_fp = tmp_path / "mini_dict.json"
+    lexicon_fp = tmp_path / "mini_dict.lex"
+    json_fp.write_text(json.dumps({"cat": {"level": "A1"}}), encoding="utf-8")
+    assert open_lexicon(json_fp, lexicon_fp).level("cat") == "A1"
+    json_fp.write_text(json.dumps({"cat": {"level": "A2"}}), encoding="utf-8")
+    os.utime(json_fp, (os.path.getmtime(lexicon_fp) + 1,) * 2)
+    assert open_lexicon(json_fp, lexicon_fp).level("cat") == "A2"
+
+
+def test_cefr_level_is_memoized_per_lexicon(lexicon):
+    word_utils = pytest.importorskip("mypylib.word_utils")
+    word_utils._lexicon_level.cache_clear()
+    assert word_utils.get_cefr_level("apple", lexicon) == "A1"
+    assert word_utils.get_cefr_level("apple", lexicon) == "A1"
+    assert word_utils.get_cefr_level("zzz", lexicon) is None
+    info = word_utils._lexicon_level.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+    # 普通字典不经过缓存
+    assert word_utils.get_cefr_level("cat", {"cat": {"level": "A2"}}) == "A2"
+    assert word_utils._lexicon_level.cache_info().misses == 2
@@ -0,0 +1,35 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from mypylib.quantile_sketch import KLLSketch
+
+
+def test_small_sketch_is_exact():
+    sketch = KLLSketch()
+    sketch.extend([10, 20, 20, 30])
+    assert sketch.rank(20) == 0.5
+    assert sketch.rank(5) == 0.0
+    assert sketch.quantile(0.5) == 20
+    assert KLLSketch().rank(3) == 0.0
+
+
+@pytest.mark.parametrize("parts", [1, 8])
+def test_merged_ranks_are_within_error_bound(parts):
+    rng = np.random.default_rng(0)
+    scores = rng.normal(70, 15, 100_000).clip(0, 100)
+    sketches = [KLLSketch(seed=i) for i in range(parts)]
+    for i, score in enumerate(scores):
+        sketches[i % parts].update(score)
+    merged = KLLSketch(seed=0)
+    for sketch in sketches:
+        merged.merge(KLLSketch.from_dict(sketch.to_dict()))
+    merged = pickle.loads(pickle.dumps(merged))
+
+    assert merged.count == len(scores)
+    assert sum(len(items) for items in merged.compactors) < 1000
+    xs = np.array([30, 50, 70, 85, 95])
+    expected = (scores[:, None] < xs).mean(axis=0)
+    assert np.abs(merged.cdf(xs) - expected).max() < 0.02
+    assert abs(merged.quantile(0.5) - np.median(scores)) < 1
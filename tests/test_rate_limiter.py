@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from mypylib.rate_limiter import (
+    BATCH,
+    InMemoryBackend,
+    Quota,
+    RateLimiter,
+    RedisBackend,
+    SQLiteBackend,
+)
+
+
+def test_burst_then_wait():
+    # 每秒 2 次，允许突发 2 次
+    limiter = RateLimiter(Quota.per(2, 1))
+    assert limiter.try_acquire("m") == 0
+    assert limiter.try_acquire("m") == 0
+    # 第三次需要等待约 0.5 秒补充一个令牌
+    assert 0.4 < limiter.try_acquire("m") <= 0.5
+    # 不同模型互不影响
+    assert limiter.try_acquire("other") == 0
+
+
+def test_acquire_sleeps_for_refill():
+    limiter = RateLimiter(Quota.per(1, 0.2))
+    limiter.acquire("m")
+    start = time.monotonic()
+    assert limiter.acquire("m")
+    assert time.monotonic() - start >= 0.15
+    assert not limiter.acquire("m", timeout=0.05)
+
+
+def test_batch_keeps_reserve_for_interactive():
+    limiter = RateLimiter(Quota.per(4, 60))
+    assert limiter.try_acquire("m", priority=BATCH) == 0
+    assert limiter.try_acquire("m", priority=BATCH) == 0
+    # 批量请求只能使用一半令牌，剩余留给交互请求
+    assert limiter.try_acquire("m", priority=BATCH) > 0
+    assert limiter.try_acquire("m") == 0
+    assert limiter.try_acquire("m") == 0
+
+
+def test_user_quota():
+    limiter = RateLimiter(Quota.per(10, 60), user_quota=Quota.per(1, 60))
+    assert limiter.try_acquire("m", user="a") == 0
+    assert limiter.try_acquire("m", user="a") > 0
+    assert limiter.try_acquire("m", user="b") == 0
+    # 用户配额不足时不消耗模型令牌
+    levels = limiter.backend.states
+    assert levels["model:m"][0] == pytest.approx(8, abs=0.01)
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    fp = tmp_path / "limiter.db"
+    a = RateLimiter(Quota.per(2, 60), backend=SQLiteBackend(fp))
+    b = RateLimiter(Quota.per(2, 60), backend=SQLiteBackend(fp))
+    assert a.try_acquire("m") == 0
+    assert b.try_acquire("m") == 0
+    assert a.try_acquire("m") > 0
+    assert b.try_acquire("m") > 0
+
+
+def test_acquire_async_runs_on_one_loop():
+    limiter = RateLimiter(Quota.per(2, 0.2), backend=InMemoryBackend())
+
+    async def main():
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire_async("m") for _ in range(4)))
+        return time.monotonic() - start
+
+    # 突发 2 次后，每 0.1 秒补充一个令牌
+    assert asyncio.run(main()) >= 0.15
+
+
+def test_redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis()
+    a = RateLimiter(Quota.per(2, 60), backend=RedisBackend(client))
+    b = RateLimiter(Quota.per(2, 60), backend=RedisBackend(client))
+    assert a.try_acquire("m") == 0
+    assert b.try_acquire("m") == 0
+    assert a.try_acquire("m") > 0
+    assert b.try_acquire("m", priority=BATCH) > 0
@@ -0,0 +1,44 @@
+import numpy as np
+
+from mypylib.review_scheduler import (
+    DAY,
+    FIRST_INTERVAL,
+    RELEARN_INTERVAL,
+    ReviewScheduler,
+)
+
+NOW = 1_700_000_000.0
+
+
+def test_sample_without_replacement_prefers_failed_words():
+    scheduler = ReviewScheduler.from_stats(
+        {
+            "apple": {"passed": 5, "failed": 0},
+            "banana": {"passed": 0, "failed": 5},
+        },
+        {},
+        now=NOW,
+    )
+    words = ["apple", "banana", "cherry"]
+    rng = np.random.default_rng(0)
+    sampled = scheduler.sample(words, 10, now=NOW, rng=rng)
+    assert sorted(sampled) == sorted(words)
+    firsts = [scheduler.sample(words, 1, now=NOW, rng=rng)[0] for _ in range(300)]
+    assert firsts.count("banana") > firsts.count("cherry") > firsts.count("apple")
+
+
+def test_record_schedules_next_review():
+    scheduler = ReviewScheduler(capacity=1)
+    scheduler.record("apple", True, now=NOW)
+    assert scheduler.due_words(["apple"], now=NOW + FIRST_INTERVAL - 1) == []
+    scheduler.record("apple", True, now=NOW + DAY)
+    i = scheduler.index["apple"]
+    assert scheduler.interval[i] == FIRST_INTERVAL * 2.6
+    scheduler.record("apple", False, now=NOW + 5 * DAY)
+    assert scheduler.due[i] == NOW + 5 * DAY + RELEARN_INTERVAL
+    # 容量不足时自动扩展
+    scheduler.record_results({"banana": True, "cherry": False}, now=NOW)
+    assert len(scheduler) == 3
+    assert scheduler.due_words(["apple", "banana", "cherry"], now=NOW + DAY - 1) == [
+        "cherry"
+    ]
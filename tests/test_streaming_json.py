@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from mypylib.streaming_json import IncrementalJSONParser
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i : i + size]))
+    return events
+
+
+def test_list_items_are_emitted_as_they_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('```json\n[{"q": "a, [b]"}, ') == [((0,), {"q": "a, [b]"})]
+    assert parser.feed('{"q": "c\\"}"}') == []
+    assert parser.feed("]\n```") == [((1,), {"q": 'c"}'})]
+    assert parser.done
+    assert parser.result() == [{"q": "a, [b]"}, {"q": 'c"}'}]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_object_fields_and_nested_items(size):
+    data = {
+        "scoringRecords": [
+            {"criterion": "Content", "score": 25},
+            {"criterion": "Language", "score": 20},
+        ],
+        "review": "好，{不错}",
+        "empty": [],
+    }
+    text = "```JSON\n" + json.dumps(data, ensure_ascii=False, indent=2) + "\n```"
+    parser = IncrementalJSONParser(max_depth=2)
+    events = feed_in_chunks(parser, text, size)
+    assert events == [
+        (("scoringRecords", 0), data["scoringRecords"][0]),
+        (("scoringRecords", 1), data["scoringRecords"][1]),
+        (("scoringRecords",), data["scoringRecords"]),
+        (("review",), data["review"]),
+        (("empty",), []),
+    ]
+    assert parser.result() == data
+
+
+def test_incomplete_result_raises():
+    parser = IncrementalJSONParser()
+    parser.feed("[1, 2")
+    with pytest.raises(ValueError):
+        parser.result()
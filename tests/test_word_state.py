@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+
+from mypylib.word_state import WordStateIndex
+
+T0 = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def test_index_is_updated_incrementally():
+    index = WordStateIndex.from_stats(
+        "13800000000", {"apple": {"passed": 1, "failed": 2}}, {"banana": 30}
+    )
+    index.add_documents(
+        "exercises",
+        [
+            {
+                "item": "单词练习-闪卡记忆-apple",
+                "word": "apple",
+                "duration": 10,
+                "timestamp": T0,
+            },
+            {"item": "Home", "duration": 100, "timestamp": T0},
+        ],
+    )
+    index.add_documents(
+        "performances",
+        [
+            {
+                "word_results": {"apple": True, "cherry": False},
+                "record_time": T0 + timedelta(hours=1),
+            }
+        ],
+    )
+    apple = index.get("apple")
+    assert (apple.duration, apple.passed, apple.failed) == (10, 2, 2)
+    assert apple.last_seen == T0 + timedelta(hours=1)
+    assert index.duration_stats() == {"apple": 10, "banana": 30}
+    assert index.pass_stats() == {
+        "apple": {"passed": 2, "failed": 2},
+        "cherry": {"passed": 0, "failed": 1},
+    }
+    index.seen("banana", T0 - timedelta(days=1))
+    assert sorted(index.learned_since(T0)) == ["apple", "cherry"]
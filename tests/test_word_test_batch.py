@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from mypylib import google_ai
+from mypylib.google_ai import WordTestBatch, order_word_tests
+
+
+def make_test(word):
+    return {"word": word, "question": f"What does '{word}' mean?"}
+
+
+@pytest.fixture
+def stub_generate(monkeypatch):
+    """以桩函数替换 generate_word_tests，按块记录调用次数。"""
+    calls = {}
+    lock = threading.Lock()
+
+    def install(respond):
+        def generate_word_tests(model_name, model, words, level):
+            with lock:
+                calls[tuple(words)] = calls.get(tuple(words), 0) + 1
+                attempt = calls[tuple(words)]
+            return respond(words, attempt)
+
+        monkeypatch.setattr(google_ai, "generate_word_tests", generate_word_tests)
+        return calls
+
+    return install
+
+
+def test_chunks_are_returned_in_word_order(stub_generate):
+    # 模型返回的题目顺序与单词顺序相反
+    calls = stub_generate(lambda words, attempt: [make_test(w) for w in words[::-1]])
+    words = [f"w{i}" for i in range(12)]
+
+    batch = WordTestBatch("m", None, words, "A1", chunk_size=5)
+    results = list(batch)
+
+    assert [len(chunk) for chunk in batch.chunks] == [5, 5, 2]
+    assert [word for word, _ in results] == words
+    assert all(test["word"] == word for word, test in results)
+    assert sorted(calls.values()) == [1, 1, 1]
+    assert batch.done()
+
+
+def test_chunk_with_missing_tests_is_retried(stub_generate):
+    def respond(words, attempt):
+        tests = [make_test(w) for w in words]
+        # 第二块第一次少返回一道题
+        return tests[:-1] if words[0] == "w5" and attempt == 1 else tests
+
+    calls = stub_generate(respond)
+    words = [f"w{i}" for i in range(10)]
+
+    results = list(WordTestBatch("m", None, words, "A1", chunk_size=5))
+
+    assert [word for word, _ in results] == words
+    assert calls[tuple(words[5:])] == 2
+
+
+def test_chunk_failing_every_attempt_is_skipped(stub_generate):
+    def respond(words, attempt):
+        if words[0] == "w0":
+            return [make_test("other") for _ in words]
+        return [make_test(w) for w in words]
+
+    calls = stub_generate(respond)
+    words = [f"w{i}" for i in range(6)]
+
+    batch = WordTestBatch("m", None, words, "A1", chunk_size=3, max_attempts=2)
+    results = list(batch)
+
+    assert [word for word, _ in results] == words[3:]
+    assert calls[tuple(words[:3])] == 2
+    assert batch.done()
+
+
+def test_order_word_tests_rejects_mismatches():
+    assert order_word_tests(["A", "b"], [make_test("B"), make_test("a")]) == [
+        make_test("a"),
+        make_test("B"),
+    ]
+    with pytest.raises(ValueError):
+        order_word_tests(["a", "b"], [make_test("a")])
+    with pytest.raises(ValueError):
+        order_word_tests(["a", "b"], [make_test("a"), make_test("c")])
+    with pytest.raises(ValueError):
+        order_word_tests(["a"], [{"question": "?"}])